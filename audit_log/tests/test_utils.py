@@ -130,7 +130,7 @@ def test_commit_to_audit_log_crud_operations(http_method, audit_operation):
     ],
 )
 @pytest.mark.django_db
-def test_commit_to_audit_log_actor_data(user_role, audit_role):
+def test_commit_to_audit_log_actor_data(user_role, audit_role, django_cache):
     organization = OrganizationFactory()
 
     if user_role == "apikey_user":
@@ -301,3 +301,44 @@ def test_get_target_object(object_type):
     target_data = _get_target(req_mock._request)
 
     _assert_target_data(target_data, req_mock.path, object_ids)
+
+
+@pytest.mark.django_db
+def test_commit_to_audit_log_caches_user_role_between_requests(
+    settings, django_assert_num_queries, django_cache
+):
+    settings.AUDIT_LOG_USER_ROLE_CACHE_TIMEOUT = 60
+    user = UserFactory()
+    res_mock = Mock(status_code=200)
+
+    commit_to_audit_log(_create_default_request_mock(user), res_mock)
+
+    # A new request has a new user object
+    user = User.objects.get(pk=user.pk)
+
+    # Only the audit log entry is inserted
+    with django_assert_num_queries(1):
+        commit_to_audit_log(_create_default_request_mock(user), res_mock)
+
+    assert AuditLogEntry.objects.count() == 2
+    for log_entry in AuditLogEntry.objects.all():
+        assert log_entry.message["audit_event"]["actor"]["role"] == Role.USER.value
+
+
+@pytest.mark.django_db
+def test_commit_to_audit_log_resolves_user_role_without_cache(
+    settings, django_assert_num_queries, django_cache
+):
+    settings.AUDIT_LOG_USER_ROLE_CACHE_TIMEOUT = 0
+    organization = OrganizationFactory()
+    user = UserFactory()
+    res_mock = Mock(status_code=200)
+
+    commit_to_audit_log(_create_default_request_mock(user), res_mock)
+    user.admin_organizations.add(organization)
+    commit_to_audit_log(_create_default_request_mock(user), res_mock)
+
+    assert [
+        log_entry.message["audit_event"]["actor"]["role"]
+        for log_entry in AuditLogEntry.objects.order_by("pk")
+    ] == [Role.USER.value, Role.ADMIN.value]
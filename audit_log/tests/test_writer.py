@@ -0,0 +1,145 @@
+from queue import Queue
+from unittest.mock import DEFAULT, patch
+
+import pytest
+from django.db import DataError, OperationalError
+
+from audit_log.models import AuditLogEntry
+from audit_log.writer import FLUSH_ATTEMPTS, AuditLogWriter
+
+
+def _write_entries(writer, count):
+    for index in range(count):
+        writer.write(AuditLogEntry(message={"index": index}))
+
+
+@pytest.mark.django_db
+def test_writer_writes_synchronously_by_default(settings):
+    settings.AUDIT_LOG_ASYNC_WRITES = False
+    writer = AuditLogWriter()
+
+    _write_entries(writer, 3)
+
+    assert AuditLogEntry.objects.count() == 3
+    assert writer._thread is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_writer_flushes_queued_entries_on_stop(settings):
+    settings.AUDIT_LOG_ASYNC_WRITES = True
+    settings.AUDIT_LOG_BATCH_SIZE = 2
+    settings.AUDIT_LOG_FLUSH_INTERVAL = 60
+    writer = AuditLogWriter()
+
+    with patch.object(
+        AuditLogEntry.objects, "bulk_create", wraps=AuditLogEntry.objects.bulk_create
+    ) as mocked:
+        _write_entries(writer, 5)
+        writer.stop()
+
+    assert sorted(
+        AuditLogEntry.objects.values_list("message__index", flat=True)
+    ) == list(range(5))
+    assert [len(call.args[0]) for call in mocked.call_args_list] == [2, 2, 1]
+    assert not writer._thread.is_alive()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_writer_flushes_after_interval(settings):
+    settings.AUDIT_LOG_ASYNC_WRITES = True
+    settings.AUDIT_LOG_BATCH_SIZE = 100
+    settings.AUDIT_LOG_FLUSH_INTERVAL = 0.01
+    writer = AuditLogWriter()
+
+    _write_entries(writer, 1)
+    writer._thread.join(0.5)
+
+    assert AuditLogEntry.objects.count() == 1
+    writer.stop()
+
+
+@pytest.mark.django_db
+def test_async_writer_writes_synchronously_when_queue_is_full(settings):
+    settings.AUDIT_LOG_ASYNC_WRITES = True
+    settings.AUDIT_LOG_QUEUE_SIZE = 1
+    writer = AuditLogWriter()
+
+    # Keep the background thread from consuming the queue
+    with (
+        patch.object(AuditLogWriter, "_run"),
+        patch("audit_log.writer.QUEUE_PUT_TIMEOUT", 0),
+    ):
+        _write_entries(writer, 3)
+
+    assert writer._queue.qsize() == 1
+    assert AuditLogEntry.objects.count() == 2
+
+
+@pytest.fixture
+def no_flush_retry_delay():
+    with patch("audit_log.writer.FLUSH_RETRY_DELAY", 0):
+        yield
+
+
+@pytest.mark.django_db(transaction=True)
+def test_writer_retries_failed_batch(no_flush_retry_delay):
+    batch = [AuditLogEntry(message={"index": index}) for index in range(3)]
+
+    with patch.object(
+        AuditLogEntry.objects,
+        "bulk_create",
+        wraps=AuditLogEntry.objects.bulk_create,
+        side_effect=[OperationalError("Connection lost"), DEFAULT],
+    ) as mocked_bulk_create:
+        AuditLogWriter._flush(batch)
+
+    assert mocked_bulk_create.call_count == 2
+    assert AuditLogEntry.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_writer_writes_entries_one_by_one_when_batch_fails(no_flush_retry_delay):
+    batch = [AuditLogEntry(message={"index": index}) for index in range(3)]
+    save = AuditLogEntry.save
+
+    def save_valid_entries(entry, *args, **kwargs):
+        if entry.message["index"] == 1:
+            raise DataError("Invalid entry")
+        return save(entry, *args, **kwargs)
+
+    with (
+        patch.object(
+            AuditLogEntry.objects, "bulk_create", side_effect=DataError("Invalid")
+        ) as mocked_bulk_create,
+        patch.object(AuditLogEntry, "save", save_valid_entries),
+    ):
+        AuditLogWriter._flush(batch)
+
+    # Invalid entries are not retried as a batch
+    assert mocked_bulk_create.call_count == 1
+    written = AuditLogEntry.objects.values_list("message__index", flat=True)
+    assert sorted(written) == [0, 2]
+
+
+@pytest.mark.django_db
+def test_writer_queues_entries_again_while_database_is_unavailable(
+    no_flush_retry_delay,
+):
+    batch = [AuditLogEntry(message={"index": index}) for index in range(3)]
+    queue = Queue(maxsize=2)
+
+    with (
+        patch.object(
+            AuditLogEntry.objects,
+            "bulk_create",
+            side_effect=OperationalError("Connection lost"),
+        ) as mocked_bulk_create,
+        patch.object(
+            AuditLogEntry, "save", side_effect=OperationalError("Connection lost")
+        ),
+    ):
+        AuditLogWriter._flush(batch, queue)
+
+    assert mocked_bulk_create.call_count == FLUSH_ATTEMPTS
+    # The entries that do not fit in the queue are dropped
+    assert [queue.get_nowait() for _ in range(queue.qsize())] == batch[:2]
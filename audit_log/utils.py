@@ -1,8 +1,10 @@
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 
 from audit_log.enums import Operation, Role, Status
 from audit_log.models import AuditLogEntry
+from audit_log.writer import audit_log_writer
 from events.auth import ApiKeyUser
 from registrations.auth import WebStoreWebhookUser
 
@@ -52,6 +54,21 @@ def _get_user_role(user):
     if not user.is_authenticated:
         return Role.ANONYMOUS.value
 
+    timeout = settings.AUDIT_LOG_USER_ROLE_CACHE_TIMEOUT
+    if not timeout or user.pk is None:
+        return _resolve_user_role(user)
+
+    # The role is shared between the requests of the user. API key users share
+    # the pks of the users.
+    cache_key = f"audit_log_user_role:{type(user).__name__}:{user.pk}"
+    role = cache.get(cache_key)
+    if role is None:
+        role = _resolve_user_role(user)
+        cache.set(cache_key, role, timeout)
+    return role
+
+
+def _resolve_user_role(user):
     if isinstance(user, WebStoreWebhookUser):
         return Role.EXTERNAL.value
 
@@ -108,4 +125,4 @@ def commit_to_audit_log(request, response):
         }
     }
 
-    AuditLogEntry.objects.create(message=message)
+    audit_log_writer.write(AuditLogEntry(message=message))
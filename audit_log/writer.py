@@ -0,0 +1,176 @@
+"""
+Buffered writer for audit log entries.
+
+With AUDIT_LOG_ASYNC_WRITES enabled, entries are queued in memory and written
+with bulk_create by a background thread, either once AUDIT_LOG_BATCH_SIZE
+entries have been queued or AUDIT_LOG_FLUSH_INTERVAL seconds after the first
+queued entry. The queue is bounded: when it is full, the request writes its
+entry synchronously instead of dropping it. A batch that fails to be written
+is retried and then written entry by entry, and the entries that cannot be
+written while the database is unavailable are queued again. Queued entries are
+flushed when the process exits.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from queue import Empty, Full, Queue
+from typing import Optional
+
+from django.conf import settings
+from django.db import (
+    InterfaceError,
+    OperationalError,
+    close_old_connections,
+    connection,
+)
+
+from audit_log.models import AuditLogEntry
+
+logger = logging.getLogger(__name__)
+
+# Seconds a request waits for room in a full queue
+QUEUE_PUT_TIMEOUT = 0.5
+# Seconds to wait for the queued entries to be written on shutdown
+STOP_TIMEOUT = 10
+# Attempts to write a batch while the database is unavailable
+FLUSH_ATTEMPTS = 3
+# Seconds to wait before the first retry, doubled for each further retry
+FLUSH_RETRY_DELAY = 0.5
+
+# Errors of an unavailable database, as opposed to errors of invalid entries
+TRANSIENT_ERRORS = (InterfaceError, OperationalError)
+
+_STOP = object()
+
+
+class AuditLogWriter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+
+    def write(self, entry: AuditLogEntry) -> None:
+        if not settings.AUDIT_LOG_ASYNC_WRITES:
+            entry.save()
+            return
+
+        try:
+            self._get_queue().put(entry, timeout=QUEUE_PUT_TIMEOUT)
+        except Full:
+            logger.warning("Audit log queue is full, writing the entry synchronously")
+            entry.save()
+
+    def _get_queue(self) -> Queue:
+        with self._lock:
+            # The thread is started lazily so that each forked worker gets its own
+            if self._pid != os.getpid():
+                self._queue = Queue(maxsize=settings.AUDIT_LOG_QUEUE_SIZE)
+                self._thread = threading.Thread(
+                    target=self._run,
+                    args=(self._queue,),
+                    name="audit-log-writer",
+                    daemon=True,
+                )
+                self._thread.start()
+                self._pid = os.getpid()
+            return self._queue
+
+    def _run(self, queue: Queue) -> None:
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                entry = queue.get(timeout=timeout)
+            except Empty:
+                entry = None
+
+            if entry is not None and entry is not _STOP:
+                if not batch:
+                    deadline = time.monotonic() + settings.AUDIT_LOG_FLUSH_INTERVAL
+                batch.append(entry)
+                if len(batch) < settings.AUDIT_LOG_BATCH_SIZE:
+                    continue
+
+            if batch:
+                # Entries cannot be queued again once the writer is stopping
+                self._flush(batch, None if entry is _STOP else queue)
+                batch = []
+                deadline = None
+
+            if entry is _STOP:
+                connection.close()
+                return
+
+    @classmethod
+    def _flush(cls, batch: list, queue: Optional[Queue] = None) -> None:
+        for attempt in range(FLUSH_ATTEMPTS):
+            try:
+                close_old_connections()
+                AuditLogEntry.objects.bulk_create(batch)
+                return
+            except TRANSIENT_ERRORS:
+                logger.warning(
+                    f"Failed to write {len(batch)} audit log entries", exc_info=True
+                )
+                # Reconnect for the next attempt
+                connection.close()
+                if attempt < FLUSH_ATTEMPTS - 1:
+                    time.sleep(FLUSH_RETRY_DELAY * 2**attempt)
+            except Exception:
+                logger.exception(f"Failed to write {len(batch)} audit log entries")
+                break
+
+        # Write the entries one by one so that an invalid entry is the only one lost
+        for index, entry in enumerate(batch):
+            try:
+                entry.save()
+            except TRANSIENT_ERRORS:
+                connection.close()
+                cls._requeue(batch[index:], queue)
+                return
+            except Exception:
+                logger.exception("Failed to write an audit log entry")
+
+    @staticmethod
+    def _requeue(entries: list, queue: Optional[Queue]) -> None:
+        if queue is not None:
+            for index, entry in enumerate(entries):
+                try:
+                    queue.put_nowait(entry)
+                except Full:
+                    entries = entries[index:]
+                    break
+            else:
+                logger.warning(
+                    f"Database is unavailable, queued {len(entries)} audit log "
+                    "entries again"
+                )
+                return
+
+        logger.error(
+            f"Database is unavailable, dropped {len(entries)} audit log entries"
+        )
+
+    def stop(self) -> None:
+        """Write the queued entries and stop the background thread."""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            queue, thread = self._queue, self._thread
+            self._pid = None
+
+        try:
+            queue.put(_STOP, timeout=STOP_TIMEOUT)
+        except Full:
+            logger.error("Audit log queue is full, unable to stop the writer")
+            return
+        thread.join(STOP_TIMEOUT)
+
+
+audit_log_writer = AuditLogWriter()
+atexit.register(audit_log_writer.stop)
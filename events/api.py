@@ -1,5 +1,4 @@
 import logging
-import re
 import urllib.parse
 from datetime import datetime, timedelta
 from datetime import time as datetime_time
@@ -13,12 +12,10 @@ import pytz
 import regex
 from django.conf import settings
 from django.contrib.gis.gdal import GDALException
-from django.contrib.postgres.search import SearchQuery, TrigramSimilarity
-from django.core.cache import cache
+from django.contrib.postgres.search import SearchQuery
 from django.core.exceptions import PermissionDenied
 from django.db import transaction
 from django.db.models import Count, Exists, F, OuterRef, Prefetch, Q, QuerySet
-from django.db.models.functions import Greatest
 from django.http import Http404, HttpResponsePermanentRedirect
 from django.template.loader import render_to_string
 from django.utils import translation
@@ -70,6 +67,11 @@ from events.filters import (
     PlaceFilter,
     filter_division,
 )
+from events.keywords import (
+    KEYWORD_SIMILARITY_THRESHOLD,
+    get_keyword_similarity,
+    resolve_similar_keyword_ids,
+)
 from events.models import (
     DataSource,
     Event,
@@ -81,6 +83,11 @@ from events.models import (
     Place,
     PublicationStatus,
 )
+from events.ongoing_cache import (
+    get_max_term_edits,
+    get_ongoing_event_ids,
+    search_ongoing_events,
+)
 from events.permissions import (
     DataSourceResourceEditPermission,
     GuestPost,
@@ -91,7 +98,20 @@ from events.permissions import (
     OrganizationWebStoreMerchantsAndAccountsPermission,
     UserIsAdminInAnyOrganization,
 )
+from events.query_cache import (
+    TOO_MANY_RESULTS,
+    cache_event_ids,
+    get_cached_event_ids,
+    get_event_query_cache_key,
+    is_event_query_cache_enabled,
+)
 from events.renderers import DOCXRenderer
+from events.search import (
+    filter_events_by_combined_text,
+    filter_events_by_text,
+    order_by_rank,
+    text_qset_by_translated_field,
+)
 from events.serializers import (
     DataSourceSerializer,
     EventSerializer,
@@ -108,7 +128,6 @@ from events.serializers import (
     SearchSerializer,
     SearchSerializerV0_1,
 )
-from events.translation import EventTranslationOptions, PlaceTranslationOptions
 from linkedevents.registry import register_view
 from linkedevents.schema_utils import (
     IncludeOpenApiParameter,
@@ -226,16 +245,6 @@ def parse_digit(val, param):
         raise ParseError(f'{param} must be an integer, you passed "{val}"')
 
 
-def _text_qset_by_translated_field(field, val):
-    # Free text search from all languages of the field
-    languages = get_fixed_lang_codes()
-    qset = Q()
-    for lang in languages:
-        kwarg = {field + "_" + lang + "__icontains": val}
-        qset |= Q(**kwarg)
-    return qset
-
-
 class JSONAPIViewMixin(object):
     def initial(self, request, *args, **kwargs):
         ret = super().initial(request, *args, **kwargs)
@@ -402,6 +411,7 @@ class KeywordListViewSet(
     filter_backends = (filters.OrderingFilter,)
     ordering_fields = ("n_events", "id", "name", "data_source")
     ordering = ("-data_source", "-n_events", "name")
+    allow_cursor_pagination = True
     permission_classes = [
         DataSourceResourceEditPermission & OrganizationUserEditPermission
     ]
@@ -518,14 +528,13 @@ class KeywordListViewSet(
 
         if self.request.query_params.get("free_text"):
             val = self.request.query_params.get("free_text")
-            # no need to search English if there are accented letters
-            langs = (
-                ["fi", "sv"]
-                if re.search("[\u00c0-\u00ff]", val)
-                else ["fi", "sv", "en"]
+            keyword_ids, complete = resolve_similar_keyword_ids(val)
+            if complete:
+                # Only the cached candidates need their similarity computed
+                queryset = queryset.filter(id__in=keyword_ids)
+            queryset = queryset.annotate(simile=get_keyword_similarity(val)).filter(
+                simile__gt=KEYWORD_SIMILARITY_THRESHOLD
             )
-            tri = [TrigramSimilarity(f"name_{i}", val) for i in langs]
-            queryset = queryset.annotate(simile=Greatest(*tri)).filter(simile__gt=0.2)
             self.ordering_fields = ("simile", *self.ordering_fields)
             self.ordering = ("-simile", *self.ordering)
 
@@ -536,7 +545,7 @@ class KeywordListViewSet(
         )
         if val:
             # Also consider alternative labels to broaden the search!
-            qset = _text_qset_by_translated_field("name", val) | Q(
+            qset = text_qset_by_translated_field("name", val) | Q(
                 alt_labels__name__icontains=val
             )
             queryset = queryset.filter(qset).distinct()
@@ -841,6 +850,7 @@ class PlaceListViewSet(
         "-data_source",
         "name",
     )  # we want to display tprek before osoite etc.
+    allow_cursor_pagination = True
     permission_classes = [
         DataSourceResourceEditPermission & OrganizationUserEditPermission
     ]
@@ -972,9 +982,9 @@ class PlaceListViewSet(
             "filter"
         )
         if val:
-            qset = _text_qset_by_translated_field(
+            qset = text_qset_by_translated_field(
                 "name", val
-            ) | _text_qset_by_translated_field("street_address", val)
+            ) | text_qset_by_translated_field("street_address", val)
             queryset = queryset.filter(qset)
         return queryset
 
@@ -1356,6 +1366,7 @@ class ImageViewSet(
     ordering_fields = ("last_modified_time", "id", "name")
     ordering = ("-last_modified_time",)
     permission_classes = [DataSourceResourceEditPermission & IsObjectEditableByUser]
+    allow_cursor_pagination = True
 
     @extend_schema(
         summary="Return a list of images",
@@ -1569,10 +1580,7 @@ def _terms_to_regex(terms, operator: Literal["AND", "OR"]):
     vals = terms.split(",")
     valexprs = []
     for val in vals:
-        if len(val) < 8:
-            e = 1
-        else:
-            e = 2
+        e = get_max_term_edits(val) + 1
         escaped_val = regex.escape(val)
         expr = r"(\b" + f"({escaped_val}){{e<{e}}})"
         valexprs.append(expr)
@@ -1580,18 +1588,21 @@ def _terms_to_regex(terms, operator: Literal["AND", "OR"]):
     return regex.compile(expr, regex.IGNORECASE)
 
 
+def _get_ongoing_event_ids(cache_names, terms, operator):
+    rc = _terms_to_regex(terms, operator)
+    return search_ongoing_events(cache_names, rc, terms, operator)
+
+
 def _get_queryset_from_cache(params, param, cache_name, operator, queryset):
     val = params.get(param, None)
     if not val:
         return queryset
 
-    cache_values = cache.get(cache_name)
-    if not cache_values:
+    ids = _get_ongoing_event_ids([cache_name], val, operator)
+    if ids is None:
         logger.error(f"Missed cache {cache_name}")
         return queryset
 
-    rc = _terms_to_regex(val, operator)
-    ids = {k for k, v in cache_values.items() if rc.search(v, concurrent=True)}
     queryset = queryset.filter(id__in=ids)
 
     return queryset
@@ -1602,16 +1613,11 @@ def _get_queryset_from_cache_many(params, param, cache_name, operator, queryset)
     if not val:
         return queryset
 
-    cache_values = cache.get_many(cache_name)
-    if not cache_values:
+    ids = _get_ongoing_event_ids(cache_name, val, operator)
+    if ids is None:
         logger.error(f"Missed cache {cache_name}")
         return queryset
 
-    rc = _terms_to_regex(val, operator)
-    cached_ids = {k: v for i in cache_values.values() for k, v in i.items()}
-
-    ids = {k for k, v in cached_ids.items() if rc.search(v, concurrent=True)}
-
     queryset = queryset.filter(id__in=ids)
 
     return queryset
@@ -1738,9 +1744,8 @@ def _filter_event_queryset(queryset, params, srs=None):  # noqa: C901
     val = params.get("all_ongoing")
     if val and parse_bool(val, "all_ongoing"):
         cache_name = ["internet_ids", "local_ids"]
-        cache_values = cache.get_many(cache_name)
-        if cache_values:
-            ids = {k for i in cache_values.values() for k, v in i.items()}
+        ids = get_ongoing_event_ids(cache_name)
+        if ids is not None:
             queryset = queryset.filter(id__in=ids)
         else:
             logger.error(f"Missed cache {cache_name}")
@@ -1791,13 +1796,8 @@ def _filter_event_queryset(queryset, params, srs=None):  # noqa: C901
         while f"local_ongoing_OR_set{count}" in params:
             val = params.get(f"local_ongoing_OR_set{count}", None)
             if val:
-                rc = _terms_to_regex(val, "OR")
                 all_ids.append(
-                    {
-                        k
-                        for k, v in cache.get("local_ids").items()
-                        if rc.search(v, concurrent=True)
-                    }
+                    _get_ongoing_event_ids(["local_ids"], val, "OR") or set()
                 )
             count += 1
         ids = set.intersection(*all_ids) if all_ids else set()
@@ -1809,13 +1809,8 @@ def _filter_event_queryset(queryset, params, srs=None):  # noqa: C901
         while f"internet_ongoing_OR_set{count}" in params:
             val = params.get(f"internet_ongoing_OR_set{count}", None)
             if val:
-                rc = _terms_to_regex(val, "OR")
                 all_ids.append(
-                    {
-                        k
-                        for k, v in cache.get("internet_ids").items()
-                        if rc.search(v, concurrent=True)
-                    }
+                    _get_ongoing_event_ids(["internet_ids"], val, "OR") or set()
                 )
             count += 1
         ids = set.intersection(*all_ids) if all_ids else set()
@@ -1827,14 +1822,9 @@ def _filter_event_queryset(queryset, params, srs=None):  # noqa: C901
         while f"all_ongoing_OR_set{count}" in params:
             val = params.get(f"all_ongoing_OR_set{count}", None)
             if val:
-                rc = _terms_to_regex(val, "OR")
-                cached_ids = {
-                    k: v
-                    for i in cache.get_many(["internet_ids", "local_ids"]).values()
-                    for k, v in i.items()
-                }  # noqa E501
                 all_ids.append(
-                    {k for k, v in cached_ids.items() if rc.search(v, concurrent=True)}
+                    _get_ongoing_event_ids(["internet_ids", "local_ids"], val, "OR")
+                    or set()
                 )
             count += 1
         ids = set.intersection(*all_ids) if all_ids else set()
@@ -1859,70 +1849,19 @@ def _filter_event_queryset(queryset, params, srs=None):  # noqa: C901
     if val and parse_bool(val, "internet_based"):
         queryset = queryset.filter(location__id__contains="internet")
 
-    #  Filter by event translated fields and keywords combined. The code is
-    #  repeated as this is the first iteration, which will be replaced by a similarity
-    #  based search on the index.
+    #  Filter by event translated fields and keywords combined.
     val = params.get("combined_text", None)
     if val:
-        val = val.lower()
-        vals = val.split(",")
-
-        combined_q = Q()
-        for val in vals:
-            val_q = Q()
-            # Free string search from all translated event fields
-            event_fields = EventTranslationOptions.fields
-            for field in event_fields:
-                # check all languages for each field
-                val_q |= _text_qset_by_translated_field(field, val)
-
-            # Free string search from all translated place fields
-            place_fields = PlaceTranslationOptions.fields
-            for field in place_fields:
-                location_field = "location__" + field
-                # check all languages for each field
-                val_q |= _text_qset_by_translated_field(location_field, val)
-
-            langs = (
-                ["fi", "sv"]
-                if re.search("[\u00c0-\u00ff]", val)
-                else ["fi", "sv", "en"]
-            )
-            tri = [TrigramSimilarity(f"name_{i}", val) for i in langs]
-            keywords = list(
-                Keyword.objects.annotate(simile=Greatest(*tri))
-                .filter(simile__gt=0.2)
-                .order_by("-simile")[:3]
-            )
-
-            val_q |= Q(keywords__in=keywords)
-
-            combined_q &= val_q
-
-        # FYI: Biggest slowdown in this filter is the ordering of keywords simile
-        queryset = queryset.filter(
-            Exists(Event.objects.filter(combined_q, id=OuterRef("pk")).only("id"))
-        )
+        queryset = filter_events_by_combined_text(queryset, val)
 
     val = params.get("text", None)
     if val:
-        val = val.lower()
-        qset = Q()
+        queryset = filter_events_by_text(queryset, val)
 
-        # Free string search from all translated event fields
-        event_fields = EventTranslationOptions.fields
-        for field in event_fields:
-            # check all languages for each field
-            qset |= _text_qset_by_translated_field(field, val)
-
-        # Free string search from all translated place fields
-        place_fields = PlaceTranslationOptions.fields
-        for field in place_fields:
-            location_field = "location__" + field
-            # check all languages for each field
-            qset |= _text_qset_by_translated_field(location_field, val)
-
-        queryset = queryset.filter(qset)
+    # Ranked text search results are ordered by relevance unless another
+    # ordering is requested. Cursors only support model field orderings.
+    if "sort" not in params and "cursor" not in params:
+        queryset = order_by_rank(queryset)
 
     val = params.get("ids", None)
     if val:
@@ -2357,6 +2296,7 @@ class EventViewSet(
     )
     ordering = ("-last_modified_time",)
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [DOCXRenderer]
+    allow_cursor_pagination = True
     permission_classes = [DataSourceResourceEditPermission]
     permit_regular_user_edit = True
 
@@ -3049,7 +2989,9 @@ class EventViewSet(
                     "Search (case insensitive) through all multilingual text fields "
                     "(name, description, short_description, info_url) of an event "
                     "(every language). Multilingual fields contain the text that users are "  # noqa: E501
-                    "expected to care about, thus multilinguality is useful discriminator."  # noqa: E501
+                    "expected to care about, thus multilinguality is useful discriminator. "  # noqa: E501
+                    "If the legacy text search is disabled on the server, words are matched "  # noqa: E501
+                    "with full text search and the results are ordered by relevance."
                 ),
             ),
             OpenApiParameter(
@@ -3057,7 +2999,9 @@ class EventViewSet(
                 type=OpenApiTypes.STR,
                 description=(
                     "Search for events with exact text match for event text fields but retrieves "  # noqa: E501
-                    "expected keywords on the basis of similarity."
+                    "expected keywords on the basis of similarity. If the legacy text search "  # noqa: E501
+                    "is disabled on the server, the text fields are matched with full text "  # noqa: E501
+                    "search and the results are ordered by relevance."
                 ),
             ),
             OpenApiParameter(
@@ -3258,8 +3202,42 @@ class EventViewSet(
                 raise ParseError({"detail": _("Only one location allowed.")})
             serializer = self.get_serializer(queryset, many=True)
             return Response(serializer.data)
+        if (
+            is_event_query_cache_enabled()
+            and not request.user.is_authenticated
+            and self.paginator.cursor_query_param not in request.query_params
+        ):
+            return self._list_from_cached_ids(request, *args, **kwargs)
         return super().list(request, *args, **kwargs)
 
+    def _list_from_cached_ids(self, request, *args, **kwargs):
+        """
+        List events by paginating the cached ids matched by the query and only
+        fetching the events on the requested page.
+        """
+        cache_key = get_event_query_cache_key(request.query_params)
+        event_ids = get_cached_event_ids(cache_key)
+        if event_ids is None:
+            max_ids = settings.EVENT_QUERY_CACHE_MAX_IDS
+            queryset = self.filter_queryset(self.get_queryset())
+            event_ids = list(queryset.values_list("id", flat=True)[: max_ids + 1])
+            if len(event_ids) > max_ids:
+                event_ids = TOO_MANY_RESULTS
+            cache_event_ids(cache_key, event_ids)
+
+        if event_ids == TOO_MANY_RESULTS:
+            return super().list(request, *args, **kwargs)
+
+        page_ids = self.paginator.paginate_queryset(event_ids, request, view=self)
+        events_by_id = {
+            event.id: event for event in self.get_queryset().filter(id__in=page_ids)
+        }
+        events = [events_by_id[i] for i in page_ids if i in events_by_id]
+        self._add_audit_logged_object_ids(events)
+
+        serializer = self.get_serializer(events, many=True)
+        return self.get_paginated_response(serializer.data)
+
     def finalize_response(self, request, response, *args, **kwargs):
         # Switch to normal renderer for docx errors.
         response = super().finalize_response(request, response, *args, **kwargs)
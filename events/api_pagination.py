@@ -1,8 +1,68 @@
+import base64
+import binascii
+import hashlib
+import json
+import urllib.parse
 from collections import OrderedDict
+from datetime import date, datetime, time
+from decimal import Decimal
 
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q, QuerySet
 from django.utils.translation import gettext_lazy as _
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound, ParseError
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+COUNT_EXACT = "exact"
+COUNT_CACHED = "cached"
+COUNT_ESTIMATE = "estimate"
+COUNT_NONE = "none"
+# Page numbers need a count, only cursors can skip it
+PAGE_COUNT_CHOICES = (COUNT_EXACT, COUNT_CACHED, COUNT_ESTIMATE)
+CURSOR_COUNT_CHOICES = (*PAGE_COUNT_CHOICES, COUNT_NONE)
+
+
+def estimate_count(queryset) -> int:
+    """Return the number of rows the query planner expects the queryset to return."""
+    plan = json.loads(queryset.order_by().explain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def get_count_cache_key(request) -> str:
+    """
+    Return a cache key for the result count of the request. Pagination
+    parameters do not change the count and are left out of the key.
+    """
+    ignored = ("page", "page_size", "cursor", "count")
+    params = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        if key not in ignored
+        for value in values
+    )
+    # Authenticated users may see results that others do not
+    user = request.user.pk if request.user.is_authenticated else ""
+    query = f"{request.path}?{urllib.parse.urlencode(params)}&user={user}"
+    return f"pagination_count:{hashlib.sha256(query.encode()).hexdigest()}"
+
+
+def _encode_cursor_value(value):
+    # DjangoJSONEncoder truncates datetimes to milliseconds, which would make
+    # the keyset skip or repeat rows.
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _get_ordering_params(ordering) -> list[str]:
+    return [f"-{field.attname}" if desc else field.attname for field, desc in ordering]
 
 
 # This needs to be in its own file because of circular
@@ -15,10 +75,224 @@ class CustomPagination(pagination.PageNumberPagination):
         "Number of results to return per page. %(max_page_size)s is the maximum value for page_size."  # noqa: E501
     ) % {"max_page_size": max_page_size}
 
+    cursor_query_param = "cursor"
+    cursor_query_description = _(
+        "Use keyset pagination instead of page numbers. Give an empty cursor to get "
+        "the first page and follow the next links to get the following pages. Only "
+        "orderings by the fields of the listed resource are supported."
+    )
+    count_query_param = "count"
+    count_query_description = _(
+        "How to count the results. exact counts all the results, cached reuses "
+        "a recently counted result for the same query and estimate returns the "
+        "estimate of the database for large results. With a cursor, none (the "
+        "default) skips counting. The used strategy is returned in "
+        "meta.count_strategy."
+    )
+
+    use_cursor = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = self.cursor_query_param in request.query_params and getattr(
+            view, "allow_cursor_pagination", False
+        )
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        if not self.use_cursor:
+            return self.paginate_queryset_by_page(queryset, request, page_size)
+
+        ordering = self.get_cursor_ordering(queryset)
+        queryset = queryset.order_by(*_get_ordering_params(ordering))
+        self.count, self.count_strategy = self.count_results(queryset, request)
+
+        position = self.decode_cursor(request, ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(ordering, position))
+
+        results = list(queryset[: page_size + 1])
+        self.cursor_ordering = ordering
+        self.next_position = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            self.next_position = [
+                getattr(results[-1], field.attname) for field, _desc in ordering
+            ]
+        return results
+
+    def paginate_queryset_by_page(self, queryset, request, page_size):
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Paginator.count is a cached property, overriding it makes the
+        # paginator use the count of the chosen strategy
+        paginator.count, self.count_strategy = self.count_results(queryset, request)
+        self.count = paginator.count
+        page_number = self.get_page_number(request, paginator)
+
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            )
+            raise NotFound(msg)
+
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+
+        return list(self.page)
+
+    def get_cursor_ordering(self, queryset):
+        """
+        Return the ordering of the queryset as (field, descending) pairs with
+        the primary key appended as a tie-breaker.
+        """
+        opts = queryset.model._meta
+        ordering = []
+        for item in queryset.query.order_by or opts.ordering:
+            if not isinstance(item, str):
+                raise ParseError(_("The ordering is not supported with a cursor."))
+            name = item.lstrip("-")
+            try:
+                field = opts.pk if name == "pk" else opts.get_field(name)
+            except FieldDoesNotExist:
+                field = None
+            if field is None or not field.concrete or field.many_to_many:
+                raise ParseError(
+                    _("Ordering by %(field)s is not supported with a cursor.")
+                    % {"field": name}
+                )
+            ordering.append((field, item.startswith("-")))
+
+        if not any(field.primary_key for field, _desc in ordering):
+            ordering.append((opts.pk, False))
+        return ordering
+
+    def get_count_strategy(self, request):
+        if self.use_cursor:
+            default, choices = COUNT_NONE, CURSOR_COUNT_CHOICES
+        else:
+            default, choices = settings.PAGINATION_COUNT_STRATEGY, PAGE_COUNT_CHOICES
+
+        strategy = request.query_params.get(self.count_query_param) or default
+        if strategy not in choices:
+            raise ParseError(
+                _("Invalid count. Allowed values are: %(choices)s.")
+                % {"choices": ", ".join(choices)}
+            )
+        return strategy
+
+    def count_results(self, queryset, request):
+        """
+        Count the results with the requested strategy and return the count
+        together with the strategy that was actually used.
+        """
+        strategy = self.get_count_strategy(request)
+        if strategy == COUNT_NONE:
+            return None, COUNT_NONE
+        if not isinstance(queryset, QuerySet):
+            return len(queryset), COUNT_EXACT
+
+        if strategy == COUNT_CACHED:
+            cache_key = get_count_cache_key(request)
+            count = cache.get(cache_key)
+            if count is None:
+                count = queryset.count()
+                cache.set(
+                    cache_key, count, timeout=settings.PAGINATION_COUNT_CACHE_TIMEOUT
+                )
+            return count, COUNT_CACHED
+
+        if strategy == COUNT_ESTIMATE:
+            # Estimates are inaccurate for small results, which are cheap to count
+            count = estimate_count(queryset)
+            if count > settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD:
+                return count, COUNT_ESTIMATE
+
+        return queryset.count(), COUNT_EXACT
+
+    def encode_cursor(self, ordering, position):
+        data = {
+            "o": _get_ordering_params(ordering),
+            "v": [_encode_cursor_value(value) for value in position],
+        }
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+    def decode_cursor(self, request, ordering):
+        """
+        Return the ordering values of the last row of the previous page, or
+        None for the first page.
+        """
+        cursor = request.query_params[self.cursor_query_param]
+        if not cursor:
+            return None
+
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            params, values = data["o"], data["v"]
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise ParseError(_("Invalid cursor."))
+
+        if (
+            params != _get_ordering_params(ordering)
+            or not isinstance(values, list)
+            or len(values) != len(ordering)
+        ):
+            raise ParseError(_("The cursor does not match the ordering."))
+
+        try:
+            return [
+                None if value is None else field.to_python(value)
+                for (field, _desc), value in zip(ordering, values)
+            ]
+        except ValidationError:
+            raise ParseError(_("Invalid cursor."))
+
+    @staticmethod
+    def get_keyset_filter(ordering, position):
+        """
+        Return a filter for the rows after the given position. NULLs follow
+        the PostgreSQL defaults: last in ascending and first in descending order.
+        """
+        keyset_filter = Q(pk__in=[])
+        equal = Q()
+        for (field, desc), value in zip(ordering, position):
+            name = field.attname
+            if value is None:
+                after = Q(**{f"{name}__isnull": False}) if desc else Q(pk__in=[])
+                same = Q(**{f"{name}__isnull": True})
+            else:
+                after = Q(**{f"{name}__lt" if desc else f"{name}__gt": value})
+                if field.null and not desc:
+                    after |= Q(**{f"{name}__isnull": True})
+                same = Q(**{name: value})
+            keyset_filter |= equal & after
+            equal &= same
+        return keyset_filter
+
+    def get_next_link(self):
+        if not self.use_cursor:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        cursor = self.encode_cursor(self.cursor_ordering, self.next_position)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_previous_link(self):
+        # Cursors only go forward
+        if self.use_cursor:
+            return None
+        return super().get_previous_link()
+
     def get_paginated_response(self, data):
         meta = OrderedDict(
             [
-                ("count", self.page.paginator.count),
+                ("count", self.count),
+                ("count_strategy", self.count_strategy),
                 ("next", self.get_next_link()),
                 ("previous", self.get_previous_link()),
             ]
@@ -26,6 +300,31 @@ class CustomPagination(pagination.PageNumberPagination):
 
         return Response(OrderedDict([("meta", meta), ("data", data)]))
 
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        count_choices = PAGE_COUNT_CHOICES
+        if getattr(view, "allow_cursor_pagination", False):
+            count_choices = CURSOR_COUNT_CHOICES
+            parameters.append(
+                {
+                    "name": self.cursor_query_param,
+                    "required": False,
+                    "in": "query",
+                    "description": str(self.cursor_query_description),
+                    "schema": {"type": "string"},
+                }
+            )
+        parameters.append(
+            {
+                "name": self.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": str(self.count_query_description),
+                "schema": {"type": "string", "enum": list(count_choices)},
+            }
+        )
+        return parameters
+
     def get_paginated_response_schema(self, schema):
         return {
             "type": "object",
@@ -35,8 +334,14 @@ class CustomPagination(pagination.PageNumberPagination):
                     "properties": {
                         "count": {
                             "type": "integer",
+                            "nullable": True,
                             "example": 0,
                         },
+                        "count_strategy": {
+                            "type": "string",
+                            "enum": list(CURSOR_COUNT_CHOICES),
+                            "example": COUNT_EXACT,
+                        },
                         "next": {
                             "type": "string",
                             "nullable": True,
@@ -0,0 +1,82 @@
+"""
+Deferred side effects of saving events in bulk.
+
+Saving an event marks the event counts of its places and keywords for
+recounting, updates the search index and may send notifications, each with its
+own queries or requests for every saved event. Inside bulk_event_save(), these
+side effects are only collected and then applied once for all the saved events
+when the outermost bulk_event_save() exits.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+from django.apps import apps
+
+from events.query_cache import invalidate_event_query_cache
+
+_local = threading.local()
+
+
+class BulkEventSave:
+    def __init__(self) -> None:
+        self.place_ids = set()
+        self.keyword_ids = set()
+        self.indexed_event_ids = set()
+        self.notifications = []
+        self.events_saved = False
+
+    def add_notification(self, event, method_name: str) -> None:
+        self.notifications.append((event, method_name))
+
+    def flush(self, notify: bool = True) -> None:
+        if self.place_ids:
+            apps.get_model("events", "Place").objects.filter(
+                id__in=self.place_ids
+            ).update(n_events_changed=True)
+
+        if self.keyword_ids:
+            apps.get_model("events", "Keyword").objects.filter(
+                id__in=self.keyword_ids
+            ).update(n_events_changed=True)
+
+        if self.events_saved:
+            invalidate_event_query_cache()
+
+        if self.indexed_event_ids:
+            from events.signal_processors import update_event_index
+
+            update_event_index(self.indexed_event_ids)
+
+        if notify:
+            for event, method_name in self.notifications:
+                getattr(event, method_name)()
+
+
+def get_bulk_event_save() -> Optional[BulkEventSave]:
+    return getattr(_local, "bulk_event_save", None)
+
+
+@contextmanager
+def bulk_event_save():
+    """
+    Defer the side effects of the events saved inside the block until the block
+    exits. Nested blocks join the outermost one.
+
+    If the block raises, the notifications are not sent, but the event counts
+    are marked for recounting and the search index is updated from the current
+    state of the saved events.
+    """
+    if get_bulk_event_save() is not None:
+        yield get_bulk_event_save()
+        return
+
+    state = _local.bulk_event_save = BulkEventSave()
+    succeeded = False
+    try:
+        yield state
+        succeeded = True
+    finally:
+        _local.bulk_event_save = None
+        state.flush(notify=succeeded)
@@ -9,7 +9,7 @@ import django_filters
 from django.conf import settings
 from django.contrib.gis.geos import Point
 from django.contrib.gis.measure import D
-from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.contrib.postgres.search import SearchRank
 from django.db.models import (
     Case,
     DurationField,
@@ -29,6 +29,7 @@ from rest_framework import serializers
 from rest_framework.exceptions import ParseError
 
 from events.models import Event, Place
+from events.search import full_text_query
 from events.widgets import DistanceWithinWidget
 from linkedevents.filters import LinkedEventsOrderingFilter
 
@@ -403,15 +404,7 @@ class EventFilter(django_filters.rest_framework.FilterSet):
                 }
             )
 
-        config_map = {
-            "fi": "finnish",
-            "en": "english",
-            "sv": "swedish",
-        }
-        search_vector_name = f"full_text__search_vector_{language}"
-        search_query = SearchQuery(
-            value, search_type="websearch", config=config_map[language]
-        )
+        search_vector_name, search_query = full_text_query(value, language)
         search_rank = SearchRank(F(search_vector_name), search_query)
 
         # Warning: order matters, annotate should follow filter
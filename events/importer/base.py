@@ -3,7 +3,8 @@ import logging
 import operator
 import os
 from collections import defaultdict, namedtuple
-from functools import partial
+from functools import cached_property, partial
+from typing import Optional
 
 import pytz
 from django.conf import settings
@@ -13,6 +14,9 @@ from django.db import transaction
 from modeltranslation.translator import translator
 from rest_framework.exceptions import ValidationError
 
+from events.importer.batch import EventSaveBatch, get_event_key
+from events.importer.http import ImporterHTTPClient
+from events.importer.http_cache import ResponseCache
 from events.importer.sync import ModelSyncher
 from events.models import Event, EventLink, Image, Language, Offer, Place
 
@@ -30,6 +34,10 @@ EXTENSION_COURSE_FIELDS = (
 )
 LOCAL_TZ = pytz.timezone(settings.TIME_ZONE)
 
+# The number of events whose current state is fetched and whose related objects
+# are written at once by Importer.save_events()
+SAVE_EVENTS_CHUNK_SIZE = 500
+
 
 # Using a recursive default dictionary
 # allows easy updating of the same data keys
@@ -86,6 +94,32 @@ class Importer(object):
     def setup(self):
         pass
 
+    def get_http_cache(self) -> Optional[ResponseCache]:
+        """
+        The on-disk response cache of the importer when importing with --cached
+        or replaying a cached import with --replay
+        """
+        if not (self.options.get("cached") or self.options.get("replay")):
+            return None
+
+        cache_dir = (
+            self.options.get("cache_dir")
+            or settings.IMPORTER_HTTP_CACHE_DIR
+            or os.path.join(self.options["data_path"], "http_cache")
+        )
+        return ResponseCache(
+            os.path.join(cache_dir, self.name),
+            ttl=settings.IMPORTER_HTTP_CACHE_TTL,
+            offline=bool(self.options.get("replay")),
+        )
+
+    @cached_property
+    def http(self) -> ImporterHTTPClient:
+        """The pooled HTTP client of the importer. Use it for all requests."""
+        return ImporterHTTPClient(
+            timeout=self.default_timeout, cache=self.get_http_cache()
+        )
+
     @staticmethod
     def _set_multiscript_field(string, event, languages, field):
         """
@@ -319,17 +353,18 @@ class Importer(object):
                 continue
             self._set_field(obj, field_name, info[field_name])
 
-    def _replace_deprecated_keywords(self, obj, attr):
+    def _replace_deprecated_keywords(self, obj, attr, batch):
         """Check the keywords in the given attribute and replace or delete
         deprecated ones.
         """
+        keyword_ids = batch.get_m2m_ids(obj, attr)
         changed = False
 
-        for keyword in getattr(obj, attr).filter(deprecated=True):
-            getattr(obj, attr).remove(keyword)
+        for keyword in batch.get_deprecated_keywords(keyword_ids):
+            keyword_ids.discard(keyword.pk)
             replacement_keyword = keyword.get_replacement()
             if replacement_keyword and not replacement_keyword.deprecated:
-                getattr(obj, attr).add(replacement_keyword)
+                keyword_ids.add(replacement_keyword.pk)
                 logger.warning(
                     f"Replacing deprecated keyword {keyword.pk} with "
                     f"{replacement_keyword.pk} from attribute '{attr}' for event {obj}."
@@ -341,22 +376,79 @@ class Importer(object):
                 )
             changed = True
 
-        if changed and attr not in obj._changed_fields:
-            obj._changed = True
+        if changed:
+            batch.set_m2m_ids(obj, attr, keyword_ids)
+            if attr not in obj._changed_fields:
+                obj._changed = True
+                obj._changed_fields.append(attr)
+
+    def _update_m2m_ids(self, obj, attr, new_ids, batch):
+        old_ids = batch.get_m2m_ids(obj, attr)
+        if new_ids != old_ids:
+            if obj.is_user_edited():
+                # this prevents overwriting manually added keywords, audience and
+                # languages
+                if not new_ids <= old_ids:
+                    batch.set_m2m_ids(obj, attr, old_ids | new_ids)
+                    obj._changed = True
+            else:
+                batch.set_m2m_ids(obj, attr, new_ids)
+                obj._changed = True
             obj._changed_fields.append(attr)
 
+    def save_event(self, info):
+        return self.save_events([info])[0]
+
+    def save_events(self, infos):
+        """
+        Save the given events and return the saved Event objects in the same
+        order. The events are saved in chunks: the current state of the events of
+        a chunk is fetched at once, and the changes to their keywords, audience,
+        languages, offers and external links are written at once.
+        """
+        objs = []
+        for chunk in self._iter_event_chunks(infos):
+            objs.extend(self._save_event_chunk(chunk))
+        return objs
+
+    @staticmethod
+    def _iter_event_chunks(infos):
+        # An event given again is saved in a new chunk to compare it to the
+        # saved state of the previous one
+        chunk = []
+        event_keys = set()
+        for info in infos:
+            event_key = get_event_key(info)
+            if len(chunk) >= SAVE_EVENTS_CHUNK_SIZE or event_key in event_keys:
+                yield chunk
+                chunk = []
+                event_keys = set()
+            chunk.append(info)
+            event_keys.add(event_key)
+        if chunk:
+            yield chunk
+
     @transaction.atomic
-    def save_event(self, info):  # noqa: C901
-        info = info.copy()
+    def _save_event_chunk(self, infos):
+        infos = [info.copy() for info in infos]
+        batch = EventSaveBatch(infos)
+        objs = [self._update_event(info, batch) for info in infos]
 
-        args = dict(data_source=info["data_source"], origin_id=info["origin_id"])
+        batch.flush()
+
+        for obj in objs:
+            self._finish_saving_event(obj)
+
+        return objs
+
+    def _update_event(self, info, batch):  # noqa: C901
         obj_id = "%s:%s" % (info["data_source"].id, info["origin_id"])
-        try:
-            obj = Event.objects.get(**args)
+        obj = batch.get_event(info)
+        if obj:
             obj._created = False
             assert obj.id == obj_id
-        except Event.DoesNotExist:
-            obj = Event(**args)
+        else:
+            obj = Event(data_source=info["data_source"], origin_id=info["origin_id"])
             obj._created = True
             obj.id = obj_id
         obj._changed = False
@@ -415,6 +507,7 @@ class Importer(object):
             except ValidationError as error:
                 logger.error("Event {} could not be saved: {}".format(obj, error))
                 raise
+            batch.add_event(obj)
 
         # many-to-many fields
 
@@ -423,46 +516,15 @@ class Importer(object):
             self.set_images(obj, info["images"])
 
         keywords = info.get("keywords", [])
-        new_keywords = set([kw.id for kw in keywords])
-        old_keywords = set(obj.keywords.values_list("id", flat=True))
-        if new_keywords != old_keywords:
-            if obj.is_user_edited():
-                # this prevents overwriting manually added keywords
-                if not new_keywords <= old_keywords:
-                    obj.keywords.add(*new_keywords)
-                    obj._changed = True
-            else:
-                obj.keywords.set(new_keywords)
-                obj._changed = True
-            obj._changed_fields.append("keywords")
-        self._replace_deprecated_keywords(obj, "keywords")
+        self._update_m2m_ids(obj, "keywords", {kw.id for kw in keywords}, batch)
+        self._replace_deprecated_keywords(obj, "keywords", batch)
         audience = info.get("audience", [])
-        new_audience = set([kw.id for kw in audience])
-        old_audience = set(obj.audience.values_list("id", flat=True))
-        if new_audience != old_audience:
-            if obj.is_user_edited():
-                # this prevents overwriting manually added audience
-                if not new_audience <= old_audience:
-                    obj.audience.add(*new_audience)
-                    obj._changed = True
-            else:
-                obj.audience.set(new_audience)
-                obj._changed = True
-            obj._changed_fields.append("audience")
-        self._replace_deprecated_keywords(obj, "audience")
+        self._update_m2m_ids(obj, "audience", {kw.id for kw in audience}, batch)
+        self._replace_deprecated_keywords(obj, "audience", batch)
         in_language = info.get("in_language", [])
-        new_languages = set([lang.id for lang in in_language])
-        old_languages = set(obj.in_language.values_list("id", flat=True))
-        if new_languages != old_languages:
-            if obj.is_user_edited():
-                # this prevents overwriting manually added languages
-                if not new_languages <= old_languages:
-                    obj.in_language.add(*new_languages)
-                    obj._changed = True
-            else:
-                obj.in_language.set(in_language)
-                obj._changed = True
-            obj._changed_fields.append("in_language")
+        self._update_m2m_ids(
+            obj, "in_language", {lang.id for lang in in_language}, batch
+        )
 
         # one-to-many fields with foreign key pointing to event
 
@@ -473,27 +535,20 @@ class Importer(object):
             offers.append(offer_obj)
 
         val = operator.methodcaller("simple_value")
-        if set(map(val, offers)) != set(map(val, obj.offers.all())):
+        old_offers = batch.get_offers(obj)
+        if set(map(val, offers)) != set(map(val, old_offers)):
             # this prevents overwriting manually added offers. do not update offers if
             # we have added ones
-            if (
-                not obj.is_user_edited()
-                or len(set(map(val, offers))) >= obj.offers.count()
+            if not obj.is_user_edited() or len(set(map(val, offers))) >= len(
+                old_offers
             ):
-                obj.offers.all().delete()
-                Offer.objects.bulk_create(offers)
+                batch.set_offers(obj, offers)
                 obj._changed = True
                 obj._changed_fields.append("offers")
 
         if info["external_links"]:
             ExternalLink = namedtuple("ExternalLink", ["language", "name", "url"])
 
-            def list_obj_links(obj):
-                links = set()
-                for link in obj.external_links.all():
-                    links.add(ExternalLink(link.language.id, link.name, link.link))
-                return links
-
             def list_external_links(external_links):
                 links = set()
                 for language in external_links.keys():
@@ -506,9 +561,8 @@ class Importer(object):
                 return links
 
             new_links = list_external_links(info["external_links"])
-            old_links = list_obj_links(obj)
+            old_links = batch.get_links(obj)
             if not obj.is_user_edited() and new_links != old_links:
-                obj.external_links.all().delete()
                 new_link_objects = []
                 for link in new_links:
                     if len(link.url) > 200:
@@ -524,7 +578,7 @@ class Importer(object):
                             link=link.url,
                         )
                     )
-                EventLink.objects.bulk_create(new_link_objects)
+                batch.set_links(obj, new_link_objects)
                 obj._changed = True
                 obj._changed_fields.append("links")
 
@@ -566,6 +620,10 @@ class Importer(object):
         if status:
             self._set_field(obj, "event_status", status)
 
+        return obj
+
+    @staticmethod
+    def _finish_saving_event(obj):
         if obj._changed or obj._created:
             # Finally, we must save the whole object, even when only related fields changed.  # noqa: E501
             # Also, we want to log all that happened.
@@ -580,8 +638,6 @@ class Importer(object):
                 verb = "changed (fields: %s)" % ", ".join(obj._changed_fields)
             logger.debug("{} {}".format(obj, verb))
 
-        return obj
-
     @transaction.atomic
     def save_place(self, info):
         args = dict(data_source=info["data_source"], origin_id=info["origin_id"])
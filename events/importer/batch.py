@@ -0,0 +1,214 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+from events.bulk import get_bulk_event_save
+from events.models import Event, EventLink, Keyword, Offer
+
+EVENT_M2M_FIELDS = ("keywords", "audience", "in_language")
+KEYWORD_M2M_FIELDS = ("keywords", "audience")
+
+
+def get_event_key(info) -> tuple:
+    return info["data_source"].id, str(info["origin_id"])
+
+
+class EventSaveBatch:
+    """
+    The current state of a chunk of imported events and their related objects.
+
+    The existing events, their many-to-many relations, offers and external links
+    are fetched with one query each for the whole chunk. Importer.save_events()
+    compares the imported data to this state in Python and records the changes
+    here. flush() then writes the changed relations with a few queries for the
+    whole chunk.
+    """
+
+    def __init__(self, infos: list[dict]) -> None:
+        data_source_ids = {info["data_source"].id for info in infos}
+        origin_ids = {str(info["origin_id"]) for info in infos}
+        self.events = {
+            (event.data_source_id, event.origin_id): event
+            for event in Event.objects.filter(
+                data_source_id__in=data_source_ids, origin_id__in=origin_ids
+            )
+            .select_related("data_source")
+            .prefetch_related("images")
+        }
+        event_ids = [event.id for event in self.events.values()]
+
+        self._initial_m2m_ids = {}
+        self._m2m_ids = {}
+        for field_name in EVENT_M2M_FIELDS:
+            ids = defaultdict(set)
+            for event_id, related_id in self._get_through_queryset(
+                field_name, event_ids
+            ):
+                ids[event_id].add(related_id)
+            self._initial_m2m_ids[field_name] = ids
+            self._m2m_ids[field_name] = {
+                event_id: set(related_ids) for event_id, related_ids in ids.items()
+            }
+
+        self._offers = defaultdict(list)
+        for offer in Offer.objects.filter(event_id__in=event_ids).order_by("pk"):
+            self._offers[offer.event_id].append(offer)
+        self._new_offers = {}
+
+        self._links = defaultdict(set)
+        for event_id, language_id, name, link in EventLink.objects.filter(
+            event_id__in=event_ids
+        ).values_list("event_id", "language_id", "name", "link"):
+            self._links[event_id].add((language_id, name, link))
+        self._new_links = {}
+
+        # Deprecated keywords among the current and the imported keywords
+        keyword_ids = {
+            keyword_id
+            for field_name in KEYWORD_M2M_FIELDS
+            for ids in self._initial_m2m_ids[field_name].values()
+            for keyword_id in ids
+        } | {
+            keyword.id
+            for info in infos
+            for field_name in KEYWORD_M2M_FIELDS
+            for keyword in info.get(field_name, [])
+        }
+        self._checked_keyword_ids = set()
+        self._deprecated_keywords = {}
+        self._fetch_deprecated_keywords(keyword_ids)
+
+    @staticmethod
+    def _get_through_field_names(field_name: str) -> tuple[str, str]:
+        field = Event._meta.get_field(field_name)
+        return f"{field.m2m_field_name()}_id", f"{field.m2m_reverse_field_name()}_id"
+
+    def _get_through_queryset(self, field_name: str, event_ids):
+        event_field, related_field = self._get_through_field_names(field_name)
+        through = getattr(Event, field_name).through
+        return through.objects.filter(**{f"{event_field}__in": event_ids}).values_list(
+            event_field, related_field
+        )
+
+    def _fetch_deprecated_keywords(self, keyword_ids) -> None:
+        keyword_ids = set(keyword_ids) - self._checked_keyword_ids
+        if not keyword_ids:
+            return
+
+        self._checked_keyword_ids |= keyword_ids
+        self._deprecated_keywords.update(
+            (keyword.id, keyword)
+            for keyword in Keyword.objects.filter(pk__in=keyword_ids, deprecated=True)
+        )
+
+    def get_event(self, info):
+        return self.events.get(get_event_key(info))
+
+    def add_event(self, event) -> None:
+        self.events[(event.data_source_id, event.origin_id)] = event
+
+    def get_m2m_ids(self, event, field_name: str) -> set:
+        return set(self._m2m_ids[field_name].get(event.id, ()))
+
+    def set_m2m_ids(self, event, field_name: str, ids) -> None:
+        self._m2m_ids[field_name][event.id] = set(ids)
+
+    def get_deprecated_keywords(self, keyword_ids) -> list:
+        self._fetch_deprecated_keywords(keyword_ids)
+        return [
+            self._deprecated_keywords[keyword_id]
+            for keyword_id in sorted(keyword_ids)
+            if keyword_id in self._deprecated_keywords
+        ]
+
+    def get_offers(self, event) -> list:
+        return self._offers.get(event.id, [])
+
+    def set_offers(self, event, offers) -> None:
+        self._offers[event.id] = self._new_offers[event.id] = offers
+
+    def get_links(self, event) -> set:
+        return self._links.get(event.id, set())
+
+    def set_links(self, event, links) -> None:
+        self._links[event.id] = {
+            (link.language_id, link.name, link.link) for link in links
+        }
+        self._new_links[event.id] = links
+
+    def _flush_m2m(self, field_name: str) -> tuple[set, set]:
+        """Write the changed relations, return the changed related and event ids."""
+        event_field, related_field = self._get_through_field_names(field_name)
+        through = getattr(Event, field_name).through
+        initial_ids = self._initial_m2m_ids[field_name]
+
+        removed = []
+        added = []
+        changed_ids = set()
+        changed_event_ids = set()
+        for event_id, ids in self._m2m_ids[field_name].items():
+            old_ids = initial_ids.get(event_id, set())
+            if removed_ids := old_ids - ids:
+                removed.append(
+                    Q(
+                        **{
+                            event_field: event_id,
+                            f"{related_field}__in": removed_ids,
+                        }
+                    )
+                )
+            added.extend(
+                through(**{event_field: event_id, related_field: related_id})
+                for related_id in ids - old_ids
+            )
+            if old_ids != ids:
+                changed_ids |= old_ids ^ ids
+                changed_event_ids.add(event_id)
+
+        if removed:
+            through.objects.filter(reduce(or_, removed)).delete()
+        through.objects.bulk_create(added)
+        return changed_ids, changed_event_ids
+
+    def flush(self) -> None:
+        changed_keyword_ids = set()
+        for field_name in EVENT_M2M_FIELDS:
+            changed_ids, changed_event_ids = self._flush_m2m(field_name)
+            if field_name in KEYWORD_M2M_FIELDS:
+                changed_keyword_ids |= changed_ids
+            if field_name == "keywords" and changed_event_ids:
+                # The same as the m2m_changed signal of the event keywords does
+                Event.objects.filter(pk__in=changed_event_ids).update(
+                    ongoing_cache_changed=True
+                )
+
+        # The same as the m2m_changed signal of the keywords does
+        if changed_keyword_ids:
+            if bulk_save := get_bulk_event_save():
+                bulk_save.keyword_ids |= changed_keyword_ids
+            else:
+                Keyword.objects.filter(pk__in=changed_keyword_ids).update(
+                    n_events_changed=True
+                )
+
+        if self._new_offers:
+            Offer.objects.filter(event_id__in=self._new_offers.keys()).delete()
+            Offer.objects.bulk_create(
+                [offer for offers in self._new_offers.values() for offer in offers]
+            )
+
+        if self._new_links:
+            EventLink.objects.filter(event_id__in=self._new_links.keys()).delete()
+            EventLink.objects.bulk_create(
+                [link for links in self._new_links.values() for link in links]
+            )
+
+        for field_name in EVENT_M2M_FIELDS:
+            self._initial_m2m_ids[field_name] = {
+                event_id: set(ids)
+                for event_id, ids in self._m2m_ids[field_name].items()
+            }
+        self._new_offers = {}
+        self._new_links = {}
@@ -3,6 +3,7 @@ import logging
 import re
 from copy import deepcopy
 from datetime import date, datetime, timedelta
+from functools import cached_property
 from typing import Generator, Optional
 from zoneinfo import ZoneInfo
 
@@ -19,6 +20,8 @@ from events.importer.sync import ModelSyncher
 from events.models import DataSource, Event, Keyword, Place
 
 from .base import Importer, recur_dict, register_importer
+from .http import ImporterHTTPClient
+from .http_cache import ResponseCache
 
 logger = logging.getLogger(__name__)
 
@@ -933,7 +936,10 @@ class EnkoraImporter(Importer):
         :return: None
         """  # noqa: E501
         kurssi_api = self.driver_cls(
-            settings.ENKORA_API_USER, settings.ENKORA_API_PASSWORD, request_timeout=20.0
+            settings.ENKORA_API_USER,
+            settings.ENKORA_API_PASSWORD,
+            request_timeout=20.0,
+            http_cache=self.get_http_cache(),
         )
 
         now_is, self.now_tz_is = self._get_timestamps()
@@ -1119,7 +1125,10 @@ class EnkoraImporter(Importer):
 
     def import_places(self, months_back_from_today: int = 5):
         kurssi_api = self.driver_cls(
-            settings.ENKORA_API_USER, settings.ENKORA_API_PASSWORD, request_timeout=20.0
+            settings.ENKORA_API_USER,
+            settings.ENKORA_API_PASSWORD,
+            request_timeout=20.0,
+            http_cache=self.get_http_cache(),
         )
 
         now_is, self.now_tz_is = self._get_timestamps()
@@ -2353,9 +2362,16 @@ class Enkora:
     default_request_timeout = 5.0
     max_retries = 3
 
-    def __init__(self, username: str, password: str, request_timeout=None):
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        request_timeout=None,
+        http_cache: Optional[ResponseCache] = None,
+    ):
         self._username = username
         self._password = password
+        self._http_cache = http_cache
         self._set_request_timeout(request_timeout)
 
     def _set_request_timeout(self, request_timeout):
@@ -2378,20 +2394,22 @@ class Enkora:
         requests_log.setLevel(logging.DEBUG)
         requests_log.propagate = True
 
-    def _setup_client(self) -> object:
+    def _setup_client(self) -> ImporterHTTPClient:
         headers = {
             "Accept": "application/json",
         }
 
-        s = requests.Session()
-        s.headers.update(headers)
+        return ImporterHTTPClient(headers=headers, cache=self._http_cache)
 
-        return s
+    @cached_property
+    def _http_client(self) -> ImporterHTTPClient:
+        # Reuse the connections for all the requests
+        return self._setup_client()
 
     def _request(
         self, endpoint_url: str, payload: dict, retries=0
     ) -> requests.Response:
-        http_session = self._setup_client()
+        http_client = self._http_client
 
         data = {
             "authentication": (None, "{},{}".format(self._username, self._password)),
@@ -2404,7 +2422,7 @@ class Enkora:
         attempts_left = retries + 1
         while attempts_left > 0:
             try:
-                response = http_session.post(
+                response = http_client.post(
                     endpoint_url, files=data, timeout=self._request_timeout
                 )
                 attempts_left = 0
@@ -2435,8 +2453,14 @@ class Kurssidata(Enkora):
     )
     list_endpoint_url = f"{Enkora.ENDPOINT_BASE_URL}/call/api/getCourseIds"
 
-    def __init__(self, username: str, password: str, request_timeout=None):
-        super().__init__(username, password, request_timeout)
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        request_timeout=None,
+        http_cache: Optional[ResponseCache] = None,
+    ):
+        super().__init__(username, password, request_timeout, http_cache)
         self._set_request_timeout(10.0)
 
     def get_course_by_id(self, course_id: int) -> tuple[dict, list, list]:
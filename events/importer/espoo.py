@@ -3,18 +3,15 @@ import time
 import urllib
 from copy import deepcopy
 from typing import Annotated, Any, Callable, Optional, Type, TypeVar, Union
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urljoin
 
-import requests
 from django.conf import settings
 from django.db import transaction
 from django.db.models import Model
 from django.utils import timezone
 from django_orghierarchy.models import Organization
-from requests.adapters import HTTPAdapter
 from requests.exceptions import RetryError
 from rest_framework.fields import empty
-from urllib3 import Retry
 
 from events.models import DataSource, Event, Image, Keyword, Language, Place
 from events.translation import EventTranslationOptions
@@ -22,6 +19,8 @@ from events.translation import EventTranslationOptions
 from ..serializers import generate_id
 from ..utils import clean_text_fields
 from .base import Importer, register_importer
+from .http import ImporterHTTPClient
+from .http_cache import ResponseCache
 from .sync import ModelSyncher
 
 logger = logging.getLogger(__name__)
@@ -77,16 +76,27 @@ def _build_url(path):
     return urllib.parse.urljoin(base_url, urllib.parse.quote(path))
 
 
-def _get_data(url: str, params: Optional[dict] = None) -> dict:
-    session = requests.Session()
-    retries = Retry(
-        total=settings.ESPOO_MAX_RETRIES,
-        status_forcelist=[429, 500, 502, 503, 504],
+_http_client: Optional[ImporterHTTPClient] = None
+
+
+def _set_http_client(cache: Optional[ResponseCache] = None) -> None:
+    global _http_client
+    _http_client = ImporterHTTPClient(
+        timeout=settings.ESPOO_TIMEOUT,
+        max_retries=settings.ESPOO_MAX_RETRIES,
+        cache=cache,
     )
-    parsed_url = urlparse(url)
-    session.mount(f"{parsed_url.scheme}://", HTTPAdapter(max_retries=retries))
+
+
+def _get_http_client() -> ImporterHTTPClient:
+    if _http_client is None:
+        _set_http_client()
+    return _http_client
+
+
+def _get_data(url: str, params: Optional[dict] = None) -> dict:
     try:
-        response = session.get(url, timeout=settings.ESPOO_TIMEOUT, params=params)
+        response = _get_http_client().get(url, params=params)
     except RetryError:
         raise EspooImporterError(f"Exceeded max retries for {url}")
     if response.status_code != 200:
@@ -112,7 +122,9 @@ def _list_data(url: str, params: Optional[dict] = None) -> list[dict]:
 
 
 def _get_origin_objs(detail_url: str, origin_obj_ids: list) -> list:
-    return [_get_data(urljoin(detail_url, f"./{obj_id}/")) for obj_id in origin_obj_ids]
+    return _get_http_client().map(
+        _get_data, [urljoin(detail_url, f"./{obj_id}/") for obj_id in origin_obj_ids]
+    )
 
 
 def _build_pre_map(mapping: dict[str, str]) -> PreMapper:
@@ -515,6 +527,8 @@ class EspooImporter(Importer):
     location_cache = {}
 
     def setup(self):
+        _set_http_client(cache=self.get_http_cache())
+
         ds_args = dict(id=self.data_source_name)
         ds_defaults = dict(name="Espoo Linkedevents")
         self.data_source, _ = DataSource.objects.get_or_create(
@@ -0,0 +1,185 @@
+"""
+The HTTP client shared by the importers.
+
+The client keeps its connections to each host open between the requests,
+retries failed requests with a backoff and keeps the configured minimum
+interval between the requests to each host. map() and prefetch() run requests
+in a bounded number of worker threads so that the importers can wait for
+several responses at once and process the previous responses in the meanwhile.
+With a ResponseCache, the responses are cached on disk or replayed from it.
+"""
+
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Optional
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from events.importer.http_cache import HTTPCacheMissError, ResponseCache
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HostRateLimiter:
+    """Keeps at least min_interval seconds between the requests to a host."""
+
+    def __init__(self, min_interval: float) -> None:
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_request_times = {}
+
+    def wait(self, url: str) -> None:
+        if not self.min_interval:
+            return
+
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            request_time = max(now, self._next_request_times.get(host, now))
+            self._next_request_times[host] = request_time + self.min_interval
+
+        if request_time > now:
+            time.sleep(request_time - now)
+
+
+class ImporterHTTPClient:
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        max_workers: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        backoff_factor: Optional[float] = None,
+        min_request_interval: Optional[float] = None,
+        headers: Optional[dict] = None,
+        cache: Optional[ResponseCache] = None,
+    ) -> None:
+        self.timeout = timeout
+        self.cache = cache
+        self.max_workers = max(
+            max_workers
+            if max_workers is not None
+            else settings.IMPORTER_HTTP_MAX_WORKERS,
+            1,
+        )
+        self.rate_limiter = HostRateLimiter(
+            min_request_interval
+            if min_request_interval is not None
+            else settings.IMPORTER_HTTP_MIN_REQUEST_INTERVAL
+        )
+
+        retries = Retry(
+            total=(
+                max_retries
+                if max_retries is not None
+                else settings.IMPORTER_HTTP_MAX_RETRIES
+            ),
+            backoff_factor=(
+                backoff_factor
+                if backoff_factor is not None
+                else settings.IMPORTER_HTTP_BACKOFF_FACTOR
+            ),
+            status_forcelist=RETRY_STATUSES,
+        )
+        # One pooled connection per worker thread and host
+        adapter = HTTPAdapter(pool_maxsize=self.max_workers, max_retries=retries)
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        self.rate_limiter.wait(url)
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        if self.cache is None:
+            return self._send(method, url, **kwargs)
+
+        key = self.cache.get_key(method, url, **kwargs)
+        stream = kwargs.get("stream", False)
+        cached = self.cache.load(key, stream=stream)
+        if cached is not None:
+            metadata, cached_response = cached
+            if self.cache.is_fresh(metadata):
+                return cached_response
+
+        if self.cache.offline:
+            raise HTTPCacheMissError(f"No cached response for {method} {url}")
+
+        if cached is not None:
+            kwargs["headers"] = {
+                **self.cache.get_revalidation_headers(metadata),
+                **(kwargs.get("headers") or {}),
+            }
+
+        response = self._send(method, url, **kwargs)
+        if cached is not None:
+            if response.status_code == 304:
+                response.close()
+                self.cache.touch(key, metadata)
+                return cached_response
+            cached_response.close()
+
+        if response.status_code == 200:
+            if not stream:
+                self.cache.store(key, response)
+                return response
+            # Write the streamed body to the cache and read it back from there
+            with response:
+                self.cache.store(key, response, stream=True)
+            return self.cache.load(key, stream=True)[1]
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def map(self, fn: Callable, items: Iterable) -> list:
+        """
+        Call fn for all the items in worker threads and return the results in
+        the order of the items.
+        """
+        return list(self.prefetch(fn, items))
+
+    def prefetch(self, fn: Callable, items: Iterable) -> Iterator:
+        """
+        Call fn for the items in worker threads, keeping up to max_workers calls
+        running ahead of the caller, and yield the results in the order of the
+        items. Stop iterating to stop calling fn for the rest of the items, e.g.
+        when fetching pages until an empty one.
+        """
+        items = iter(items)
+        if self.max_workers == 1:
+            yield from map(fn, items)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = deque(
+                executor.submit(fn, item) for item in islice(items, self.max_workers)
+            )
+            try:
+                while futures:
+                    result = futures.popleft().result()
+                    # Start the next call before the caller processes the result
+                    for item in islice(items, 1):
+                        futures.append(executor.submit(fn, item))
+                    yield result
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def close(self) -> None:
+        self.session.close()
@@ -0,0 +1,153 @@
+"""
+On-disk cache of the HTTP responses of the importers.
+
+The responses are stored under the hash of the request method, URL and body,
+one metadata file and one body file per response. Responses younger than the
+TTL are served from the cache. Older responses with an ETag or a Last-Modified
+header are revalidated with a conditional request, and other older responses
+are fetched again.
+
+Streamed responses are written to the cache in chunks and the cached bodies of
+streamed requests are read from the body file, so that large files are never
+loaded into memory at once.
+
+In the offline mode, every response is served from the cache regardless of its
+age and a request missing from the cache is an error. Running an importer first
+with the cache and then offline with the same cache directory replays the
+recorded import without network access.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections.abc import Iterable
+from typing import Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+class HTTPCacheMissError(requests.RequestException):
+    pass
+
+
+class ResponseCache:
+    def __init__(self, directory: str, ttl: float = 0, offline: bool = False) -> None:
+        self.directory = directory
+        self.ttl = ttl
+        self.offline = offline
+
+    @staticmethod
+    def get_key(method: str, url: str, **kwargs) -> str:
+        """Hash of the request method, its URL with the params and its body"""
+        prepared_url = (
+            requests.Request(method, url, params=kwargs.get("params")).prepare().url
+        )
+        body = {
+            name: kwargs.get(name)
+            for name in ("data", "files", "json")
+            if kwargs.get(name) is not None
+        }
+        content = json.dumps(
+            [method.upper(), prepared_url, body], sort_keys=True, default=str
+        )
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _read_metadata(self, key: str) -> Optional[dict]:
+        try:
+            with open(f"{self._get_path(key)}.json") as metadata_file:
+                return json.load(metadata_file)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write_file(path: str, chunks: Iterable[bytes]) -> None:
+        # Write a temporary file and rename it to never leave half-written files
+        # behind, e.g. when the import is interrupted
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as temp_file:
+            try:
+                for chunk in chunks:
+                    temp_file.write(chunk)
+            except BaseException:
+                temp_file.close()
+                os.remove(temp_file.name)
+                raise
+        os.replace(temp_file.name, path)
+
+    def _write_metadata(self, key: str, metadata: dict) -> None:
+        self._write_file(f"{self._get_path(key)}.json", [json.dumps(metadata).encode()])
+
+    def is_fresh(self, metadata: dict) -> bool:
+        return self.offline or time.time() - metadata["stored_at"] < self.ttl
+
+    @staticmethod
+    def get_revalidation_headers(metadata: dict) -> dict:
+        response_headers = CaseInsensitiveDict(metadata["headers"])
+        headers = {}
+        if etag := response_headers.get("ETag"):
+            headers["If-None-Match"] = etag
+        if last_modified := response_headers.get("Last-Modified"):
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def load(
+        self, key: str, stream: bool = False
+    ) -> Optional[tuple[dict, requests.Response]]:
+        """
+        Return the metadata and the cached response. The body of a streamed
+        response is read from the body file as it is iterated.
+        """
+        metadata = self._read_metadata(key)
+        if metadata is None:
+            return None
+
+        response = requests.Response()
+        try:
+            if stream:
+                response.raw = open(f"{self._get_path(key)}.body", "rb")
+            else:
+                with open(f"{self._get_path(key)}.body", "rb") as body_file:
+                    response._content = body_file.read()
+                response._content_consumed = True
+        except FileNotFoundError:
+            return None
+
+        response.status_code = metadata["status_code"]
+        response.reason = metadata["reason"]
+        response.url = metadata["url"]
+        response.headers = CaseInsensitiveDict(metadata["headers"])
+        response.from_cache = True
+        return metadata, response
+
+    def store(
+        self, key: str, response: requests.Response, stream: bool = False
+    ) -> None:
+        """Store the response, writing the body of a streamed one in chunks."""
+        metadata = {
+            "url": response.url,
+            "status_code": response.status_code,
+            "reason": response.reason,
+            "headers": dict(response.headers),
+            "stored_at": time.time(),
+        }
+        body = (
+            response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+            if stream
+            else [response.content]
+        )
+        # The body first: the metadata file marks the entry complete
+        self._write_file(f"{self._get_path(key)}.body", body)
+        self._write_metadata(key, metadata)
+
+    def touch(self, key: str, metadata: dict) -> None:
+        """Mark a revalidated response fresh again."""
+        self._write_metadata(key, {**metadata, "stored_at": time.time()})
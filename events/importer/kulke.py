@@ -9,7 +9,6 @@ from textwrap import dedent
 from typing import Iterator, Sequence, Union
 
 import dateutil
-import requests
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import transaction
@@ -395,7 +394,7 @@ class KulkeImporter(Importer):
             self.event_only_license = None
 
     def fetch_kulke_categories(self) -> dict[str, Union[str, int]]:
-        response = requests.get(CATEGORY_URL, timeout=self.default_timeout)
+        response = self.http.get(CATEGORY_URL)
         response.raise_for_status()
         root = etree.fromstring(response.content)
         categories = {}
@@ -1016,24 +1015,25 @@ class KulkeImporter(Importer):
         self, language: str, begin_date: datetime
     ) -> Iterator[etree.Element]:
         begin_date = begin_date.strftime("%d.%m.%Y")
-        offset = 0
         parser = etree.XMLParser(recover=True)
-        while True:
+
+        def fetch_page(offset: int) -> bytes:
             logger.debug("Fetching events: %s - %d", language, offset)
-            response = requests.get(
+            response = self.http.get(
                 EVENTS_URL_TEMPLATE.format(
                     begin_date=begin_date, offset=offset, language=language
-                ),
-                timeout=self.default_timeout,
+                )
             )
             response.raise_for_status()
-            root = etree.fromstring(response.content, parser=parser)
+            return response.content
+
+        # The next pages are fetched while the events of a page are imported
+        for content in self.http.prefetch(fetch_page, itertools.count(0, 100)):
+            root = etree.fromstring(content, parser=parser)
             events = root.xpath("/eventdata/event")
             if not events:
                 break
-            for event in events:
-                yield event
-            offset += 100
+            yield from events
 
     def _import_events(self, importing_courses=False):
         begin_date = datetime.now(tz=LOCAL_TZ) - timedelta(days=60)
@@ -1056,12 +1056,14 @@ class KulkeImporter(Importer):
             )
         )
 
-        for event in events.values():
-            contains_course_keywords = any(
-                kw.id in course_keywords for kw in event["keywords"]
-            )
-            if contains_course_keywords == importing_courses:
-                self.save_event(event)
+        self.save_events(
+            [
+                event
+                for event in events.values()
+                if any(kw.id in course_keywords for kw in event["keywords"])
+                == importing_courses
+            ]
+        )
 
         self._verify_recurs(recurring_groups)
         for group in recurring_groups.values():
@@ -6,7 +6,6 @@ from os.path import commonprefix
 
 import bleach
 import pytz
-import requests
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured, ValidationError
 from django.utils.html import strip_tags
@@ -254,14 +253,13 @@ class LippupisteImporter(Importer):
         self.sub_event_count_by_super_event_source_id = defaultdict(lambda: 0)
 
     def _fetch_event_source_data(self, url):
-        return requests.get(
+        return self.http.get(
             url,
             auth=(
                 settings.LIPPUPISTE_EVENT_API_USERNAME,
                 settings.LIPPUPISTE_EVENT_API_PASSWORD,
             ),
             params={"ClientID": settings.LIPPUPISTE_EVENT_API_CLIENT_ID},
-            timeout=self.default_timeout,
             headers={
                 "Content-Type": "application/json",
                 "CALENDARKey": settings.LIPPUPISTE_EVENT_API_CALENDAR_KEY,
@@ -630,8 +628,8 @@ class LippupisteImporter(Importer):
             check_deleted_func=check_deleted,
         )
 
-        for event in event_list:
-            obj = self.save_event(event)
+        objs = self.save_events(event_list)
+        for event, obj in zip(event_list, objs):
             if "super_event_id" in event:
                 obj.super_event_id = event["super_event_id"]
                 obj.save()
@@ -1,14 +1,24 @@
 import logging
+import mmap
+import resource
+import tempfile
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from typing import Optional
 
 import rdflib
-import requests
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.utils import timezone
 from django.utils.translation import override
 from django_orghierarchy.models import Organization
+from modeltranslation.translator import translator
 from rdflib import RDF
 from rdflib.namespace import DCTERMS, OWL, RDFS, SKOS
 
-from events.models import BaseModel, DataSource, Keyword, KeywordLabel, Language
+from events.keywords import invalidate_keyword_resolver_cache
+from events.models import BaseModel, DataSource, Event, Keyword, KeywordLabel
 
 from .base import Importer, register_importer
 from .sync import ModelSyncher
@@ -18,6 +28,11 @@ logger = logging.getLogger(__name__)
 yso = rdflib.Namespace("http://www.yso.fi/onto/yso/")
 URL = "https://finto.fi/rest/v1/yso/data"
 
+# The number of Turtle statements parsed at a time
+TURTLE_CHUNK_STATEMENTS = 5000
+# The number of keywords, labels and label relations written at a time
+BULK_CHUNK_SIZE = 1000
+
 YSO_DEPRECATED_MAPS = {
     # lapset (kooste) -> lapset (ikään liittyvä rooli), missing YSO replacement
     "yso:p12262": "yso:p4354",
@@ -61,67 +76,15 @@ def get_subject(yso_id):
     return rdflib.term.URIRef(yso + yso_id.split(":")[-1])
 
 
-def is_deprecated(graph, subject):
-    return (subject, OWL.deprecated, None) in graph
-
-
-def is_aggregate_concept(graph, subject):
-    return (
-        subject,
-        SKOS.inScheme,
-        rdflib.term.URIRef(yso + "aggregateconceptscheme"),
-    ) in graph
-
-
 def get_replacement(graph, subject):
     for _subject, _verb, object in graph.triples((subject, DCTERMS.isReplacedBy, None)):
         return object
 
 
-def get_preferred_labels(
-    graph, subject, lang=None, default=None, label_properties=None
-):
-    """
-    A slightly modified copy of
-    https://rdflib.readthedocs.io/en/6.1.1/_modules/rdflib/graph.html#Graph.preferredLabel.
-    """
-
-    if default is None:
-        default = []
-
-    if label_properties is None:
-        label_properties = (SKOS.prefLabel, RDFS.label)
-
-    if lang is None:
-
-        def langfilter(l_):
-            return True
-
-    elif lang == "":
-
-        def langfilter(l_):
-            return l_.language is None
-
-    else:
-
-        def langfilter(l_):
-            return l_.language == lang
-
-    for label_prop in label_properties:
-        labels = list(filter(langfilter, graph.objects(subject, label_prop)))
-        if len(labels) == 0:
-            continue
-        else:
-            return [(label_prop, l_) for l_ in labels]
-
-    return default
-
-
-def deprecate_and_replace(graph, keyword):
+def deprecate_and_replace_with(keyword, replacement_subject):
     if keyword.id in YSO_DEPRECATED_MAPS:
         # these ones need no further processing
         return keyword.deprecate()
-    replacement_subject = get_replacement(graph, get_subject(keyword.id))
     new_keyword = None
     if replacement_subject:
         try:
@@ -151,6 +114,131 @@ def deprecate_and_replace(graph, keyword):
     return keyword.deprecate() and keyword.replace(new_keyword)
 
 
+class YsoConcept:
+    """The parts of a YSO subject that the import uses"""
+
+    __slots__ = (
+        "subject",
+        "is_concept",
+        "deprecated",
+        "aggregate",
+        "replaced_by",
+        "pref_labels",
+        "rdfs_labels",
+        "alt_labels",
+    )
+
+    def __init__(self, subject: str) -> None:
+        self.subject = subject
+        self.is_concept = False
+        self.deprecated = False
+        self.aggregate = False
+        self.replaced_by = None
+        self.pref_labels = []
+        self.rdfs_labels = []
+        self.alt_labels = []
+
+    @property
+    def labels(self) -> list[tuple[str, Optional[str]]]:
+        # The SKOS preferred labels, or the RDFS labels when there are none
+        return self.pref_labels or self.rdfs_labels
+
+
+def iter_lines(path: str) -> Iterator[bytes]:
+    """Iterate the lines of a file mapped into memory"""
+    with open(path, "rb") as data_file:
+        with mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield from iter(data.readline, b"")
+
+
+def iter_turtle_graphs(
+    lines: Iterable[bytes], chunk_size: int = TURTLE_CHUNK_STATEMENTS
+) -> Iterator[rdflib.Graph]:
+    """
+    Parse a Turtle document in chunks of chunk_size statements and yield a graph
+    of each chunk. Only one chunk is kept in memory at a time.
+    """
+    prefixes = []
+    statements = []
+    statement = []
+    in_long_string = False
+
+    def parse():
+        graph = rdflib.Graph()
+        graph.parse(data="".join(prefixes + statements), format="turtle")
+        return graph
+
+    for line in lines:
+        line = line.decode("utf-8")
+        stripped = line.strip()
+        if not in_long_string and not statement:
+            if not stripped or stripped.startswith("#"):
+                continue
+            if stripped.lower().startswith(("@prefix", "@base", "prefix", "base")):
+                prefixes.append(line)
+                continue
+
+        statement.append(line)
+        if line.count('"""') % 2:
+            in_long_string = not in_long_string
+        if not in_long_string and (stripped == "." or stripped.endswith(" .")):
+            statements.append("".join(statement))
+            statement = []
+            if len(statements) >= chunk_size:
+                yield parse()
+                statements = []
+
+    if statement:
+        statements.append("".join(statement))
+    if statements:
+        yield parse()
+
+
+def add_to_concepts(concepts: dict[str, YsoConcept], graph: rdflib.Graph) -> None:
+    """Collect the parts of the subjects in the graph the import uses"""
+    aggregate_scheme = rdflib.term.URIRef(yso + "aggregateconceptscheme")
+    for subject, predicate, obj in graph:
+        if predicate == RDF.type:
+            if obj != SKOS.Concept:
+                continue
+        elif predicate == SKOS.inScheme:
+            if obj != aggregate_scheme:
+                continue
+        elif predicate not in (
+            OWL.deprecated,
+            DCTERMS.isReplacedBy,
+            SKOS.prefLabel,
+            RDFS.label,
+            SKOS.altLabel,
+        ):
+            continue
+
+        subject = str(subject)
+        concept = concepts.get(subject)
+        if concept is None:
+            concept = concepts[subject] = YsoConcept(subject)
+
+        if predicate == RDF.type:
+            concept.is_concept = True
+        elif predicate == SKOS.inScheme:
+            concept.aggregate = True
+        elif predicate == OWL.deprecated:
+            concept.deprecated = True
+        elif predicate == DCTERMS.isReplacedBy:
+            concept.replaced_by = obj
+        elif predicate == SKOS.prefLabel:
+            concept.pref_labels.append((str(obj), obj.language))
+        elif predicate == RDFS.label:
+            concept.rdfs_labels.append((str(obj), obj.language))
+        else:
+            concept.alt_labels.append((str(obj), obj.language))
+
+
+def _get_peak_memory_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
 @register_importer
 class YsoImporter(Importer):
     name = "yso"
@@ -176,12 +264,45 @@ class YsoImporter(Importer):
 
     def import_keywords(self):
         logger.info("Importing YSO keywords")
-        graph = self.load_graph_into_memory(URL)
-        self.save_keywords(graph)
+        started = time.monotonic()
+        with self.open_data_file(URL) as path:
+            concepts = self.load_concepts(path)
+        loaded = time.monotonic()
+        logger.info("Loaded %d YSO subjects in %.1f s", len(concepts), loaded - started)
+
+        self.save_concepts(concepts)
+        logger.info(
+            "Saved YSO keywords in %.1f s, peak memory %.0f MB",
+            time.monotonic() - loaded,
+            _get_peak_memory_mb(),
+        )
+
+    @contextmanager
+    def open_data_file(self, url):
+        """Yield the path of a local YSO file or of the downloaded one"""
+        if settings.YSO_DATA_FILE:
+            yield settings.YSO_DATA_FILE
+            return
+
+        logger.debug("Fetching %s" % url)
+        with tempfile.NamedTemporaryFile(suffix=".ttl") as data_file:
+            with self.http.get(url, stream=True) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size=1024 * 1024):
+                    data_file.write(chunk)
+            data_file.flush()
+            yield data_file.name
+
+    def load_concepts(self, path) -> dict[str, YsoConcept]:
+        logger.debug("Parsing RDF")
+        concepts = {}
+        for graph in iter_turtle_graphs(iter_lines(path)):
+            add_to_concepts(concepts, graph)
+        return concepts
 
     def load_graph_into_memory(self, url):
         logger.debug("Fetching %s" % url)
-        resp = requests.get(url, timeout=self.default_timeout)
+        resp = self.http.get(url)
         assert resp.status_code == 200
         resp.encoding = "UTF-8"
         graph = rdflib.Graph()
@@ -189,29 +310,7 @@ class YsoImporter(Importer):
         graph.parse(data=resp.text, format="turtle")
         return graph
 
-    def save_keywords(self, graph):
-        logger.debug("Saving data")
-
-        queryset = KeywordLabel.objects.all()
-        label_syncher = ModelSyncher(
-            queryset,
-            lambda obj: (obj.name, obj.language_id),
-            delete_func=lambda obj: obj.delete(),
-        )
-
-        keyword_labels = {}
-        for subject, label in graph.subject_objects(SKOS.altLabel):
-            if (subject, RDF.type, SKOS.Concept) in graph:
-                try:
-                    yid = get_yso_id(subject)
-                    label = self.save_alt_label(label_syncher, graph, label)
-                    if label:
-                        keyword_labels.setdefault(yid, []).append(label)
-                except ValidationError as e:
-                    logger.error(e)
-
-        label_syncher.finish(force=self.options["force"])
-
+    def map_deprecated_keywords(self):
         # manually add new keywords to deprecated ones
         for old_id, new_id in YSO_DEPRECATED_MAPS.items():
             try:
@@ -227,124 +326,175 @@ class YsoImporter(Importer):
             new_keyword.events.add(*old_keyword.events.all())
             new_keyword.audience_events.add(*old_keyword.audience_events.all())
 
-        queryset = Keyword.objects.filter(
-            data_source=self.data_source, deprecated=False
+    def save_concepts(self, concepts: dict[str, YsoConcept]):
+        """
+        Synchronize the keywords and their alternative labels with the concepts
+        using bulk queries
+        """
+        logger.debug("Saving data")
+
+        concept_ids = {}
+        for concept in concepts.values():
+            if not concept.is_concept:
+                continue
+            try:
+                concept_ids[concept.subject] = get_yso_id(concept.subject)
+            except ValidationError as e:
+                logger.error(e)
+
+        label_syncher = ModelSyncher(
+            KeywordLabel.objects.all(),
+            lambda obj: (obj.name, obj.language_id),
+            delete_func=lambda obj: obj.delete(),
         )
+        new_labels = []
+        keyword_labels = {}
+        for subject, yid in concept_ids.items():
+            for name, language in concepts[subject].alt_labels:
+                label = self.get_alt_label(label_syncher, name, language, new_labels)
+                if label:
+                    keyword_labels.setdefault(yid, []).append(label)
+
+        KeywordLabel.objects.bulk_create(new_labels, batch_size=BULK_CHUNK_SIZE)
+        logger.info("Created %d keyword labels", len(new_labels))
+        label_syncher.finish(force=self.options["force"])
+
+        self.map_deprecated_keywords()
+
         syncher = ModelSyncher(
-            queryset,
+            Keyword.objects.filter(data_source=self.data_source, deprecated=False),
             lambda keyword: keyword.id,
-            delete_func=lambda obj: deprecate_and_replace(graph, obj),
+            delete_func=lambda obj: self.deprecate_concept_keyword(concepts, obj),
             check_deleted_func=lambda obj: obj.deprecated,
         )
-        save_set = set()
-        for subject in graph.subjects(RDF.type, SKOS.Concept):
-            try:
-                self.save_keyword(syncher, graph, subject, keyword_labels, save_set)
-            except ValidationError as e:
-                logger.error(e)
-        syncher.finish(force=self.options["force"])
-
-    def save_keyword_label_relationships_in_bulk(self, keyword_labels):
-        yids = Keyword.objects.all().values_list("id", flat=True)
-        labels = KeywordLabel.objects.all().values("id", "name", "language")
-        label_id_from_name_and_language = {
-            (label["name"], label["language"]): label["id"] for label in labels
-        }
-        keyword_alt_labels_model = Keyword.alt_labels.through
-        relations_to_create = []
-        for yid, url_labels in keyword_labels.items():
-            if yid not in yids:
+        new_keywords = []
+        changed_keywords = []
+        saved_ids = []
+        for subject, yid in concept_ids.items():
+            concept = concepts[subject]
+            if concept.deprecated:
                 continue
-            for label in url_labels:
-                params = dict(
-                    keyword_id=yid,
-                    keywordlabel_id=(
-                        label_id_from_name_and_language.get(
-                            (str(label), label.language)
-                        )
-                    ),
-                )
-                if params["keyword_id"] and params["keywordlabel_id"]:
-                    relations_to_create.append(keyword_alt_labels_model(**params))
-        keyword_alt_labels_model.objects.bulk_create(relations_to_create)
 
-    def create_keyword(self, graph, subject):
-        if is_deprecated(graph, subject):
-            return
-        keyword = Keyword(data_source=self.data_source)
-        keyword._created = True
-        keyword.id = get_yso_id(subject)
-        keyword.created_time = BaseModel.now()
-        keyword.aggregate = is_aggregate_concept(graph, subject)
-        self.update_keyword(keyword, graph, subject)
-        return keyword
-
-    def update_keyword(self, keyword, graph, subject):
-        for _, literal in get_preferred_labels(graph, subject):
-            if literal.language not in self.supported_languages:
-                continue
-            with override(literal.language, deactivate=True):
-                if keyword.name != str(literal):
-                    logger.debug(
-                        "(re)naming keyword " + keyword.name + " to " + str(literal)
-                    )
-                    keyword.name = str(literal)
-                    keyword._changed = True
-                    keyword.last_modified_time = BaseModel.now()
+            keyword = syncher.get(yid)
+            if not keyword:
+                keyword = Keyword(data_source=self.data_source, id=yid)
+                keyword._created = True
+                keyword.created_time = BaseModel.now()
+                keyword.aggregate = concept.aggregate
+                self.set_keyword_names(keyword, concept.labels)
+                new_keywords.append(keyword)
+            else:
+                keyword._created = False
+                self.set_keyword_names(keyword, concept.labels)
+
+            if keyword.publisher_id != self.organization.id:
+                keyword.publisher = self.organization
+                keyword._changed = True
+            if keyword._changed and not keyword._created:
+                keyword.last_modified_time = BaseModel.now()
+                changed_keywords.append(keyword)
+
+            if not getattr(keyword, "_found", False):
+                syncher.mark(keyword)
+            saved_ids.append(yid)
+
+        self.save_keywords_in_chunks(new_keywords, changed_keywords)
+        self.add_alt_labels_in_chunks(
+            {yid: keyword_labels[yid] for yid in saved_ids if yid in keyword_labels}
+        )
+        # The bulk queries do not send the signals that invalidate the cache
+        invalidate_keyword_resolver_cache()
 
-    def save_keywords_in_bulk(self, graph):
-        keywords = []
-        for subject in graph.subjects(RDF.type, SKOS.Concept):
-            keyword = self.create_keyword(graph, subject)
-            if keyword:
-                keywords.append(keyword)
-        Keyword.objects.bulk_create(keywords, batch_size=1000)
-
-    def save_alt_label(self, syncher, graph, label):
-        if label.language is None:
-            logger.error("Error: {} has no language".format(label))
-            return None
-        if label.language not in self.supported_languages:
-            return None
+        syncher.finish(force=self.options["force"])
 
-        label_text = str(label)
-        label_object = syncher.get((label_text, str(label.language)))
-        if label_object is None:
-            language = Language.objects.get(id=label.language)
-            label_object = KeywordLabel(name=label_text, language=language)
-            label_object._changed = True
-            label_object._created = True
-        else:
-            label_object._created = False
-        if label_object._created:
-            # Since there are duplicates, only save & mark them once.
-            label_object.save()
+    @staticmethod
+    def deprecate_concept_keyword(concepts, keyword):
+        concept = concepts.get(str(get_subject(keyword.id)))
+        return deprecate_and_replace_with(
+            keyword, concept.replaced_by if concept else None
+        )
 
-        if not getattr(label_object, "_found", False):
-            syncher.mark(label_object)
-        return label_object
+    def get_alt_label(self, syncher, name, language, new_labels):
+        if language is None:
+            logger.error("Error: {} has no language".format(name))
+            return None
+        if language not in self.supported_languages:
+            return None
 
-    def save_keyword(self, syncher, graph, subject, keyword_labels, save_set):
-        if is_deprecated(graph, subject):
-            return
-        keyword = syncher.get(get_yso_id(subject))
-        if not keyword:
-            keyword = self.create_keyword(graph, subject)
-            if not keyword:
-                return
-        else:
-            keyword._created = False
-            self.update_keyword(keyword, graph, subject)
+        label = syncher.get((name, language))
+        if label is None:
+            # Created in bulk later. Since there are duplicates, only create and
+            # mark them once.
+            label = KeywordLabel(name=name, language_id=language)
+            new_labels.append(label)
+            syncher.mark(label)
+        elif not getattr(label, "_found", False):
+            syncher.mark(label)
+        return label
+
+    def save_keywords_in_chunks(self, new_keywords, changed_keywords):
+        # Deprecated keywords are not synchronized, and creating one again
+        # overwrites it
+        existing_ids = set()
+        for start in range(0, len(new_keywords), BULK_CHUNK_SIZE):
+            existing_ids.update(
+                Keyword.objects.filter(
+                    id__in=[
+                        keyword.id
+                        for keyword in new_keywords[start : start + BULK_CHUNK_SIZE]
+                    ]
+                ).values_list("id", flat=True)
+            )
+        for keyword in new_keywords:
+            if keyword.id in existing_ids:
+                keyword.save()
 
-        if keyword.publisher_id != self.organization.id:
-            keyword.publisher = self.organization
-            keyword._changed = True
-        if keyword._changed:
-            keyword.save()
+        Keyword.objects.bulk_create(
+            [keyword for keyword in new_keywords if keyword.id not in existing_ids],
+            batch_size=BULK_CHUNK_SIZE,
+        )
+        name_fields = [
+            field.name
+            for field in translator.get_options_for_model(Keyword).all_fields["name"]
+        ]
+        Keyword.objects.bulk_update(
+            changed_keywords,
+            ["name", *name_fields, "publisher", "last_modified_time"],
+            batch_size=BULK_CHUNK_SIZE,
+        )
+        # bulk_update does not send the signals that mark the events of renamed
+        # keywords for ongoing cache update
+        for start in range(0, len(changed_keywords), BULK_CHUNK_SIZE):
+            Event.objects.filter(
+                keywords__in=changed_keywords[start : start + BULK_CHUNK_SIZE],
+                end_time__gte=timezone.now(),
+                ongoing_cache_changed=False,
+            ).update(ongoing_cache_changed=True)
+        logger.info(
+            "Created %d and updated %d keywords",
+            len(new_keywords),
+            len(changed_keywords),
+        )
 
-        alt_labels = keyword_labels.get(get_yso_id(subject), [])
-        keyword.alt_labels.add(*alt_labels)
+    def add_alt_labels_in_chunks(self, keyword_labels):
+        keyword_alt_labels_model = Keyword.alt_labels.through
+        relations = [
+            keyword_alt_labels_model(keyword_id=yid, keywordlabel_id=label.id)
+            for yid, labels in keyword_labels.items()
+            for label in labels
+        ]
+        # Like alt_labels.add(), the existing relations are kept as is
+        keyword_alt_labels_model.objects.bulk_create(
+            relations, batch_size=BULK_CHUNK_SIZE, ignore_conflicts=True
+        )
 
-        if not getattr(keyword, "_found", False):
-            syncher.mark(keyword)
-        return keyword
+    def set_keyword_names(self, keyword, labels):
+        for name, language in labels:
+            if language not in self.supported_languages:
+                continue
+            with override(language, deactivate=True):
+                if keyword.name != name:
+                    logger.debug("(re)naming keyword " + keyword.name + " to " + name)
+                    keyword.name = name
+                    keyword._changed = True
+                    keyword.last_modified_time = BaseModel.now()
@@ -1,11 +1,123 @@
 import re
 import string
+import threading
+import time
+from collections import OrderedDict
 
 from django.conf import settings
 from django.contrib.postgres.search import SearchQuery, TrigramSimilarity
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.functions import Greatest
 from rest_framework.exceptions import ParseError
 
-from events.models import KeywordLabel
+from events.models import Keyword, KeywordLabel
+
+GENERATION_KEY = "keyword_resolver_generation"
+
+KEYWORD_SIMILARITY_THRESHOLD = 0.2
+# Terms matching more keywords are only partially cached
+MAX_SIMILAR_KEYWORD_IDS = 1000
+
+_MISSING = object()
+
+
+class TermCache:
+    """
+    Worker-local LRU cache of resolved terms whose entries expire after
+    KEYWORD_RESOLVER_CACHE_TIMEOUT seconds. Keys include the generation that
+    is bumped when keywords change, which invalidates the entries in every
+    worker.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (
+                time.monotonic() + settings.KEYWORD_RESOLVER_CACHE_TIMEOUT,
+                value,
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.KEYWORD_RESOLVER_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+term_cache = TermCache()
+
+
+def _get_generation() -> int:
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, 1, timeout=None)
+        generation = cache.get(GENERATION_KEY, 1)
+    return generation
+
+
+def _bump_generation() -> None:
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, timeout=None)
+
+
+def invalidate_keyword_resolver_cache() -> None:
+    """Invalidate the resolved terms of every worker once the transaction commits."""
+    transaction.on_commit(_bump_generation)
+
+
+def _resolve(kind, args, resolve_func):
+    if not settings.KEYWORD_RESOLVER_CACHE_TIMEOUT:
+        return resolve_func(*args)
+
+    key = (_get_generation(), kind, *args)
+    value = term_cache.get(key)
+    if value is _MISSING:
+        value = resolve_func(*args)
+        term_cache.set(key, value)
+    return value
+
+
+def get_keyword_similarity(term):
+    # no need to search English if there are accented letters
+    langs = ["fi", "sv"] if re.search("[\u00c0-\u00ff]", term) else ["fi", "sv", "en"]
+    return Greatest(*[TrigramSimilarity(f"name_{lang}", term) for lang in langs])
+
+
+def _get_similar_keyword_ids(term):
+    ids = list(
+        Keyword.objects.annotate(simile=get_keyword_similarity(term))
+        .filter(simile__gt=KEYWORD_SIMILARITY_THRESHOLD)
+        .order_by("-simile", "id")
+        .values_list("id", flat=True)[: MAX_SIMILAR_KEYWORD_IDS + 1]
+    )
+    return ids[:MAX_SIMILAR_KEYWORD_IDS], len(ids) <= MAX_SIMILAR_KEYWORD_IDS
+
+
+def resolve_similar_keyword_ids(term) -> tuple[list[str], bool]:
+    """
+    Return the ids of the keywords whose names are similar to the term, most
+    similar first, and whether all of the similar keywords are included.
+    """
+    return _resolve("similar", (term,), _get_similar_keyword_ids)
 
 
 class KeywordMatcher(object):
@@ -71,12 +183,21 @@ class KeywordMatcher(object):
         else:
             return None
 
-    def match(self, text, language=None):
+    def match_ids(self, text, language=None):
         labels = self.label_match(text, language)
-        keywords = []
+        keyword_ids = []
         if labels:
             for label in labels:
-                keywords.extend(label.keywords.filter(deprecated=False))
-            return keywords
+                keyword_ids.extend(
+                    label.keywords.filter(deprecated=False).values_list("id", flat=True)
+                )
+            return keyword_ids
         else:
             return None
+
+    def match(self, text, language=None):
+        keyword_ids = _resolve("match", (text, language), self.match_ids)
+        if keyword_ids is None:
+            return None
+        keywords = Keyword.objects.in_bulk(keyword_ids)
+        return [keywords[i] for i in keyword_ids if i in keywords]
@@ -5,6 +5,7 @@ from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from django.utils.translation import override
 
+from events.bulk import bulk_event_save
 from events.importer.base import get_importers
 
 
@@ -31,7 +32,22 @@ class Command(BaseCommand):
             "--cached",
             action="store_true",
             dest="cached",
-            help="Cache requests (if possible)",
+            help="Cache the responses of the requests on disk and reuse them",
+        )
+        parser.add_argument(
+            "--replay",
+            action="store_true",
+            dest="replay",
+            help=(
+                "Replay a cached import using only the cached responses, without "
+                "network access"
+            ),
+        )
+        parser.add_argument(
+            "--cache-dir",
+            action="store",
+            dest="cache_dir",
+            help="Directory of the cached responses",
         )
         parser.add_argument(
             "--single", action="store", dest="single", help="Import only single entity"
@@ -84,6 +100,8 @@ class Command(BaseCommand):
                 "data_path": os.path.join(root_dir, "data"),
                 "verbosity": int(options["verbosity"]),
                 "cached": options["cached"],
+                "replay": options["replay"],
+                "cache_dir": options["cache_dir"],
                 "single": options["single"],
                 "remap": options["remap"],
                 "force": options["force"],
@@ -92,7 +110,8 @@ class Command(BaseCommand):
 
         # Activate the default language for the duration of the import
         # to make sure translated fields are populated correctly.
-        with override(settings.LANGUAGES[0][0]):
+        # Defer the side effects of saving the events until the end of the import
+        with override(settings.LANGUAGES[0][0]), bulk_event_save():
             for imp_type in self.importer_types:
                 name = "import_%s" % imp_type
                 method = getattr(importer, name, None)
@@ -1,13 +1,123 @@
+import pickle
+import time
 from datetime import datetime
 
 import pytz
-from django.conf import settings
-from django.core.cache import cache
+from django.contrib.postgres.aggregates import StringAgg
 from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, Func, OuterRef, Subquery, TextField, Value
 
-from events.models import Event
+from events.models import Event, Place
+from events.ongoing_cache import (
+    INTERNET_EVENTS_CACHE_NAME,
+    LOCAL_EVENTS_CACHE_NAME,
+    publish_ongoing_events,
+    update_ongoing_events,
+)
 from linkedevents.settings import MUNIGEO_MUNI
 
+CHUNK_SIZE = 2000
+
+SEARCHABLE_EVENT_FIELDS = (
+    "name",
+    "description",
+    "short_description",
+    "name_en",
+    "description_en",
+    "short_description_en",
+    "name_sv",
+    "description_sv",
+    "short_description_sv",
+)
+SEARCHABLE_KEYWORD_FIELDS = (
+    "keyword__name_fi",
+    "keyword__name_sv",
+    "keyword__name_en",
+)
+SEARCHABLE_LOCATION_FIELDS = (
+    "location__street_address_fi",
+    "location__street_address_sv",
+    "location__name_fi",
+    "location__name_sv",
+    "location__name_en",
+    "location__description_fi",
+    "location__description_sv",
+    "location__description_en",
+)
+
+
+class ConcatWS(Func):
+    function = "CONCAT_WS"
+    output_field = TextField()
+
+
+def get_ongoing_event_querysets():
+    ongoing_events = Event.objects.filter(
+        end_time__gte=datetime.utcnow().replace(tzinfo=pytz.utc),
+        deleted=False,
+    )
+    local_places = Place.objects.filter(
+        pk=OuterRef("location_id"), divisions__ocd_id__endswith=MUNIGEO_MUNI
+    )
+    return {
+        LOCAL_EVENTS_CACHE_NAME: ongoing_events.filter(Exists(local_places)),
+        INTERNET_EVENTS_CACHE_NAME: ongoing_events.filter(
+            location__id__endswith="internet"
+        ),
+    }
+
+
+def get_searchable_text():
+    """
+    Build the searchable text of an event in the database. Keyword names are
+    aggregated in a subquery so that each event is fetched as a single row.
+    """
+    keyword_names = (
+        Event.keywords.through.objects.filter(event=OuterRef("pk"))
+        .values("event")
+        .annotate(
+            names=StringAgg(
+                ConcatWS(Value(" "), *SEARCHABLE_KEYWORD_FIELDS),
+                delimiter=" ",
+                distinct=True,
+            )
+        )
+        .values("names")
+    )
+    text = ConcatWS(
+        Value(" "),
+        *SEARCHABLE_EVENT_FIELDS,
+        Subquery(keyword_names),
+        *SEARCHABLE_LOCATION_FIELDS,
+    )
+    return Func(
+        text,
+        Value("\n\r"),
+        Value("  "),
+        function="TRANSLATE",
+        output_field=TextField(),
+    )
+
+
+def get_event_strings_and_end_times(queryset, stats=None):
+    rows = (
+        queryset.annotate(searchable_text=get_searchable_text())
+        .values_list("id", "end_time", "searchable_text")
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+    event_strings = {}
+    end_times = {}
+    for event_id, end_time, text in rows:
+        event_strings[event_id] = text
+        end_times[event_id] = end_time
+
+    if stats is not None:
+        stats["rows"] += len(event_strings)
+        stats["bytes"] += len(pickle.dumps(event_strings, pickle.HIGHEST_PROTOCOL))
+    return event_strings, end_times
+
 
 class Command(BaseCommand):
     help = (
@@ -16,85 +126,81 @@ class Command(BaseCommand):
         "In case memcached is used, check -m and -I parameters."
     )
 
-    def handle(self, *args, **options):
-        local_events = Event.objects.filter(
-            location__divisions__ocd_id__endswith=MUNIGEO_MUNI,
-            end_time__gte=datetime.utcnow().replace(tzinfo=pytz.utc),
-            deleted=False,
-        ).values_list(
-            "id",
-            "name",
-            "description",
-            "short_description",
-            "name_en",
-            "description_en",
-            "short_description_en",
-            "name_sv",
-            "description_sv",
-            "short_description_sv",
-            "keywords__name_fi",
-            "keywords__name_sv",
-            "keywords__name_en",  # noqa E501
-            "location__street_address_fi",
-            "location__street_address_sv",
-            "location__name_fi",
-            "location__name_sv",
-            "location__name_en",  # noqa E501
-            "location__description_fi",
-            "location__description_sv",
-            "location__description_en",
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help=(
+                "Only update the events that have changed since the previous run "
+                "and prune the events that have ended. Falls back to a full "
+                "rebuild if the cache has not been populated."
+            ),
         )
-        event_dict = {i[0]: set() for i in local_events}
-        for i in local_events:
-            event_dict[i[0]].update(i[1:])
-            event_dict[i[0]].discard(None)
-
-        event_strings = {
-            k: " ".join(v).replace("\n", " ").replace("\r", " ")
-            for k, v in event_dict.items()
-        }
-
-        cache.set(
-            "local_ids", event_strings, timeout=settings.ONGOING_EVENTS_CACHE_TIMEOUT
+        parser.add_argument(
+            "--stats",
+            action="store_true",
+            help=(
+                "Report the number of rows fetched, the size of the cached values "
+                "and the elapsed time for each cache"
+            ),
         )
 
-        inet_events = Event.objects.filter(
-            location__id__endswith="internet",
-            end_time__gte=datetime.utcnow().replace(tzinfo=pytz.utc),
-            deleted=False,
-        ).values_list(
-            "id",
-            "name",
-            "description",
-            "short_description",
-            "name_en",
-            "description_en",
-            "short_description_en",
-            "name_sv",
-            "description_sv",
-            "short_description_sv",
-            "keywords__name_fi",
-            "keywords__name_sv",
-            "keywords__name_en",  # noqa E501
-            "location__street_address_fi",
-            "location__street_address_sv",
-            "location__name_fi",
-            "location__name_sv",
-            "location__name_en",  # noqa E501
-            "location__description_fi",
-            "location__description_sv",
-            "location__description_en",
+    def handle(self, *args, **options):
+        self.show_stats = options["stats"]
+
+        if options["incremental"]:
+            self.update_changed_events()
+        else:
+            self.populate_all_events()
+
+    def get_event_strings_and_end_times(self, cache_name, queryset):
+        stats = {"rows": 0, "bytes": 0} if self.show_stats else None
+        start = time.monotonic()
+
+        event_strings, end_times = get_event_strings_and_end_times(queryset, stats)
+
+        if stats is not None:
+            self.stdout.write(
+                f"{cache_name}: fetched {stats['rows']} rows, "
+                f"produced {stats['bytes']} bytes "
+                f"in {time.monotonic() - start:.2f} seconds"
+            )
+        return event_strings, end_times
+
+    def populate_all_events(self):
+        Event.objects.filter(ongoing_cache_changed=True).update(
+            ongoing_cache_changed=False
         )
-        event_dict = {i[0]: set() for i in inet_events}
-        for i in inet_events:
-            event_dict[i[0]].update(i[1:])
-            event_dict[i[0]].discard(None)
-
-        event_strings = {
-            k: " ".join(v).replace("\n", " ").replace("\r", " ")
-            for k, v in event_dict.items()
-        }
-
-        cache.set(
-            "internet_ids", event_strings, timeout=settings.ONGOING_EVENTS_CACHE_TIMEOUT
+
+        for cache_name, queryset in get_ongoing_event_querysets().items():
+            event_strings, end_times = self.get_event_strings_and_end_times(
+                cache_name, queryset
+            )
+            publish_ongoing_events(cache_name, event_strings, end_times)
+            self.stdout.write(f"Cached {len(event_strings)} events to {cache_name}")
+
+    @transaction.atomic
+    def update_changed_events(self):
+        # The flags are cleared before reading the events so that changes made
+        # during the update are picked up by the next run. If updating the cache
+        # fails, the flags are restored by the rollback.
+        changed_ids = set(
+            Event.objects.filter(ongoing_cache_changed=True).values_list(
+                "id", flat=True
+            )
         )
+        Event.objects.filter(id__in=changed_ids).update(ongoing_cache_changed=False)
+
+        for cache_name, queryset in get_ongoing_event_querysets().items():
+            event_strings, end_times = self.get_event_strings_and_end_times(
+                cache_name, queryset.filter(id__in=changed_ids)
+            )
+            removed = changed_ids - event_strings.keys()
+            if not update_ongoing_events(cache_name, event_strings, end_times, removed):
+                self.stdout.write(f"Cache {cache_name} missing, populating all events")
+                self.populate_all_events()
+                return
+
+            self.stdout.write(
+                f"Updated {len(event_strings)} changed events in {cache_name}"
+            )
@@ -2,17 +2,29 @@ import os
 import re
 
 from django.conf import settings
-from django.core.management import BaseCommand
-from django.db import connection
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
 from django.db.models import Exists, OuterRef, Q
 
 from events.models import Event, EventFullText, Place
 
+BATCH_SIZE = 1000
+
 
 def sql_filename(filename):
     return os.path.join(os.path.dirname(__file__), f"sql/refresh_full_text/{filename}")
 
 
+FULL_TEXT_FUNCTIONS = (
+    "events_eventfulltext_event_changed",
+    "events_eventfulltext_place_changed",
+    "events_eventfulltext_event_keywords_changed",
+    "events_eventfulltext_keyword_changed",
+    "events_eventfulltext_refresh",
+    "events_eventfulltext_compute",
+)
+
+
 def field_regex(field):
     return re.compile(
         rf"(?P<head>setweight\([^)]*?{field}.*?')(?P<weight>[ABCD])(?P<tail>')",
@@ -20,8 +32,35 @@ def field_regex(field):
     )
 
 
+def get_full_text_relation_kind():
+    """
+    Return "m" if events_eventfulltext is a materialized view, "r" if it is a
+    table maintained by triggers, or None if it does not exist.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relkind FROM pg_class "
+            "WHERE relname = 'events_eventfulltext' AND pg_table_is_visible(oid)"
+        )
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def drop_full_text_relation():
+    with connection.cursor() as cursor:
+        if get_full_text_relation_kind() == "r":
+            for function in FULL_TEXT_FUNCTIONS:
+                cursor.execute(f"DROP FUNCTION IF EXISTS {function} CASCADE")
+            cursor.execute("DROP TABLE events_eventfulltext CASCADE")
+        else:
+            cursor.execute("DROP MATERIALIZED VIEW IF EXISTS events_eventfulltext")
+
+
 class Command(BaseCommand):
-    help = "Refresh the full text materialized view. Use switches to adjust behaviour"
+    help = (
+        "Refresh the full text materialized view, or maintain the full text table "
+        "that replaces it. Use switches to adjust behaviour"
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -44,6 +83,40 @@ class Command(BaseCommand):
 
         parser.add_argument("--force", action="store_true", help="Force refresh")
 
+        parser.add_argument(
+            "--create-table",
+            action="store_true",
+            help=(
+                "Replace the materialized view with a table that is kept up to date "
+                "by database triggers and backfill it"
+            ),
+        )
+
+        parser.add_argument(
+            "--backfill",
+            action="store_true",
+            help="Recompute every row of the full text table",
+        )
+
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Report rows of the full text table that are missing or out of date",
+        )
+
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Together with --check, recompute the inconsistent rows",
+        )
+
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help=f"Number of events to process at once, {BATCH_SIZE} by default",
+        )
+
     def apply_overrides(self, sql):
         for field, weight_override in settings.FULL_TEXT_WEIGHT_OVERRIDES.items():
             replaced_sql = re.sub(
@@ -60,12 +133,91 @@ class Command(BaseCommand):
             sql = replaced_sql
         return sql
 
+    def get_event_id_batches(self, batch_size):
+        last_id = ""
+        while True:
+            event_ids = list(
+                Event.objects.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not event_ids:
+                return
+            yield event_ids
+            last_id = event_ids[-1]
+
+    def create_table(self, batch_size):
+        self.stdout.write("Creating events_eventfulltext table")
+
+        with open(sql_filename("create_table.sql"), "r") as file:
+            sql = self.apply_overrides(file.read())
+
+        with transaction.atomic():
+            drop_full_text_relation()
+            with connection.cursor() as cursor:
+                cursor.execute(sql)
+
+        self.backfill(batch_size)
+
+    def backfill(self, batch_size):
+        """
+        Recompute the rows in batches of events. Each batch is committed
+        separately, so an interrupted backfill can simply be run again.
+        """
+        count = 0
+        for event_ids in self.get_event_id_batches(batch_size):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute("SELECT events_eventfulltext_refresh(%s)", [event_ids])
+            count += len(event_ids)
+            self.stdout.write(f"Backfilled {count} events")
+
+    def check_table(self, batch_size, fix):
+        inconsistent = 0
+        for event_ids in self.get_event_id_batches(batch_size):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT expected.event_id
+                    FROM events_eventfulltext_compute(%s) expected
+                             LEFT OUTER JOIN events_eventfulltext actual
+                                             ON actual.event_id = expected.event_id
+                    WHERE actual IS DISTINCT FROM expected
+                    """,
+                    [event_ids],
+                )
+                stale_ids = [row[0] for row in cursor.fetchall()]
+            inconsistent += len(stale_ids)
+            if stale_ids and fix:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT events_eventfulltext_refresh(%s)", [stale_ids]
+                    )
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                {"DELETE" if fix else "SELECT event_id"} FROM events_eventfulltext
+                WHERE NOT EXISTS (SELECT 1 FROM events_event WHERE id = event_id)
+                """
+            )
+            inconsistent += cursor.rowcount
+
+        if not inconsistent:
+            self.stdout.write(self.style.SUCCESS("No inconsistent rows found!"))
+        elif fix:
+            self.stdout.write(f"Fixed {inconsistent} inconsistent rows")
+        else:
+            self.stdout.write(
+                self.style.WARNING(f"Found {inconsistent} inconsistent rows")
+            )
+
     def handle(self, *args, **options):
+        is_table = get_full_text_relation_kind() == "r"
+
         if options["drop"]:
             # Print stdout success info
             self.stdout.write("Dropping events_eventfulltext materialized view")
-            with connection.cursor() as cursor:
-                cursor.execute("DROP MATERIALIZED VIEW IF EXISTS events_eventfulltext")
+            drop_full_text_relation()
 
         elif options["create"] or options["create_no_transaction"]:
             self.stdout.write(
@@ -79,9 +231,33 @@ class Command(BaseCommand):
             if not options["create_no_transaction"]:
                 sql = f"BEGIN;\n {sql} \nCOMMIT;\n"
 
+            if is_table:
+                drop_full_text_relation()
             with connection.cursor() as cursor:
                 cursor.execute(sql)
 
+        elif options["create_table"]:
+            self.create_table(options["batch_size"])
+
+        elif options["backfill"] or options["check"]:
+            if not is_table:
+                raise CommandError(
+                    "events_eventfulltext is not a table, create it with --create-table"
+                )
+            if options["backfill"]:
+                self.backfill(options["batch_size"])
+            else:
+                self.check_table(options["batch_size"], options["fix"])
+
+        elif is_table:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    "events_eventfulltext is kept up to date by triggers, "
+                    "refresh not needed!"
+                )
+            )
+            return
+
         else:
             if not options["force"]:
                 self.stdout.write("Checking if refresh is needed...")
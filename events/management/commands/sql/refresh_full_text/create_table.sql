@@ -0,0 +1,181 @@
+-- A table with the same columns as the events_eventfulltext materialized view,
+-- kept up to date by triggers on the tables the search vectors are built from.
+
+CREATE TABLE events_eventfulltext
+(
+    event_id                 varchar(100) PRIMARY KEY,
+    place_id                 varchar(100),
+    event_last_modified_time timestamp with time zone,
+    place_last_modified_time timestamp with time zone,
+    search_vector_fi         tsvector,
+    search_vector_en         tsvector,
+    search_vector_sv         tsvector
+);
+
+CREATE FUNCTION events_eventfulltext_compute(event_ids text[]) RETURNS SETOF events_eventfulltext AS
+$$
+SELECT event.id                                                                     AS event_id,
+       place.id                                                                     AS place_id,
+       event.last_modified_time                                                     AS event_last_modified_time,
+       place.last_modified_time                                                     AS place_last_modified_time,
+
+       -- The weights can be adjusted using an environment variable, see refresh_full_text command
+       setweight(to_tsvector('finnish', coalesce(event.name_fi, '')), 'A') ||
+       setweight(to_tsvector('finnish', coalesce(event.short_description_fi, '')), 'C') ||
+       setweight(to_tsvector('finnish', coalesce(event.description_fi, '')), 'D') ||
+       setweight(to_tsvector('finnish', coalesce(place.name_fi, '')), 'A') ||
+       setweight(to_tsvector('finnish', coalesce(event_keywords.name_fi, '')), 'B') as search_vector_fi,
+
+       setweight(to_tsvector('english', coalesce(event.name_en, '')), 'A') ||
+       setweight(to_tsvector('english', coalesce(event.short_description_en, '')), 'C') ||
+       setweight(to_tsvector('english', coalesce(event.description_en, '')), 'D') ||
+       setweight(to_tsvector('english', coalesce(place.name_en, '')), 'A') ||
+       setweight(to_tsvector('english', coalesce(event_keywords.name_en, '')), 'B') as search_vector_en,
+
+       setweight(to_tsvector('swedish', coalesce(event.name_sv, '')), 'A') ||
+       setweight(to_tsvector('swedish', coalesce(event.short_description_sv, '')), 'C') ||
+       setweight(to_tsvector('swedish', coalesce(event.description_sv, '')), 'D') ||
+       setweight(to_tsvector('swedish', coalesce(place.name_sv, '')), 'A') ||
+       setweight(to_tsvector('swedish', coalesce(event_keywords.name_sv, '')), 'B') as search_vector_sv
+
+FROM events_event event
+         LEFT OUTER JOIN events_place place ON event.location_id = place.id
+         -- Join the keywords, aggregated as a string
+         LEFT OUTER JOIN (SELECT events_event_keywords.event_id,
+                                 string_agg(name_fi, ' ') AS name_fi,
+                                 string_agg(name_en, ' ') AS name_en,
+                                 string_agg(name_sv, ' ') AS name_sv
+                          FROM events_event_keywords
+                                   LEFT OUTER JOIN events_keyword ON events_event_keywords.keyword_id = events_keyword.id
+                          WHERE events_event_keywords.event_id = ANY (event_ids)
+                          GROUP BY 1) AS event_keywords ON event_keywords.event_id = event.id
+WHERE event.id = ANY (event_ids);
+$$ LANGUAGE sql STABLE;
+
+CREATE FUNCTION events_eventfulltext_refresh(event_ids text[]) RETURNS void AS
+$$
+BEGIN
+    DELETE FROM events_eventfulltext
+    WHERE event_id = ANY (event_ids)
+      AND NOT EXISTS (SELECT 1 FROM events_event WHERE id = event_id);
+
+    INSERT INTO events_eventfulltext
+    SELECT * FROM events_eventfulltext_compute(event_ids)
+    ON CONFLICT (event_id) DO UPDATE SET place_id                 = excluded.place_id,
+                                         event_last_modified_time = excluded.event_last_modified_time,
+                                         place_last_modified_time = excluded.place_last_modified_time,
+                                         search_vector_fi         = excluded.search_vector_fi,
+                                         search_vector_en         = excluded.search_vector_en,
+                                         search_vector_sv         = excluded.search_vector_sv;
+END;
+$$ LANGUAGE plpgsql;
+
+-- The triggers are statement level so that bulk updates refresh all of the
+-- affected events at once. Updates that do not touch the searchable columns,
+-- such as the n_events counters, are skipped.
+
+CREATE FUNCTION events_eventfulltext_event_changed() RETURNS trigger AS
+$$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM events_eventfulltext WHERE event_id IN (SELECT id FROM old_rows);
+    ELSIF TG_OP = 'INSERT' THEN
+        PERFORM events_eventfulltext_refresh(ARRAY(SELECT id FROM new_rows));
+    ELSE
+        PERFORM events_eventfulltext_refresh(ARRAY(
+            SELECT new_rows.id
+            FROM new_rows
+                     JOIN old_rows ON old_rows.id = new_rows.id
+            WHERE (new_rows.name_fi, new_rows.name_en, new_rows.name_sv,
+                   new_rows.short_description_fi, new_rows.short_description_en, new_rows.short_description_sv,
+                   new_rows.description_fi, new_rows.description_en, new_rows.description_sv,
+                   new_rows.location_id, new_rows.last_modified_time)
+                      IS DISTINCT FROM
+                  (old_rows.name_fi, old_rows.name_en, old_rows.name_sv,
+                   old_rows.short_description_fi, old_rows.short_description_en, old_rows.short_description_sv,
+                   old_rows.description_fi, old_rows.description_en, old_rows.description_sv,
+                   old_rows.location_id, old_rows.last_modified_time)
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION events_eventfulltext_place_changed() RETURNS trigger AS
+$$
+BEGIN
+    PERFORM events_eventfulltext_refresh(ARRAY(
+        SELECT events_event.id
+        FROM events_event
+                 JOIN new_rows ON new_rows.id = events_event.location_id
+                 JOIN old_rows ON old_rows.id = new_rows.id
+        WHERE (new_rows.name_fi, new_rows.name_en, new_rows.name_sv, new_rows.last_modified_time)
+                  IS DISTINCT FROM
+              (old_rows.name_fi, old_rows.name_en, old_rows.name_sv, old_rows.last_modified_time)
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION events_eventfulltext_event_keywords_changed() RETURNS trigger AS
+$$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM events_eventfulltext_refresh(ARRAY(SELECT DISTINCT event_id FROM new_rows));
+    ELSE
+        PERFORM events_eventfulltext_refresh(ARRAY(SELECT DISTINCT event_id FROM old_rows));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION events_eventfulltext_keyword_changed() RETURNS trigger AS
+$$
+BEGIN
+    PERFORM events_eventfulltext_refresh(ARRAY(
+        SELECT DISTINCT events_event_keywords.event_id
+        FROM events_event_keywords
+                 JOIN new_rows ON new_rows.id = events_event_keywords.keyword_id
+                 JOIN old_rows ON old_rows.id = new_rows.id
+        WHERE (new_rows.name_fi, new_rows.name_en, new_rows.name_sv)
+                  IS DISTINCT FROM
+              (old_rows.name_fi, old_rows.name_en, old_rows.name_sv)
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER events_eventfulltext_event_insert
+    AFTER INSERT ON events_event
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION events_eventfulltext_event_changed();
+
+CREATE TRIGGER events_eventfulltext_event_update
+    AFTER UPDATE ON events_event
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION events_eventfulltext_event_changed();
+
+CREATE TRIGGER events_eventfulltext_event_delete
+    AFTER DELETE ON events_event
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION events_eventfulltext_event_changed();
+
+CREATE TRIGGER events_eventfulltext_place_update
+    AFTER UPDATE ON events_place
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION events_eventfulltext_place_changed();
+
+CREATE TRIGGER events_eventfulltext_event_keywords_insert
+    AFTER INSERT ON events_event_keywords
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION events_eventfulltext_event_keywords_changed();
+
+CREATE TRIGGER events_eventfulltext_event_keywords_delete
+    AFTER DELETE ON events_event_keywords
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION events_eventfulltext_event_keywords_changed();
+
+CREATE TRIGGER events_eventfulltext_keyword_update
+    AFTER UPDATE ON events_keyword
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION events_eventfulltext_keyword_changed();
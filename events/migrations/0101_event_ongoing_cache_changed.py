@@ -0,0 +1,17 @@
+# Generated by Django 4.2.20 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("events", "0100_alter_event_maximum_attendee_capacity_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="ongoing_cache_changed",
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
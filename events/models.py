@@ -44,6 +44,8 @@ from rest_framework.exceptions import ValidationError
 from reversion import revisions as reversion
 
 from events import translation_utils
+from events.bulk import get_bulk_event_save
+from events.query_cache import invalidate_event_query_cache
 from events.translation_utils import TranslatableSerializableMixin
 from notifications.models import (
     NotificationTemplateError,
@@ -1109,6 +1111,10 @@ class Event(
     # searching for local events
     local = models.BooleanField(default=False)
 
+    # set on changes that affect the ongoing events cache, cleared by the
+    # populate_local_event_cache command once the cache has been updated
+    ongoing_cache_changed = models.BooleanField(default=False, db_index=True)
+
     # these fields are populated and kept up to date by the db. See migration 0080
     search_vector_fi = SearchVectorField(null=True)
     search_vector_en = SearchVectorField(null=True)
@@ -1121,6 +1127,86 @@ class Event(
     class MPTTMeta:
         parent_attr = "super_event"
 
+    # The fields save() compares to their saved values
+    SAVED_STATE_FIELDS = (
+        "location_id",
+        "publication_status",
+        "event_status",
+        "deleted",
+    )
+    # The fields the ongoing events cache reads from the event, see
+    # populate_local_event_cache. Translated fields are expanded.
+    ONGOING_CACHE_FIELDS = (
+        "name",
+        "description",
+        "short_description",
+        "location_id",
+        "end_time",
+        "deleted",
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Saving in bulk uses the loaded values instead of fetching them again
+        if get_bulk_event_save() is not None:
+            instance._remember_saved_state()
+        return instance
+
+    def _get_ongoing_cache_fields(self):
+        return translation_utils.expand_model_fields(self, self.ONGOING_CACHE_FIELDS)
+
+    def _get_saved_state_fields(self):
+        return list(
+            dict.fromkeys([*self.SAVED_STATE_FIELDS, *self._get_ongoing_cache_fields()])
+        )
+
+    def _remember_saved_state(self):
+        fields = self._get_saved_state_fields()
+        deferred_fields = self.get_deferred_fields()
+        if not any(field in deferred_fields for field in fields):
+            self._saved_state = {field: getattr(self, field) for field in fields}
+
+    def _get_saved_state(self, bulk_save):
+        if bulk_save is not None and not self._state.adding:
+            saved_state = getattr(self, "_saved_state", None)
+            if saved_state is not None:
+                return saved_state
+
+        return (
+            Event.objects.filter(id=self.id)
+            .values(*self._get_saved_state_fields())
+            .first()
+        )
+
+    def _get_updated_attnames(self, update_fields):
+        updated = set(translation_utils.expand_model_fields(self, update_fields))
+        if "location" in updated:
+            updated.add("location_id")
+        return updated
+
+    def _update_saved_state(self, update_fields):
+        """Remember the saved values for the next save in bulk."""
+        if update_fields is None:
+            self._remember_saved_state()
+            return
+
+        saved_state = getattr(self, "_saved_state", None)
+        if saved_state is not None:
+            for field in saved_state.keys() & self._get_updated_attnames(update_fields):
+                saved_state[field] = getattr(self, field)
+
+    def _has_ongoing_cache_changes(self, saved_state, update_fields):
+        """Check if saving changes the fields the ongoing events cache reads."""
+        if saved_state is None:
+            return True
+
+        fields = self._get_ongoing_cache_fields()
+        if update_fields is not None:
+            updated = self._get_updated_attnames(update_fields)
+            fields = [field for field in fields if field in updated]
+        return any(getattr(self, field) != saved_state[field] for field in fields)
+
     @transaction.atomic
     def save(self, *args, **kwargs):
         if self._has_circular_replacement():
@@ -1139,8 +1225,10 @@ class Event(
                 extra={"event": self},
             )
 
+        bulk_save = get_bulk_event_save()
+
         # needed to cache location event numbers
-        old_location = None
+        old_location_id = None
 
         # needed for notifications
         old_event_status = None
@@ -1148,16 +1236,13 @@ class Event(
         old_deleted = None
         created = True
 
-        if self.id:
-            try:
-                event = Event.objects.get(id=self.id)
-                created = False
-                old_location = event.location
-                old_publication_status = event.publication_status
-                old_event_status = event.event_status
-                old_deleted = event.deleted
-            except Event.DoesNotExist:
-                pass
+        saved_state = self._get_saved_state(bulk_save) if self.id else None
+        if saved_state:
+            created = False
+            old_location_id = saved_state["location_id"]
+            old_publication_status = saved_state["publication_status"]
+            old_event_status = saved_state["event_status"]
+            old_deleted = saved_state["deleted"]
 
         # drafts may not have times set, so check that first
         start = getattr(self, "start_time", None)
@@ -1191,27 +1276,51 @@ class Event(
                 )
             )
 
+        update_fields = kwargs.get("update_fields")
+        if self._has_ongoing_cache_changes(saved_state, update_fields):
+            self.ongoing_cache_changed = True
+            if update_fields is not None:
+                kwargs["update_fields"] = [*update_fields, "ongoing_cache_changed"]
+        elif update_fields is None and not kwargs.get("force_insert"):
+            # Do not overwrite the flag set by keyword or place changes made
+            # since the event was loaded
+            deferred_fields = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name != "ongoing_cache_changed"
+                and field.attname not in deferred_fields
+            ]
+
+        if bulk_save is not None:
+            bulk_save.events_saved = True
+        else:
+            invalidate_event_query_cache()
+
         super().save(*args, **kwargs)
 
-        # needed to cache location event numbers
-        if not old_location and self.location:
-            Place.objects.filter(id=self.location.id).update(n_events_changed=True)
-        if old_location and not self.location:
-            # drafts (or imported events) may not always have location set
-            Place.objects.filter(id=old_location.id).update(n_events_changed=True)
-        if old_location and self.location and old_location != self.location:
-            Place.objects.filter(id__in=(old_location.id, self.location.id)).update(
-                n_events_changed=True
-            )
+        if bulk_save is not None:
+            self._update_saved_state(update_fields)
+
+        # needed to cache location event numbers. Drafts (or imported events) may
+        # not always have location set.
+        if old_location_id != self.location_id:
+            place_ids = {old_location_id, self.location_id} - {None}
+            if bulk_save is not None:
+                bulk_save.place_ids |= place_ids
+            else:
+                Place.objects.filter(id__in=place_ids).update(n_events_changed=True)
 
         # send notifications
+        notifications = []
         if (
             old_publication_status == PublicationStatus.DRAFT
             and self.publication_status == PublicationStatus.PUBLIC
         ):
-            self.send_published_notification()
+            notifications.append("send_published_notification")
         if self.publication_status == PublicationStatus.DRAFT and event_deleted:
-            self.send_deleted_notification()
+            notifications.append("send_deleted_notification")
         if (
             created
             and self.publication_status == PublicationStatus.DRAFT
@@ -1222,7 +1331,13 @@ class Event(
             # Do not send draft emails from events created by admins.
             and not self.publisher.admin_users.filter(id=self.created_by_id).exists()
         ):
-            self.send_draft_posted_notification()
+            notifications.append("send_draft_posted_notification")
+
+        for method_name in notifications:
+            if bulk_save is not None:
+                bulk_save.add_notification(self, method_name)
+            else:
+                getattr(self, method_name)()
 
         if event_deleted or event_cancelled:
             # If there weren't any Talpa payments, cancel the registration or notify the
@@ -1395,7 +1510,8 @@ reversion.register(Event)
 
 class EventFullText(models.Model):
     """
-    A representation of the materialized view used in full-text search.
+    A representation of the materialized view, or the table maintained by
+    triggers that replaces it, used in full-text search.
     """
 
     event = models.OneToOneField(
@@ -1428,6 +1544,9 @@ def keyword_added_or_removed(
     Listens to event-keyword add signals to keep event number up to date
     """
     if action in ("post_add", "post_remove"):
+        if bulk_save := get_bulk_event_save():
+            bulk_save.keyword_ids |= pk_set if model is Keyword else {instance.pk}
+            return
         if model is Keyword:
             Keyword.objects.filter(pk__in=pk_set).update(n_events_changed=True)
         if model is Event:
@@ -0,0 +1,401 @@
+"""
+Worker-local search index for the ongoing events cache.
+
+The populate_local_event_cache management command stores a dict of
+``{event_id: searchable text}`` for each ongoing event group in the cache
+(``local_ids`` and ``internet_ids``) together with a version key. Running the
+fuzzy ``*_ongoing_*`` regexes over every cached text is expensive, so each
+worker builds a trigram index of the published texts and only runs the regex
+against events that can possibly match. The index is rebuilt only when the
+command publishes a new version.
+
+Incremental updates of individual events publish a delta along with the new
+version, which lets the workers patch their indexes instead of rebuilding them.
+"""
+
+import copy
+import logging
+import threading
+from itertools import chain
+from typing import Iterable, Optional
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+LOCAL_EVENTS_CACHE_NAME = "local_ids"
+INTERNET_EVENTS_CACHE_NAME = "internet_ids"
+
+TRIGRAM_LENGTH = 3
+
+# Deltas only need to live long enough for every worker to catch up
+ONGOING_EVENTS_DELTA_TIMEOUT = 60 * 60
+MAX_INDEX_DELTAS = 20
+
+_loaded_indexes = {}
+_index_lock = threading.Lock()
+
+
+def get_max_term_edits(term: str) -> int:
+    """Return the number of edits allowed when fuzzy matching the given term."""
+    return 0 if len(term) < 8 else 1
+
+
+def get_cache_version_key(cache_name: str) -> str:
+    return f"{cache_name}_version"
+
+
+def get_cache_end_times_key(cache_name: str) -> str:
+    return f"{cache_name}_end_times"
+
+
+def get_cache_delta_key(cache_name: str, version: str) -> str:
+    return f"{cache_name}_delta_{version}"
+
+
+def publish_ongoing_events(
+    cache_name: str, event_strings: dict, end_times: dict
+) -> None:
+    """
+    Store the searchable event texts and the event end times in the cache and
+    bump the cache version so that the workers reload their indexes.
+    """
+    cache.set_many(
+        {
+            cache_name: event_strings,
+            get_cache_end_times_key(cache_name): end_times,
+        },
+        timeout=settings.ONGOING_EVENTS_CACHE_TIMEOUT,
+    )
+    cache.set(
+        get_cache_version_key(cache_name),
+        uuid4().hex,
+        timeout=settings.ONGOING_EVENTS_CACHE_TIMEOUT,
+    )
+
+
+def update_ongoing_events(
+    cache_name: str, updated: dict, end_times: dict, removed: Iterable[str]
+) -> bool:
+    """
+    Update the texts of the given events in the published cache, remove the
+    given events and prune the events that have already ended.
+
+    :param updated: searchable texts of the new and changed events
+    :param end_times: end times of the new and changed events
+    :param removed: ids of the events that no longer belong to the cache
+    :return: False if the cache has not been fully published and has to be
+             populated from scratch
+    """
+    end_times_key = get_cache_end_times_key(cache_name)
+    version_key = get_cache_version_key(cache_name)
+    values = cache.get_many([cache_name, end_times_key, version_key])
+    if len(values) < 3:
+        return False
+
+    event_strings = values[cache_name]
+    all_end_times = values[end_times_key]
+    now = timezone.now()
+    removed = {
+        event_id
+        for event_id in chain(
+            removed,
+            (
+                event_id
+                for event_id, end_time in all_end_times.items()
+                if end_time < now
+            ),
+        )
+        if event_id in event_strings and event_id not in updated
+    }
+    if not updated and not removed:
+        return True
+
+    for event_id in removed:
+        del event_strings[event_id]
+        all_end_times.pop(event_id, None)
+    event_strings.update(updated)
+    all_end_times.update(end_times)
+
+    version = uuid4().hex
+    cache.set(
+        get_cache_delta_key(cache_name, version),
+        {"previous": values[version_key], "updated": updated, "removed": removed},
+        timeout=ONGOING_EVENTS_DELTA_TIMEOUT,
+    )
+    cache.set_many(
+        {cache_name: event_strings, end_times_key: all_end_times},
+        timeout=settings.ONGOING_EVENTS_CACHE_TIMEOUT,
+    )
+    cache.set(version_key, version, timeout=settings.ONGOING_EVENTS_CACHE_TIMEOUT)
+    return True
+
+
+def _get_trigrams(text: str) -> set[str]:
+    return {text[i : i + TRIGRAM_LENGTH] for i in range(len(text) - TRIGRAM_LENGTH + 1)}
+
+
+def _positions_to_mask(positions: list[int]) -> int:
+    mask = bytearray(positions[-1] // 8 + 1)
+    for position in positions:
+        mask[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(mask, "little")
+
+
+def _mask_to_positions(mask: int) -> list[int]:
+    bits = bin(mask)[:1:-1]
+    return [position for position, bit in enumerate(bits) if bit == "1"]
+
+
+class OngoingEventIndex:
+    """
+    Trigram index over the cached event texts.
+
+    Each trigram maps to a bitmask of the events whose lowercased text
+    contains it. A term matching with at most k edits preserves all but at
+    most k * TRIGRAM_LENGTH of its distinct trigrams, which gives a lossless
+    candidate filter for the fuzzy regexes built by _terms_to_regex.
+    """
+
+    def __init__(self, event_strings: dict, version: Optional[str] = None):
+        self.version = version
+        self.event_ids = list(event_strings.keys())
+        self.event_strings = list(event_strings.values())
+        self.event_positions = {
+            event_id: position for position, event_id in enumerate(self.event_ids)
+        }
+
+        postings = {}
+        for position, text in enumerate(self.event_strings):
+            for trigram in _get_trigrams(text.lower()):
+                postings.setdefault(trigram, []).append(position)
+
+        self.trigram_masks = {
+            trigram: _positions_to_mask(positions)
+            for trigram, positions in postings.items()
+        }
+        self.all_events_mask = (1 << len(self.event_ids)) - 1
+
+    @property
+    def is_fragmented(self) -> bool:
+        return len(self.event_ids) > 2 * len(self.event_positions) + 100
+
+    def with_changes(
+        self, updated: dict, removed: Iterable[str], version: str
+    ) -> "OngoingEventIndex":
+        """
+        Return a copy of the index with the given event texts updated and the
+        given events removed. Positions of removed events are left empty.
+        """
+        index = copy.copy(self)
+        index.version = version
+        index.event_ids = list(self.event_ids)
+        index.event_strings = list(self.event_strings)
+        index.event_positions = dict(self.event_positions)
+        index.trigram_masks = dict(self.trigram_masks)
+
+        for event_id in chain(removed, updated):
+            position = index.event_positions.get(event_id)
+            if position is None:
+                continue
+            bit = 1 << position
+            for trigram in _get_trigrams(index.event_strings[position].lower()):
+                mask = index.trigram_masks[trigram] & ~bit
+                if mask:
+                    index.trigram_masks[trigram] = mask
+                else:
+                    del index.trigram_masks[trigram]
+            index.event_strings[position] = ""
+
+        for event_id in removed:
+            position = index.event_positions.pop(event_id, None)
+            if position is not None:
+                index.event_ids[position] = None
+
+        for event_id, text in updated.items():
+            position = index.event_positions.get(event_id)
+            if position is None:
+                position = len(index.event_ids)
+                index.event_ids.append(event_id)
+                index.event_strings.append(text)
+                index.event_positions[event_id] = position
+            else:
+                index.event_strings[position] = text
+            bit = 1 << position
+            for trigram in _get_trigrams(text.lower()):
+                index.trigram_masks[trigram] = index.trigram_masks.get(trigram, 0) | bit
+
+        index.all_events_mask = (1 << len(index.event_ids)) - 1
+        return index
+
+    def _get_term_candidates(self, term: str) -> Optional[int]:
+        """
+        Return a bitmask of the events that may match the term, or None if
+        the term is too short to be filtered with trigrams.
+        """
+        trigrams = _get_trigrams(term.lower())
+        max_edits = get_max_term_edits(term)
+        required = len(trigrams) - TRIGRAM_LENGTH * max_edits
+        if required <= 0:
+            return None
+
+        masks = [self.trigram_masks.get(trigram, 0) for trigram in trigrams]
+        if max_edits == 0:
+            candidates = self.all_events_mask
+            for mask in masks:
+                candidates &= mask
+                if not candidates:
+                    break
+            return candidates
+
+        # at_least[n] has the bit set for events containing n + 1 of the trigrams
+        at_least = [0] * required
+        for mask in masks:
+            for n in range(required - 1, 0, -1):
+                at_least[n] |= at_least[n - 1] & mask
+            at_least[0] |= mask
+        return at_least[-1]
+
+    def get_candidate_positions(self, terms: str, operator: str) -> list[int]:
+        candidates = None
+        for term in terms.split(","):
+            term_candidates = self._get_term_candidates(term)
+            if term_candidates is None:
+                if operator == "OR":
+                    return list(range(len(self.event_ids)))
+                continue
+
+            if candidates is None:
+                candidates = term_candidates
+            elif operator == "AND":
+                candidates &= term_candidates
+            else:
+                candidates |= term_candidates
+
+        if candidates is None:
+            return list(range(len(self.event_ids)))
+        return _mask_to_positions(candidates)
+
+    def search(self, pattern, terms: str, operator: str) -> set:
+        return {
+            self.event_ids[position]
+            for position in self.get_candidate_positions(terms, operator)
+            if self.event_ids[position] is not None
+            and pattern.search(self.event_strings[position], concurrent=True)
+        }
+
+
+def _apply_index_deltas(
+    cache_name: str, index: OngoingEventIndex, version: str
+) -> Optional[OngoingEventIndex]:
+    """
+    Bring a loaded index up to the given version using the published deltas,
+    or return None if the deltas are not available.
+    """
+    deltas = []
+    delta_version = version
+    while delta_version != index.version:
+        if len(deltas) == MAX_INDEX_DELTAS:
+            return None
+        delta = cache.get(get_cache_delta_key(cache_name, delta_version))
+        if delta is None:
+            return None
+        deltas.append((delta_version, delta))
+        delta_version = delta["previous"]
+
+    for delta_version, delta in reversed(deltas):
+        index = index.with_changes(delta["updated"], delta["removed"], delta_version)
+    if index.is_fragmented:
+        return None
+    return index
+
+
+def _get_index(cache_name: str, version: Optional[str]) -> Optional[OngoingEventIndex]:
+    if version is None:
+        return None
+
+    index = _loaded_indexes.get(cache_name)
+    if index is not None and index.version == version:
+        return index
+
+    with _index_lock:
+        index = _loaded_indexes.get(cache_name)
+        if index is not None and index.version == version:
+            return index
+
+        if index is not None:
+            index = _apply_index_deltas(cache_name, index, version)
+            if index is not None:
+                _loaded_indexes[cache_name] = index
+                return index
+
+        event_strings = cache.get(cache_name)
+        if not event_strings:
+            return None
+
+        index = OngoingEventIndex(event_strings, version)
+        _loaded_indexes[cache_name] = index
+        logger.info(
+            f"Loaded ongoing events index {cache_name} version {version} "
+            f"with {len(index.event_ids)} events"
+        )
+        return index
+
+
+def _get_indexes(cache_names: Iterable[str]) -> tuple[list, list[str]]:
+    """
+    Return the loaded indexes for the given caches and the names of the
+    caches that have no published version to index.
+    """
+    versions = cache.get_many([get_cache_version_key(name) for name in cache_names])
+
+    indexes = []
+    unindexed = []
+    for cache_name in cache_names:
+        index = _get_index(cache_name, versions.get(get_cache_version_key(cache_name)))
+        if index is None:
+            unindexed.append(cache_name)
+        else:
+            indexes.append(index)
+    return indexes, unindexed
+
+
+def get_ongoing_event_ids(cache_names: Iterable[str]) -> Optional[set]:
+    """
+    Return the ids of all events in the given caches, or None if none of the
+    caches are populated.
+    """
+    indexes, unindexed = _get_indexes(cache_names)
+    ids = None
+    for index in indexes:
+        ids = (ids or set()).union(index.event_positions)
+    for event_strings in cache.get_many(unindexed).values():
+        if event_strings:
+            ids = (ids or set()).union(event_strings.keys())
+    return ids
+
+
+def search_ongoing_events(
+    cache_names: Iterable[str], pattern, terms: str, operator: str
+) -> Optional[set]:
+    """
+    Return the ids of the events in the given caches whose text matches the
+    compiled fuzzy pattern built from terms, or None if none of the caches
+    are populated.
+    """
+    indexes, unindexed = _get_indexes(cache_names)
+    ids = None
+    for index in indexes:
+        ids = (ids or set()) | index.search(pattern, terms, operator)
+    # Caches without a published version are scanned linearly
+    for event_strings in cache.get_many(unindexed).values():
+        if event_strings:
+            ids = (ids or set()) | {
+                k
+                for k, v in event_strings.items()
+                if pattern.search(v, concurrent=True)
+            }
+    return ids
@@ -0,0 +1,76 @@
+"""
+Cache for the ordered event ids matched by event list queries.
+
+Anonymous event list requests with identical filters are common and the
+filter chains in _filter_event_queryset are expensive. When enabled with
+EVENT_QUERY_CACHE_TIMEOUT, the ids matched by a query are cached under a key
+built from the normalized query parameters and the current cache generation.
+Changes to the events and to the places, keywords, registrations and signups
+the filters read bump the generation, which makes every cached result stale.
+"""
+
+import hashlib
+import time
+import urllib.parse
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+GENERATION_KEY = "event_query_cache_generation"
+PAGINATION_PARAMS = ("page", "page_size", "count")
+
+# Cached in place of the id list for queries matching too many events
+TOO_MANY_RESULTS = "too_many_results"
+
+
+def is_event_query_cache_enabled() -> bool:
+    return bool(settings.EVENT_QUERY_CACHE_TIMEOUT)
+
+
+def _new_generation() -> int:
+    # A generation evicted from the cache must not restart from the generation of
+    # results that may still be cached
+    return time.time_ns()
+
+
+def _get_generation() -> int:
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        new_generation = _new_generation()
+        cache.add(GENERATION_KEY, new_generation, timeout=None)
+        generation = cache.get(GENERATION_KEY, new_generation)
+    return generation
+
+
+def _bump_generation() -> None:
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, _new_generation(), timeout=None)
+
+
+def invalidate_event_query_cache() -> None:
+    """Invalidate all cached event query results once the transaction commits."""
+    if is_event_query_cache_enabled():
+        transaction.on_commit(_bump_generation)
+
+
+def get_event_query_cache_key(query_params) -> str:
+    params = sorted(
+        (key, value)
+        for key, values in query_params.lists()
+        if key not in PAGINATION_PARAMS
+        for value in values
+    )
+    digest = hashlib.sha256(urllib.parse.urlencode(params).encode()).hexdigest()
+    return f"event_query_ids:{_get_generation()}:{digest}"
+
+
+def get_cached_event_ids(cache_key: str) -> Optional[list]:
+    return cache.get(cache_key)
+
+
+def cache_event_ids(cache_key: str, event_ids) -> None:
+    cache.set(cache_key, event_ids, timeout=settings.EVENT_QUERY_CACHE_TIMEOUT)
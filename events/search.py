@@ -0,0 +1,136 @@
+"""
+Free text search of events.
+
+The text and combined_text filters originally match substrings of every
+translated event and place field with icontains, and combined_text picks the
+related keywords by ordering every keyword by trigram similarity. That
+behaviour is kept while EVENT_SEARCH_LEGACY_TEXT is enabled. Otherwise the
+filters are routed to the full text search vectors of EventFullText, the same
+ones x_full_text uses, and the results are annotated with a search rank. The
+similar keywords of combined_text are resolved through the cached resolver in
+events.keywords in both modes.
+"""
+
+from functools import reduce
+from operator import add
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import Exists, F, OuterRef, Q, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from events.keywords import resolve_similar_keyword_ids
+from events.models import Event
+from events.translation import EventTranslationOptions, PlaceTranslationOptions
+from linkedevents.utils import get_fixed_lang_codes
+
+SEARCH_RANK = "search_rank"
+
+MAX_SIMILAR_KEYWORDS = 3
+
+
+def is_legacy_text_search() -> bool:
+    return settings.EVENT_SEARCH_LEGACY_TEXT
+
+
+def text_qset_by_translated_field(field, val):
+    # Free text search from all languages of the field
+    languages = get_fixed_lang_codes()
+    qset = Q()
+    for lang in languages:
+        kwarg = {field + "_" + lang + "__icontains": val}
+        qset |= Q(**kwarg)
+    return qset
+
+
+def full_text_query(val, language):
+    """Return the search vector lookup and the search query for the language."""
+    search_vector_name = f"full_text__search_vector_{language}"
+    search_query = SearchQuery(
+        val,
+        search_type="websearch",
+        config=settings.FULLTEXT_SEARCH_LANGUAGES[language],
+    )
+    return search_vector_name, search_query
+
+
+def _full_text_filter_and_rank(val):
+    """
+    Return a filter matching val in the search vector of any language and the
+    rank of the best matching language.
+    """
+    qset = Q()
+    ranks = []
+    for language in settings.FULLTEXT_SEARCH_LANGUAGES:
+        search_vector_name, search_query = full_text_query(val, language)
+        qset |= Q(**{search_vector_name: search_query})
+        ranks.append(SearchRank(F(search_vector_name), search_query))
+    return qset, Greatest(*ranks) if len(ranks) > 1 else ranks[0]
+
+
+def _legacy_text_qset(val):
+    qset = Q()
+
+    # Free string search from all translated event fields
+    event_fields = EventTranslationOptions.fields
+    for field in event_fields:
+        # check all languages for each field
+        qset |= text_qset_by_translated_field(field, val)
+
+    # Free string search from all translated place fields
+    place_fields = PlaceTranslationOptions.fields
+    for field in place_fields:
+        location_field = "location__" + field
+        # check all languages for each field
+        qset |= text_qset_by_translated_field(location_field, val)
+
+    return qset
+
+
+def filter_events_by_text(queryset, val):
+    val = val.lower()
+    if is_legacy_text_search():
+        return queryset.filter(_legacy_text_qset(val))
+
+    qset, rank = _full_text_filter_and_rank(val)
+    return queryset.filter(qset).annotate(**{SEARCH_RANK: rank})
+
+
+def filter_events_by_combined_text(queryset, val):
+    """
+    Filter events matching every comma separated term either in their texts
+    or by their keywords, which are retrieved on the basis of similarity.
+    """
+    vals = val.lower().split(",")
+    legacy = is_legacy_text_search()
+
+    combined_q = Q()
+    ranks = []
+    for val in vals:
+        if legacy:
+            val_q = _legacy_text_qset(val)
+        else:
+            val_q, rank = _full_text_filter_and_rank(val)
+            # Events matched by their keywords only may lack a search vector
+            ranks.append(Coalesce(rank, Value(0.0)))
+
+        keyword_ids, _complete = resolve_similar_keyword_ids(val)
+        val_q |= Q(keywords__in=keyword_ids[:MAX_SIMILAR_KEYWORDS])
+        combined_q &= val_q
+
+    queryset = queryset.filter(
+        Exists(Event.objects.filter(combined_q, id=OuterRef("pk")).only("id"))
+    )
+    if ranks:
+        queryset = queryset.annotate(**{SEARCH_RANK: reduce(add, ranks)})
+    return queryset
+
+
+def order_by_rank(queryset):
+    """
+    Order ranked search results by relevance, keeping the current ordering
+    as the tie-breaker.
+    """
+    if SEARCH_RANK not in queryset.query.annotations:
+        return queryset
+    return queryset.order_by(f"-{SEARCH_RANK}", *queryset.query.order_by)
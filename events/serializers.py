@@ -918,6 +918,7 @@ class EventSerializer(BulkSerializerMixin, EditableLinkedEventsObjectSerializer)
             "search_vector_en",
             "search_vector_fi",
             "search_vector_sv",
+            "ongoing_cache_changed",
         )
         list_serializer_class = BulkListSerializer
 
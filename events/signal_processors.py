@@ -0,0 +1,54 @@
+from haystack import connection_router, connections
+from haystack.exceptions import NotHandled
+from haystack.signals import RealtimeSignalProcessor
+
+from events.bulk import get_bulk_event_save
+from events.models import Event, PublicationStatus
+
+INDEX_UPDATE_CHUNK_SIZE = 500
+
+
+class BulkEventSaveSignalProcessor(RealtimeSignalProcessor):
+    """
+    Updates the search index on every save and delete like the realtime signal
+    processor, except for the events saved inside bulk_event_save(). Those are
+    indexed at once when the block exits.
+    """
+
+    def handle_save(self, sender, instance, **kwargs):
+        bulk_save = get_bulk_event_save()
+        if bulk_save is not None and sender is Event:
+            bulk_save.indexed_event_ids.add(instance.pk)
+            return
+
+        super().handle_save(sender, instance, **kwargs)
+
+
+def update_event_index(event_ids):
+    """Update the search index of the given events from their current state."""
+    event_ids = sorted(event_ids)
+
+    for using in connection_router.for_write(models=[Event]):
+        try:
+            index = connections[using].get_unified_index().get_index(Event)
+        except NotHandled:
+            continue
+        backend = connections[using].get_backend()
+
+        for start in range(0, len(event_ids), INDEX_UPDATE_CHUNK_SIZE):
+            events = Event.objects.filter(
+                id__in=event_ids[start : start + INDEX_UPDATE_CHUNK_SIZE]
+            )
+            indexed_events = []
+            for event in events:
+                # Like EventIndex.update_object()
+                if (
+                    event.deleted
+                    or event.publication_status != PublicationStatus.PUBLIC
+                ):
+                    index.remove_object(event, using=using)
+                else:
+                    indexed_events.append(event)
+
+            if indexed_events:
+                backend.update(index, indexed_events)
@@ -1,7 +1,13 @@
 import logging
 
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
+
+from events.keywords import invalidate_keyword_resolver_cache
+from events.models import Event, Keyword, KeywordLabel, Place
+from events.query_cache import invalidate_event_query_cache
+from events.translation_utils import expand_model_fields
 
 logger = logging.getLogger(__name__)
 
@@ -22,3 +28,113 @@ def organization_replaced(sender, instance, created, **kwargs):
 
         # update owned systems to new owner
         instance.owned_systems.update(owner=new_org)
+
+
+@receiver(post_save, sender=Place, dispatch_uid="place_ongoing_cache")
+def place_ongoing_cache(sender, instance, created, **kwargs):
+    """Mark the upcoming events of a changed place for ongoing cache update."""
+    if created:
+        return
+
+    Event.objects.filter(
+        location=instance, end_time__gte=timezone.now(), ongoing_cache_changed=False
+    ).update(ongoing_cache_changed=True)
+
+
+@receiver(
+    m2m_changed,
+    sender=Event.keywords.through,
+    dispatch_uid="event_keywords_ongoing_cache",
+)
+def event_keywords_ongoing_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    """Mark events whose keywords changed for ongoing cache update."""
+    if action == "pre_clear" and reverse:
+        # The cleared events are not known after clearing
+        Event.objects.filter(keywords=instance, ongoing_cache_changed=False).update(
+            ongoing_cache_changed=True
+        )
+        return
+
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        Event.objects.filter(pk=instance.pk).update(ongoing_cache_changed=True)
+    elif pk_set:
+        Event.objects.filter(pk__in=pk_set).update(ongoing_cache_changed=True)
+
+
+@receiver(pre_save, sender=Keyword, dispatch_uid="keyword_ongoing_cache_pre_save")
+def keyword_ongoing_cache_pre_save(sender, instance, update_fields=None, **kwargs):
+    """Check if the names the ongoing cache reads change."""
+    instance._ongoing_cache_names_changed = False
+    if instance._state.adding:
+        return
+
+    name_fields = expand_model_fields(instance, ["name"])
+    if update_fields is not None:
+        name_fields = [
+            field
+            for field in name_fields
+            if field in expand_model_fields(instance, update_fields)
+        ]
+    if not name_fields:
+        return
+
+    saved_names = Keyword.objects.filter(pk=instance.pk).values(*name_fields).first()
+    instance._ongoing_cache_names_changed = saved_names is not None and any(
+        getattr(instance, field) != saved_names[field] for field in name_fields
+    )
+
+
+@receiver(post_save, sender=Keyword, dispatch_uid="keyword_ongoing_cache")
+def keyword_ongoing_cache(sender, instance, created, **kwargs):
+    """Mark the upcoming events of a renamed keyword for ongoing cache update."""
+    if created or not getattr(instance, "_ongoing_cache_names_changed", False):
+        return
+
+    Event.objects.filter(
+        keywords=instance, end_time__gte=timezone.now(), ongoing_cache_changed=False
+    ).update(ongoing_cache_changed=True)
+
+
+@receiver(post_save, sender=Place, dispatch_uid="event_query_cache_place_saved")
+@receiver(post_delete, sender=Place, dispatch_uid="event_query_cache_place_deleted")
+@receiver(post_save, sender=Keyword, dispatch_uid="event_query_cache_keyword_saved")
+@receiver(post_delete, sender=Keyword, dispatch_uid="event_query_cache_keyword_deleted")
+@receiver(
+    m2m_changed,
+    sender=Event.keywords.through,
+    dispatch_uid="event_query_cache_keywords_changed",
+)
+@receiver(
+    m2m_changed,
+    sender=Event.audience.through,
+    dispatch_uid="event_query_cache_audience_changed",
+)
+@receiver(
+    m2m_changed,
+    sender=Event.in_language.through,
+    dispatch_uid="event_query_cache_in_language_changed",
+)
+def event_query_cache(sender, action=None, **kwargs):
+    """Invalidate the cached event queries when the data they filter by changes."""
+    if action is None or action.startswith("post_"):
+        invalidate_event_query_cache()
+
+
+@receiver(post_save, sender=Keyword, dispatch_uid="keyword_resolver_keyword_saved")
+@receiver(post_delete, sender=Keyword, dispatch_uid="keyword_resolver_keyword_deleted")
+@receiver(post_save, sender=KeywordLabel, dispatch_uid="keyword_resolver_label_saved")
+@receiver(
+    post_delete, sender=KeywordLabel, dispatch_uid="keyword_resolver_label_deleted"
+)
+@receiver(
+    m2m_changed,
+    sender=Keyword.alt_labels.through,
+    dispatch_uid="keyword_resolver_alt_labels_changed",
+)
+def keyword_resolver_cache(sender, action=None, **kwargs):
+    """Invalidate the resolved keyword terms when keywords or their labels change."""
+    if action is None or action.startswith("post_"):
+        invalidate_keyword_resolver_cache()
@@ -0,0 +1,157 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from events.importer import base
+from events.importer.base import Importer
+from events.models import Event, EventLink, Keyword, Offer
+from events.tests.factories import (
+    DataSourceFactory,
+    KeywordFactory,
+    LanguageFactory,
+    OrganizationFactory,
+)
+
+
+class DummyImporter(Importer):
+    name = "dummy"
+    supported_languages = ["fi"]
+
+    def setup(self):
+        self.data_source = DataSourceFactory(id="dummy")
+        self.organization = OrganizationFactory(data_source=self.data_source)
+
+
+@pytest.fixture
+def importer():
+    LanguageFactory()
+    return DummyImporter({})
+
+
+def _get_event_info(importer, origin_id, **kwargs):
+    start_time = timezone.now() + timedelta(days=1)
+    return {
+        "data_source": importer.data_source,
+        "publisher": importer.organization,
+        "origin_id": origin_id,
+        "name": {"fi": f"Tapahtuma {origin_id}"},
+        "start_time": start_time,
+        "end_time": start_time + timedelta(hours=2),
+        "keywords": [],
+        "external_links": {},
+        **kwargs,
+    }
+
+
+@pytest.mark.django_db
+def test_save_events_creates_events_and_related_objects(importer):
+    keyword = KeywordFactory(data_source=importer.data_source)
+    infos = [
+        _get_event_info(
+            importer,
+            origin_id,
+            keywords=[keyword],
+            in_language=[importer.languages["fi"]],
+            offers=[{"is_free": True}],
+            external_links={"fi": {"Kotisivu": f"https://example.com/{origin_id}"}},
+        )
+        for origin_id in ("1", "2")
+    ]
+
+    events = importer.save_events(infos)
+
+    assert [event.id for event in events] == ["dummy:1", "dummy:2"]
+    for event in Event.objects.filter(pk__in=["dummy:1", "dummy:2"]):
+        assert list(event.keywords.all()) == [keyword]
+        assert list(event.in_language.values_list("id", flat=True)) == ["fi"]
+        assert event.offers.get().is_free is True
+        assert (
+            event.external_links.get().link == f"https://example.com/{event.origin_id}"
+        )
+    keyword.refresh_from_db()
+    assert keyword.n_events_changed is True
+
+
+@pytest.mark.django_db
+def test_save_events_updates_only_changed_relations(importer):
+    keyword = KeywordFactory(data_source=importer.data_source)
+    new_keyword = KeywordFactory(data_source=importer.data_source)
+    infos = [
+        _get_event_info(
+            importer, origin_id, keywords=[keyword], offers=[{"is_free": True}]
+        )
+        for origin_id in ("1", "2")
+    ]
+    importer.save_events(infos)
+    offer_ids = set(Offer.objects.values_list("pk", flat=True))
+
+    infos[1]["keywords"] = [new_keyword]
+    events = importer.save_events(infos)
+
+    assert events[0]._changed is False
+    assert events[1]._changed_fields == ["keywords"]
+    assert list(Event.objects.get(pk="dummy:1").keywords.all()) == [keyword]
+    assert list(Event.objects.get(pk="dummy:2").keywords.all()) == [new_keyword]
+    assert set(Offer.objects.values_list("pk", flat=True)) == offer_ids
+
+
+@pytest.mark.django_db
+def test_save_events_flags_events_with_changed_keywords_for_ongoing_cache(
+    importer,
+):
+    keyword = KeywordFactory(data_source=importer.data_source)
+    new_keyword = KeywordFactory(data_source=importer.data_source)
+    infos = [
+        _get_event_info(importer, origin_id, keywords=[keyword])
+        for origin_id in ("1", "2")
+    ]
+    importer.save_events(infos)
+    Event.objects.update(ongoing_cache_changed=False)
+
+    infos[1]["keywords"] = [new_keyword]
+    importer.save_events(infos)
+
+    assert Event.objects.get(pk="dummy:1").ongoing_cache_changed is False
+    assert Event.objects.get(pk="dummy:2").ongoing_cache_changed is True
+
+
+@pytest.mark.django_db
+def test_save_events_replaces_deprecated_keywords(importer):
+    replacement = KeywordFactory(data_source=importer.data_source)
+    keyword = KeywordFactory(
+        data_source=importer.data_source, deprecated=True, replaced_by=replacement
+    )
+
+    event = importer.save_event(_get_event_info(importer, "1", keywords=[keyword]))
+
+    assert list(Event.objects.get(pk=event.pk).keywords.all()) == [replacement]
+    assert not Keyword.objects.get(pk=keyword.pk).events.exists()
+
+
+@pytest.mark.django_db
+def test_save_events_saves_repeated_event_in_new_chunk(importer, monkeypatch):
+    monkeypatch.setattr(base, "SAVE_EVENTS_CHUNK_SIZE", 2)
+    infos = [
+        _get_event_info(
+            importer,
+            "1",
+            external_links={"fi": {"Kotisivu": "https://example.com/old"}},
+        ),
+        _get_event_info(importer, "2"),
+        _get_event_info(importer, "3"),
+        _get_event_info(
+            importer,
+            "1",
+            external_links={"fi": {"Kotisivu": "https://example.com/new"}},
+        ),
+    ]
+
+    events = importer.save_events(infos)
+
+    assert len(events) == 4
+    assert events[3]._created is False
+    assert Event.objects.filter(data_source=importer.data_source).count() == 3
+    assert list(EventLink.objects.values_list("link", flat=True)) == [
+        "https://example.com/new"
+    ]
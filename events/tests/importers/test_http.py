@@ -0,0 +1,153 @@
+import threading
+
+import pytest
+
+from events.importer.http import HostRateLimiter, ImporterHTTPClient
+from events.importer.http_cache import HTTPCacheMissError, ResponseCache
+
+
+@pytest.fixture
+def sleep(monkeypatch):
+    calls = []
+    monkeypatch.setattr("time.sleep", calls.append)
+    return calls
+
+
+def test_get_uses_timeout_and_headers(requests_mock):
+    mock = requests_mock.get("http://localhost/events/", json={"data": []})
+    client = ImporterHTTPClient(timeout=10, headers={"Accept": "application/json"})
+
+    response = client.get("http://localhost/events/")
+
+    assert response.json() == {"data": []}
+    assert mock.last_request.timeout == 10
+    assert mock.last_request.headers["Accept"] == "application/json"
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_map_returns_results_in_order(requests_mock, max_workers):
+    for page in range(10):
+        requests_mock.get(f"http://localhost/events/{page}/", json={"page": page})
+    client = ImporterHTTPClient(max_workers=max_workers)
+
+    results = client.map(
+        lambda page: client.get(f"http://localhost/events/{page}/").json(),
+        range(10),
+    )
+
+    assert results == [{"page": page} for page in range(10)]
+
+
+def test_prefetch_runs_calls_in_worker_threads():
+    client = ImporterHTTPClient(max_workers=3)
+    thread_ids = set()
+
+    def fetch(page):
+        thread_ids.add(threading.get_ident())
+        return page
+
+    assert list(client.prefetch(fetch, range(20))) == list(range(20))
+    assert threading.get_ident() not in thread_ids
+
+
+def test_prefetch_stops_calling_when_iteration_stops():
+    client = ImporterHTTPClient(max_workers=3)
+    called = []
+
+    def fetch(page):
+        called.append(page)
+        return page
+
+    for page in client.prefetch(fetch, range(100)):
+        if page == 5:
+            break
+
+    # At most max_workers pages are fetched ahead
+    assert len(called) <= 9
+
+
+def test_rate_limiter_waits_between_requests_to_same_host(sleep):
+    rate_limiter = HostRateLimiter(min_interval=1.0)
+
+    rate_limiter.wait("http://localhost/events/")
+    rate_limiter.wait("http://example.com/events/")
+    assert sleep == []
+
+    rate_limiter.wait("http://localhost/places/")
+    assert len(sleep) == 1
+    assert 0 < sleep[0] <= 1.0
+
+
+def test_rate_limiter_is_disabled_without_interval(sleep):
+    rate_limiter = HostRateLimiter(min_interval=0)
+
+    for _ in range(3):
+        rate_limiter.wait("http://localhost/events/")
+
+    assert sleep == []
+
+
+def test_cache_serves_fresh_responses_from_disk(requests_mock, tmp_path):
+    mock = requests_mock.get("http://localhost/events/", json={"data": [1]})
+    client = ImporterHTTPClient(cache=ResponseCache(str(tmp_path), ttl=60))
+
+    assert client.get("http://localhost/events/").json() == {"data": [1]}
+    response = client.get("http://localhost/events/")
+
+    assert response.json() == {"data": [1]}
+    assert response.from_cache is True
+    assert mock.call_count == 1
+
+
+def test_cache_keys_requests_by_params(requests_mock, tmp_path):
+    mock = requests_mock.get("http://localhost/events/", json={"data": []})
+    client = ImporterHTTPClient(cache=ResponseCache(str(tmp_path), ttl=60))
+
+    client.get("http://localhost/events/", params={"page": 1})
+    client.get("http://localhost/events/", params={"page": 2})
+
+    assert mock.call_count == 2
+
+
+def test_cache_revalidates_stale_responses(requests_mock, tmp_path):
+    mock = requests_mock.get(
+        "http://localhost/events/",
+        [
+            {"json": {"data": [1]}, "headers": {"ETag": '"v1"'}},
+            {"status_code": 304},
+        ],
+    )
+    client = ImporterHTTPClient(cache=ResponseCache(str(tmp_path), ttl=0))
+
+    client.get("http://localhost/events/")
+    response = client.get("http://localhost/events/")
+
+    assert response.json() == {"data": [1]}
+    assert mock.call_count == 2
+    assert mock.last_request.headers["If-None-Match"] == '"v1"'
+
+
+def test_cache_replays_responses_offline(requests_mock, tmp_path):
+    requests_mock.get("http://localhost/events/", json={"data": [1]})
+    ImporterHTTPClient(cache=ResponseCache(str(tmp_path))).get(
+        "http://localhost/events/"
+    )
+    mock = requests_mock.get("http://localhost/events/", status_code=500)
+    client = ImporterHTTPClient(cache=ResponseCache(str(tmp_path), offline=True))
+
+    assert client.get("http://localhost/events/").json() == {"data": [1]}
+    with pytest.raises(HTTPCacheMissError):
+        client.get("http://localhost/places/")
+    assert mock.call_count == 0
+
+
+def test_cache_writes_streamed_responses_through_to_disk(requests_mock, tmp_path):
+    mock = requests_mock.get("http://localhost/data.ttl", content=b"x" * 100)
+    client = ImporterHTTPClient(cache=ResponseCache(str(tmp_path), ttl=60))
+
+    for _ in range(2):
+        with client.get("http://localhost/data.ttl", stream=True) as response:
+            assert response.from_cache is True
+            assert b"".join(response.iter_content(chunk_size=10)) == b"x" * 100
+
+    assert mock.call_count == 1
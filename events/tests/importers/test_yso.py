@@ -0,0 +1,116 @@
+import pytest
+
+from events.importer.yso import (
+    YsoImporter,
+    add_to_concepts,
+    iter_lines,
+    iter_turtle_graphs,
+)
+from events.models import Keyword, KeywordLabel
+from events.tests.factories import KeywordFactory
+
+YSO_DATA = """@prefix skos: <http://www.w3.org/2004/02/skos/core#> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+@prefix dct: <http://purl.org/dc/terms/> .
+@prefix yso: <http://www.yso.fi/onto/yso/> .
+
+yso:p1 a skos:Concept ;
+    skos:prefLabel "musiikki"@fi, "musik"@sv, "music"@en ;
+    skos:altLabel "sävelet"@fi, "tunes"@en .
+
+# A comment between the statements
+yso:p2 a skos:Concept ;
+    skos:prefLabel "teatteri"@fi ;
+    skos:definition \"\"\"Esittävä taide.
+Useita rivejä .\"\"\"@fi ;
+    skos:altLabel "näytelmät"@fi, "tunes"@en .
+
+yso:p3 a skos:Concept ;
+    skos:prefLabel "vanha"@fi ;
+    owl:deprecated true ;
+    dct:isReplacedBy yso:p1 .
+
+yso:aggregateconceptscheme a skos:ConceptScheme .
+"""
+
+
+@pytest.fixture
+def yso_file(tmp_path):
+    path = tmp_path / "yso.ttl"
+    path.write_text(YSO_DATA, encoding="utf-8")
+    return str(path)
+
+
+def _load_concepts(path, chunk_size):
+    concepts = {}
+    for graph in iter_turtle_graphs(iter_lines(path), chunk_size=chunk_size):
+        add_to_concepts(concepts, graph)
+    return concepts
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 100])
+def test_iter_turtle_graphs_parses_document_in_chunks(yso_file, chunk_size):
+    graphs = list(iter_turtle_graphs(iter_lines(yso_file), chunk_size=chunk_size))
+
+    assert len(graphs) == -(-4 // chunk_size)
+    assert sum(len(graph) for graph in graphs) == 16
+
+
+def test_add_to_concepts_collects_concept_records(yso_file):
+    concepts = _load_concepts(yso_file, chunk_size=1)
+
+    music = concepts["http://www.yso.fi/onto/yso/p1"]
+    assert music.is_concept is True
+    assert music.deprecated is False
+    assert sorted(music.labels) == [
+        ("music", "en"),
+        ("musik", "sv"),
+        ("musiikki", "fi"),
+    ]
+    assert sorted(music.alt_labels) == [("sävelet", "fi"), ("tunes", "en")]
+
+    old = concepts["http://www.yso.fi/onto/yso/p3"]
+    assert old.deprecated is True
+    assert str(old.replaced_by) == "http://www.yso.fi/onto/yso/p1"
+
+    assert "http://www.yso.fi/onto/yso/aggregateconceptscheme" not in concepts
+
+
+@pytest.mark.django_db
+def test_import_keywords_from_file(settings, yso_file):
+    settings.YSO_DATA_FILE = yso_file
+    importer = YsoImporter({"force": False})
+    old_keyword = KeywordFactory(id="yso:p3", data_source=importer.data_source)
+
+    importer.import_keywords()
+
+    music = Keyword.objects.get(id="yso:p1")
+    assert music.name_fi == "musiikki"
+    assert music.name_sv == "musik"
+    assert music.name_en == "music"
+    assert music.publisher == importer.organization
+    assert sorted(music.alt_labels.values_list("name", flat=True)) == [
+        "sävelet",
+        "tunes",
+    ]
+    assert sorted(
+        Keyword.objects.get(id="yso:p2").alt_labels.values_list("name", flat=True)
+    ) == ["näytelmät", "tunes"]
+    assert KeywordLabel.objects.filter(name="tunes").count() == 1
+
+    old_keyword.refresh_from_db()
+    assert old_keyword.deprecated is True
+    assert old_keyword.replaced_by_id == "yso:p1"
+
+
+@pytest.mark.django_db
+def test_import_keywords_updates_existing_keywords(settings, yso_file):
+    settings.YSO_DATA_FILE = yso_file
+    importer = YsoImporter({"force": False})
+    importer.import_keywords()
+    Keyword.objects.filter(id="yso:p1").update(name_fi="vanha nimi")
+
+    importer.import_keywords()
+
+    assert Keyword.objects.get(id="yso:p1").name_fi == "musiikki"
+    assert Keyword.objects.filter(data_source=importer.data_source).count() == 2
@@ -0,0 +1,234 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from events.api import _terms_to_regex
+from events.models import Event
+from events.ongoing_cache import OngoingEventIndex
+from events.tests.factories import EventFactory, KeywordFactory, PlaceFactory
+
+
+@pytest.fixture
+def internet_place():
+    return PlaceFactory(id="test:internet", name="Internet")
+
+
+@pytest.mark.django_db
+def test_populate_all_events(django_cache, internet_place):
+    event = EventFactory(
+        name="Konsertti",
+        location=internet_place,
+        end_time=timezone.now() + timedelta(days=1),
+    )
+    EventFactory(
+        name="Mennyt konsertti",
+        location=internet_place,
+        end_time=timezone.now() - timedelta(days=1),
+    )
+
+    call_command("populate_local_event_cache")
+
+    assert list(django_cache.get("internet_ids").keys()) == [event.id]
+    assert django_cache.get("internet_ids_end_times") == {event.id: event.end_time}
+    assert django_cache.get("internet_ids_version")
+    assert not Event.objects.filter(ongoing_cache_changed=True).exists()
+
+
+@pytest.mark.django_db
+def test_incremental_update_adds_changed_and_removes_deleted_events(
+    django_cache, internet_place
+):
+    event = EventFactory(
+        name="Konsertti",
+        location=internet_place,
+        end_time=timezone.now() + timedelta(days=1),
+    )
+    deleted_event = EventFactory(
+        name="Teatteri",
+        location=internet_place,
+        end_time=timezone.now() + timedelta(days=1),
+    )
+    call_command("populate_local_event_cache")
+    version = django_cache.get("internet_ids_version")
+
+    event.name = "Jazzkonsertti"
+    event.save()
+    deleted_event.soft_delete()
+    new_event = EventFactory(
+        name="Ooppera",
+        location=internet_place,
+        end_time=timezone.now() + timedelta(days=1),
+    )
+
+    call_command("populate_local_event_cache", "--incremental")
+
+    event_strings = django_cache.get("internet_ids")
+    assert set(event_strings.keys()) == {event.id, new_event.id}
+    assert "Jazzkonsertti" in event_strings[event.id]
+    assert django_cache.get("internet_ids_version") != version
+    assert not Event.objects.filter(ongoing_cache_changed=True).exists()
+
+
+@pytest.mark.django_db
+def test_incremental_update_prunes_ended_events(django_cache, internet_place):
+    event = EventFactory(
+        name="Konsertti",
+        location=internet_place,
+        end_time=timezone.now() + timedelta(days=1),
+    )
+    call_command("populate_local_event_cache")
+    django_cache.set(
+        "internet_ids_end_times", {event.id: timezone.now() - timedelta(minutes=1)}
+    )
+
+    call_command("populate_local_event_cache", "--incremental")
+
+    assert django_cache.get("internet_ids") == {}
+
+
+@pytest.mark.django_db
+def test_incremental_update_populates_missing_cache(django_cache, internet_place):
+    event = EventFactory(
+        name="Konsertti",
+        location=internet_place,
+        end_time=timezone.now() + timedelta(days=1),
+    )
+    Event.objects.update(ongoing_cache_changed=False)
+
+    call_command("populate_local_event_cache", "--incremental")
+
+    assert list(django_cache.get("internet_ids").keys()) == [event.id]
+
+
+@pytest.mark.django_db
+def test_place_change_marks_upcoming_events_changed(internet_place):
+    event = EventFactory(
+        location=internet_place, end_time=timezone.now() + timedelta(days=1)
+    )
+    past_event = EventFactory(
+        location=internet_place, end_time=timezone.now() - timedelta(days=1)
+    )
+    Event.objects.update(ongoing_cache_changed=False)
+
+    internet_place.name = "Verkko"
+    internet_place.save()
+
+    event.refresh_from_db()
+    past_event.refresh_from_db()
+    assert event.ongoing_cache_changed is True
+    assert past_event.ongoing_cache_changed is False
+
+
+@pytest.mark.django_db
+def test_keyword_clear_marks_events_changed():
+    keyword = KeywordFactory()
+    event = EventFactory()
+    event.keywords.add(keyword)
+    Event.objects.update(ongoing_cache_changed=False)
+
+    keyword.events.clear()
+
+    event.refresh_from_db()
+    assert event.ongoing_cache_changed is True
+
+
+@pytest.mark.django_db
+def test_keyword_rename_marks_upcoming_events_changed():
+    keyword = KeywordFactory(name_fi="Konsertti")
+    event = EventFactory(end_time=timezone.now() + timedelta(days=1))
+    event.keywords.add(keyword)
+    Event.objects.update(ongoing_cache_changed=False)
+
+    keyword.n_events = 5
+    keyword.save()
+    event.refresh_from_db()
+    assert event.ongoing_cache_changed is False
+
+    keyword.name_fi = "Teatteri"
+    keyword.save()
+    event.refresh_from_db()
+    assert event.ongoing_cache_changed is True
+
+
+@pytest.mark.django_db
+def test_event_save_marks_event_changed_only_for_cached_fields():
+    event = EventFactory(end_time=timezone.now() + timedelta(days=1))
+    Event.objects.update(ongoing_cache_changed=False)
+    event.refresh_from_db()
+
+    event.info_url_fi = "https://example.com"
+    event.save()
+    event.save(update_fields=["info_url_fi"])
+    event.refresh_from_db()
+    assert event.ongoing_cache_changed is False
+
+    event.name_fi = "Konsertti"
+    event.save(update_fields=["name_fi"])
+    event.refresh_from_db()
+    assert event.ongoing_cache_changed is True
+
+
+@pytest.mark.django_db
+def test_event_save_keeps_flag_set_after_loading():
+    keyword = KeywordFactory()
+    event = EventFactory(end_time=timezone.now() + timedelta(days=1))
+    Event.objects.update(ongoing_cache_changed=False)
+    event.refresh_from_db()
+
+    Event.objects.get(pk=event.pk).keywords.add(keyword)
+    event.info_url_fi = "https://example.com"
+    event.save()
+
+    event.refresh_from_db()
+    assert event.ongoing_cache_changed is True
+
+
+@pytest.mark.parametrize("terms", ["konsertti", "teatteri", "ooppera", "tanssi"])
+def test_index_with_changes_matches_rebuilt_index(terms):
+    index = OngoingEventIndex({"a": "konsertti", "b": "teatteri", "c": "ooppera"})
+    rebuilt = OngoingEventIndex({"a": "konsertti", "b": "tanssi", "d": "konsertti"})
+    rc = _terms_to_regex(terms, "OR")
+
+    changed = index.with_changes({"b": "tanssi", "d": "konsertti"}, {"c"}, "2")
+
+    assert changed.search(rc, terms, "OR") == rebuilt.search(rc, terms, "OR")
+    assert set(changed.event_positions) == {"a", "b", "d"}
+
+
+@pytest.mark.django_db
+def test_populate_aggregates_keywords_to_single_text(django_cache, internet_place):
+    event = EventFactory(
+        name="Konsertti",
+        location=internet_place,
+        end_time=timezone.now() + timedelta(days=1),
+    )
+    event.keywords.set(
+        [
+            KeywordFactory(name_fi="musiikki", name_sv="musik", name_en="music"),
+            KeywordFactory(name_fi="jazz"),
+        ]
+    )
+
+    call_command("populate_local_event_cache")
+
+    text = django_cache.get("internet_ids")[event.id]
+    for word in ("Konsertti", "musiikki", "musik", "music", "jazz", "Internet"):
+        assert word in text
+
+
+@pytest.mark.django_db
+def test_populate_reports_stats(django_cache, internet_place):
+    EventFactory(
+        name="Konsertti",
+        location=internet_place,
+        end_time=timezone.now() + timedelta(days=1),
+    )
+    out = StringIO()
+
+    call_command("populate_local_event_cache", "--stats", stdout=out)
+
+    assert "internet_ids: fetched 1 rows, produced " in out.getvalue()
+    assert "local_ids: fetched 0 rows, produced " in out.getvalue()
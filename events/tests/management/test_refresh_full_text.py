@@ -1,7 +1,9 @@
 from io import StringIO
 
 import pytest
-from django.core.management import call_command
+from django.contrib.postgres.search import SearchQuery
+from django.core.management import CommandError, call_command
+from django.db import connection
 
 from events.models import EventFullText
 from events.tests.factories import EventFactory
@@ -136,3 +138,76 @@ def test_refresh_place_modified(event, place):
 # Not testing:
 # 1) Place deletion: Protected by event.location relation
 # 2) Place addition: Not relevant
+
+
+def search_full_text(query):
+    return set(
+        EventFullText.objects.filter(
+            search_vector_fi=SearchQuery(query, config="finnish")
+        ).values_list("event_id", flat=True)
+    )
+
+
+@pytest.mark.django_db()
+def test_create_table_backfills_events(event, place):
+    out = StringIO()
+    call_command("refresh_full_text", "--create-table", stdout=out)
+
+    assert "Backfilled 1 events" in out.getvalue()
+    assert EventFullText.objects.all().count() == 1
+
+
+@pytest.mark.django_db()
+def test_table_is_updated_by_triggers(event, place, keyword):
+    call_command("refresh_full_text", "--create-table", stdout=StringIO())
+
+    new_event = EventFactory(name_fi="Jazzkonsertti", location=place)
+    assert search_full_text("jazzkonsertti") == {new_event.id}
+
+    event.name_fi = "Oopperailta"
+    event.save()
+    assert search_full_text("oopperailta") == {event.id}
+
+    keyword.name_fi = "Tanssi"
+    keyword.save()
+    event.keywords.set([keyword])
+    assert search_full_text("tanssi") == {event.id}
+
+    place.name_fi = "Musiikkitalo"
+    place.save()
+    assert search_full_text("musiikkitalo") == {event.id, new_event.id}
+
+    new_event.delete()
+    assert EventFullText.objects.all().count() == 1
+
+
+@pytest.mark.django_db()
+def test_refresh_not_needed_with_table(event, place):
+    out = StringIO()
+    call_command("refresh_full_text", "--create-table", stdout=StringIO())
+    call_command("refresh_full_text", stdout=out)
+
+    assert "kept up to date by triggers" in out.getvalue()
+
+
+@pytest.mark.django_db()
+def test_check_and_fix_table(event, place):
+    call_command("refresh_full_text", "--create-table", stdout=StringIO())
+    with connection.cursor() as cursor:
+        cursor.execute("UPDATE events_eventfulltext SET search_vector_fi = ''")
+
+    out = StringIO()
+    call_command("refresh_full_text", "--check", stdout=out)
+    assert "Found 1 inconsistent rows" in out.getvalue()
+
+    call_command("refresh_full_text", "--check", "--fix", stdout=out)
+    assert "Fixed 1 inconsistent rows" in out.getvalue()
+
+    call_command("refresh_full_text", "--check", stdout=out)
+    assert "No inconsistent rows found!" in out.getvalue()
+
+
+@pytest.mark.django_db()
+def test_backfill_requires_table():
+    with pytest.raises(CommandError):
+        call_command("refresh_full_text", "--backfill", stdout=StringIO())
@@ -0,0 +1,117 @@
+from unittest.mock import patch
+
+import pytest
+
+from events.bulk import bulk_event_save
+from events.models import Event, PublicationStatus
+from events.tests.factories import EventFactory, KeywordFactory, PlaceFactory
+
+
+@pytest.mark.django_db
+def test_bulk_event_save_defers_place_event_count_changes():
+    place = PlaceFactory(n_events_changed=False)
+    event = EventFactory()
+
+    with bulk_event_save():
+        event.location = place
+        event.save()
+
+        place.refresh_from_db()
+        assert place.n_events_changed is False
+
+    place.refresh_from_db()
+    assert place.n_events_changed is True
+
+
+@pytest.mark.django_db
+def test_bulk_event_save_defers_keyword_event_count_changes():
+    keyword = KeywordFactory(n_events_changed=False)
+    event = EventFactory()
+
+    with bulk_event_save():
+        event.keywords.add(keyword)
+
+        keyword.refresh_from_db()
+        assert keyword.n_events_changed is False
+
+    keyword.refresh_from_db()
+    assert keyword.n_events_changed is True
+
+
+@pytest.mark.django_db
+def test_bulk_event_save_defers_notifications():
+    event = EventFactory(publication_status=PublicationStatus.DRAFT)
+
+    with patch.object(Event, "send_published_notification") as mocked:
+        with bulk_event_save():
+            event = Event.objects.get(pk=event.pk)
+            event.publication_status = PublicationStatus.PUBLIC
+            event.save()
+
+            assert mocked.call_count == 0
+
+        assert mocked.call_count == 1
+
+
+@pytest.mark.django_db
+def test_bulk_event_save_does_not_send_notifications_on_error():
+    event = EventFactory(publication_status=PublicationStatus.DRAFT)
+
+    with patch.object(Event, "send_published_notification") as mocked:
+        with pytest.raises(RuntimeError), bulk_event_save():
+            event.publication_status = PublicationStatus.PUBLIC
+            event.save()
+            raise RuntimeError
+
+    assert mocked.call_count == 0
+
+
+@pytest.mark.django_db
+def test_bulk_event_save_updates_search_index_once():
+    events = EventFactory.create_batch(2)
+
+    with patch("events.signal_processors.update_event_index") as mocked:
+        with bulk_event_save():
+            for event in events:
+                event.save()
+                event.save()
+
+            assert mocked.call_count == 0
+
+    mocked.assert_called_once_with({event.pk for event in events})
+
+
+@pytest.mark.django_db
+def test_nested_bulk_event_save_flushes_once():
+    place = PlaceFactory(n_events_changed=False)
+    event = EventFactory()
+
+    with bulk_event_save():
+        with bulk_event_save():
+            event.location = place
+            event.save()
+
+        place.refresh_from_db()
+        assert place.n_events_changed is False
+
+    place.refresh_from_db()
+    assert place.n_events_changed is True
+
+
+@pytest.mark.django_db
+def test_bulk_event_save_remembers_state_saved_with_update_fields():
+    event = EventFactory(publication_status=PublicationStatus.DRAFT)
+    place = PlaceFactory(n_events_changed=False)
+
+    with patch.object(Event, "send_published_notification") as mocked:
+        with bulk_event_save():
+            event = Event.objects.get(pk=event.pk)
+            event.publication_status = PublicationStatus.PUBLIC
+            event.location = place
+            event.save(update_fields=["publication_status", "location"])
+            event.save()
+
+        assert mocked.call_count == 1
+
+    assert event._saved_state["publication_status"] == PublicationStatus.PUBLIC
+    assert event._saved_state["location_id"] == place.id
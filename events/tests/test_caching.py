@@ -1,7 +1,16 @@
 import pytest
 
-from events.api import _get_queryset_from_cache, _get_queryset_from_cache_many
+from events.api import (
+    _get_queryset_from_cache,
+    _get_queryset_from_cache_many,
+    _terms_to_regex,
+)
 from events.models import Event
+from events.ongoing_cache import (
+    OngoingEventIndex,
+    _loaded_indexes,
+    publish_ongoing_events,
+)
 
 
 @pytest.mark.django_db
@@ -58,3 +67,64 @@ def test_missing_cache_many_not_throwing_error_and_returns_none(django_cache):
     )
 
     assert queryset.first() is None
+
+
+@pytest.mark.django_db
+def test_queryset_from_published_cache_uses_index(django_cache, event):
+    publish_ongoing_events("local_ids", {event.id: "Lasten musiikkiteatteri"})
+
+    params = {"local_ongoing_AND": "musiikkiteater"}
+    queryset = _get_queryset_from_cache(
+        params, "local_ongoing_AND", "local_ids", "AND", Event.objects
+    )
+
+    assert queryset.first().id == event.id
+    assert _loaded_indexes["local_ids"].event_ids == [event.id]
+
+
+@pytest.mark.django_db
+def test_published_cache_index_is_reloaded_on_new_version(django_cache, event):
+    publish_ongoing_events("local_ids", {event.id: "lapsi"})
+    params = {"local_ongoing_OR": "konsertti"}
+
+    queryset = _get_queryset_from_cache(
+        params, "local_ongoing_OR", "local_ids", "OR", Event.objects
+    )
+    assert queryset.first() is None
+
+    publish_ongoing_events("local_ids", {event.id: "konsertti"})
+
+    queryset = _get_queryset_from_cache(
+        params, "local_ongoing_OR", "local_ids", "OR", Event.objects
+    )
+    assert queryset.first().id == event.id
+
+
+@pytest.mark.parametrize(
+    "terms,operator",
+    [
+        ("lapsi", "OR"),
+        ("lapsi,musiikki", "OR"),
+        ("lapsi,musiikki", "AND"),
+        ("musiikkiteatteri", "OR"),
+        ("musikkiteatteri", "OR"),
+        ("musiikki teatteri", "OR"),
+        ("jo", "OR"),
+        ("jo,konsertti", "AND"),
+        ("(foo", "OR"),
+    ],
+)
+def test_ongoing_event_index_matches_linear_search(terms, operator):
+    event_strings = {
+        "a": "Lapsi ja musiikki Musiikkiteatteri",
+        "b": "Musiikki teatteri konsertti",
+        "c": "Jooga (foo) aamulla",
+        "d": "Lapsia ja aikuisia",
+        "e": "",
+    }
+    rc = _terms_to_regex(terms, operator)
+    expected = {k for k, v in event_strings.items() if rc.search(v)}
+
+    index = OngoingEventIndex(event_strings)
+
+    assert index.search(rc, terms, operator) == expected
@@ -1,5 +1,6 @@
 from collections import Counter
 from datetime import datetime, timedelta
+from io import StringIO
 
 import pytest
 import pytz
@@ -7,7 +8,9 @@ from dateutil import parser
 from django.conf import settings
 from django.contrib.gis.gdal import CoordTransform, SpatialReference
 from django.contrib.gis.geos import Point
+from django.core.management import call_command
 from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import QueryDict
 from django.test import TestCase
 from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
@@ -17,8 +20,14 @@ from rest_framework import status
 
 from audit_log.models import AuditLogEntry
 from events.models import Event, Language, License, PublicationStatus
+from events.query_cache import GENERATION_KEY, get_event_query_cache_key
 from events.tests.conftest import APIClient
-from events.tests.factories import EventFactory, OfferFactory
+from events.tests.factories import (
+    EventFactory,
+    KeywordFactory,
+    OfferFactory,
+    PlaceFactory,
+)
 from events.tests.utils import (
     assert_fields_exist,
     create_super_event,
@@ -26,7 +35,11 @@ from events.tests.utils import (
     get,
 )
 from events.tests.utils import versioned_reverse as reverse
-from registrations.tests.factories import OfferPriceGroupFactory, RegistrationFactory
+from registrations.tests.factories import (
+    OfferPriceGroupFactory,
+    RegistrationFactory,
+    SignUpFactory,
+)
 
 api_client = APIClient()
 
@@ -2034,3 +2047,249 @@ class FilterEventsByRegistrationCapacitiesV1TestCase(TestCase, EventsListTestCas
                     f"registration__remaining_waiting_list_capacity__isnull={capacity}",
                     events,
                 )
+
+
+@pytest.mark.django_db
+def test_get_event_list_uses_query_cache(
+    api_client, settings, django_cache, django_capture_on_commit_callbacks
+):
+    settings.EVENT_QUERY_CACHE_TIMEOUT = 60
+    event = EventFactory(name="Konsertti")
+    EventFactory(name="Teatteri")
+
+    get_list_and_assert_events("text=Konsertti", [event], api_client)
+    with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as queries:
+        get_list_and_assert_events("text=Konsertti&page_size=10", [event], api_client)
+    assert not any("LIKE" in query["sql"] for query in queries.captured_queries)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        new_event = EventFactory(name="Konsertti 2")
+    get_list_and_assert_events("text=Konsertti", [event, new_event], api_client)
+
+
+@pytest.mark.django_db
+def test_get_event_list_query_cache_paginates_ids(api_client, settings, django_cache):
+    settings.EVENT_QUERY_CACHE_TIMEOUT = 60
+    now = timezone.now()
+    EventFactory(start_time=now, end_time=now + timedelta(days=1))
+    EventFactory(start_time=now + timedelta(hours=1), end_time=now + timedelta(days=1))
+    last_event = EventFactory(
+        start_time=now + timedelta(hours=2), end_time=now + timedelta(days=1)
+    )
+
+    response = get_list(api_client, query_string="sort=start_time&page_size=2&page=2")
+
+    assert response.data["meta"]["count"] == 3
+    assert [event["id"] for event in response.data["data"]] == [last_event.id]
+
+
+@pytest.mark.django_db
+def test_get_event_list_query_cache_skips_too_many_results(
+    api_client, settings, django_cache
+):
+    settings.EVENT_QUERY_CACHE_TIMEOUT = 60
+    settings.EVENT_QUERY_CACHE_MAX_IDS = 1
+    events = EventFactory.create_batch(2)
+
+    get_list_and_assert_events("", events, api_client)
+    get_list_and_assert_events("", events, api_client)
+
+
+@pytest.mark.django_db
+def test_event_query_cache_generation_does_not_restart_when_evicted(
+    settings, django_cache
+):
+    settings.EVENT_QUERY_CACHE_TIMEOUT = 60
+    query_params = QueryDict("text=Konsertti")
+    cache_key = get_event_query_cache_key(query_params)
+
+    django_cache.delete(GENERATION_KEY)
+
+    assert get_event_query_cache_key(query_params) != cache_key
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda registration: registration.event.location.save(),
+        lambda registration: KeywordFactory().save(),
+        lambda registration: registration.save(update_fields=["enrolment_end_time"]),
+        lambda registration: SignUpFactory(registration=registration),
+    ],
+    ids=["place", "keyword", "registration", "signup"],
+)
+@pytest.mark.django_db
+def test_event_query_cache_is_invalidated_by_related_changes(
+    change, settings, django_cache, django_capture_on_commit_callbacks
+):
+    settings.EVENT_QUERY_CACHE_TIMEOUT = 60
+    registration = RegistrationFactory(event__location=PlaceFactory())
+    query_params = QueryDict("enrolment_open=true")
+    cache_key = get_event_query_cache_key(query_params)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        change(registration)
+
+    assert get_event_query_cache_key(query_params) != cache_key
+
+
+def get_all_pages_with_cursor(api_client, query_string):
+    response = get_list(api_client, query_string=query_string)
+    pages = [response.data]
+    while response.data["meta"]["next"]:
+        response = get(api_client, response.data["meta"]["next"])
+        pages.append(response.data)
+    return pages
+
+
+@pytest.mark.django_db
+def test_get_event_list_with_cursor(api_client):
+    events = EventFactory.create_batch(5)
+    # Events with equal sort keys are ordered by id
+    Event.objects.update(last_modified_time=timezone.now())
+
+    pages = get_all_pages_with_cursor(api_client, "cursor=&page_size=2")
+
+    assert [len(page["data"]) for page in pages] == [2, 2, 1]
+    assert all(page["meta"]["count"] is None for page in pages)
+    assert all(page["meta"]["previous"] is None for page in pages)
+    assert [event["id"] for page in pages for event in page["data"]] == sorted(
+        event.id for event in events
+    )
+
+
+@pytest.mark.django_db
+def test_get_event_list_with_cursor_and_sort(api_client):
+    now = timezone.now()
+    events = [
+        EventFactory(
+            start_time=now + timedelta(hours=hours), end_time=now + timedelta(days=1)
+        )
+        for hours in (2, 0, 1)
+    ]
+
+    pages = get_all_pages_with_cursor(
+        api_client, "cursor=&page_size=2&sort=-start_time&count=exact"
+    )
+
+    assert all(page["meta"]["count"] == 3 for page in pages)
+    assert [event["id"] for page in pages for event in page["data"]] == [
+        events[0].id,
+        events[2].id,
+        events[1].id,
+    ]
+
+
+@pytest.mark.django_db
+def test_get_event_list_with_cursor_and_estimated_count(api_client):
+    EventFactory.create_batch(2)
+
+    response = get_list(api_client, query_string="cursor=&count=estimate")
+
+    assert isinstance(response.data["meta"]["count"], int)
+
+
+@pytest.mark.parametrize(
+    "query_string",
+    [
+        "cursor=&sort=duration",
+        "cursor=&count=all",
+        "cursor=invalid",
+        "cursor=eyJvIjogWyJpZCJdLCAidiI6IFsiYSJdfQ==",
+    ],
+)
+@pytest.mark.django_db
+def test_get_event_list_with_invalid_cursor(api_client, event, query_string):
+    response = get_list_no_code_assert(api_client, query_string=query_string)
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_get_event_list_count_strategy_defaults_to_exact(api_client, event, event2):
+    response = get_list(api_client)
+
+    assert response.data["meta"]["count"] == 2
+    assert response.data["meta"]["count_strategy"] == "exact"
+
+
+@pytest.mark.django_db
+def test_get_event_list_with_cached_count(api_client, event, django_cache):
+    response = get_list(api_client, query_string="count=cached")
+    assert response.data["meta"]["count"] == 1
+    assert response.data["meta"]["count_strategy"] == "cached"
+
+    EventFactory()
+    response = get_list(api_client, query_string="count=cached&page=1")
+    assert response.data["meta"]["count"] == 1
+
+    response = get_list(api_client)
+    assert response.data["meta"]["count"] == 2
+
+
+@pytest.mark.parametrize(
+    "threshold,expected_strategy",
+    [(0, "estimate"), (10000, "exact")],
+)
+@pytest.mark.django_db
+def test_get_event_list_with_estimated_count(
+    api_client, settings, event, event2, threshold, expected_strategy
+):
+    settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD = threshold
+
+    response = get_list(api_client, query_string="count=estimate")
+
+    assert response.data["meta"]["count_strategy"] == expected_strategy
+    assert isinstance(response.data["meta"]["count"], int)
+
+
+@pytest.mark.django_db
+def test_get_event_list_count_strategy_from_settings(
+    api_client, settings, event, django_cache
+):
+    settings.PAGINATION_COUNT_STRATEGY = "cached"
+
+    response = get_list(api_client)
+
+    assert response.data["meta"]["count_strategy"] == "cached"
+
+
+@pytest.mark.django_db
+def test_get_event_list_cannot_skip_count_without_cursor(api_client, event):
+    response = get_list_no_code_assert(api_client, query_string="count=none")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_ranked_text_search(api_client, settings, event, event2):
+    settings.EVENT_SEARCH_LEGACY_TEXT = False
+    call_command("refresh_full_text", "--create-table", stdout=StringIO())
+    event.name_fi = "Konsertti"
+    event.save()
+    event2.description_fi = "Puistossa soi konsertti"
+    event2.save()
+
+    response = get_list(api_client, query_string="text=konsertti")
+
+    assert [item["id"] for item in response.data["data"]] == [event.id, event2.id]
+
+    response = get_list(
+        api_client, query_string="text=konsertti&sort=-last_modified_time"
+    )
+
+    assert [item["id"] for item in response.data["data"]] == [event2.id, event.id]
+
+
+@pytest.mark.django_db
+def test_ranked_combined_text_search(api_client, settings, event, event2, keyword):
+    settings.EVENT_SEARCH_LEGACY_TEXT = False
+    call_command("refresh_full_text", "--create-table", stdout=StringIO())
+    keyword.name_fi = "lapset"
+    keyword.save()
+    event.keywords.add(keyword)
+    event2.description_fi = "lapset ja aikuiset"
+    event2.save()
+
+    get_list_and_assert_events("combined_text=lapset", [event, event2])
+    get_list_and_assert_events("combined_text=lapset,aikuiset", [event2])
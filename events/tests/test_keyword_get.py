@@ -189,3 +189,14 @@ def test_list_keyword_query_counts(api_client, keyword, keyword2, keyword3, sett
 
     with assertNumQueries(5):
         get_list(api_client, data={"show_all_keywords": True})
+
+
+@pytest.mark.django_db
+def test_get_keyword_list_with_cursor(api_client, keyword, keyword2, keyword3):
+    response = get_list(api_client, data={"cursor": "", "page_size": 2, "sort": "id"})
+    ids = [keyword["id"] for keyword in response.data["data"]]
+    response = get(api_client, response.data["meta"]["next"])
+    ids += [keyword["id"] for keyword in response.data["data"]]
+
+    assert response.data["meta"]["next"] is None
+    assert ids == sorted([keyword.id, keyword2.id, keyword3.id])
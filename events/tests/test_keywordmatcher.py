@@ -1,7 +1,7 @@
 import pytest
 from django.contrib.postgres.search import SearchQuery
 
-from events.keywords import KeywordMatcher
+from events.keywords import KeywordMatcher, resolve_similar_keyword_ids
 from events.models import KeywordLabel, Language
 
 
@@ -72,3 +72,51 @@ def test_keyword_match_trgrm(languages, data_source, organization, keyword, keyw
 
     matcher = KeywordMatcher()
     assert set([keyword2]) == set(matcher.match("asdfghe"))
+
+
+@pytest.mark.django_db
+def test_keyword_match_is_cached(
+    languages, keyword, django_assert_num_queries, django_cache
+):
+    kl = KeywordLabel(language=Language.objects.get(id="fi"), name="lapsi")
+    kl.save()
+    keyword.alt_labels.add(kl)
+
+    matcher = KeywordMatcher()
+    assert matcher.match("lapsi") == [keyword]
+    # Only the keywords are fetched
+    with django_assert_num_queries(1):
+        assert matcher.match("lapsi") == [keyword]
+
+
+@pytest.mark.django_db
+def test_similar_keyword_ids_are_cached(
+    keyword,
+    keyword2,
+    django_assert_num_queries,
+    django_cache,
+    django_capture_on_commit_callbacks,
+):
+    keyword.name_fi = "lapset"
+    keyword.save()
+    assert resolve_similar_keyword_ids("lapset") == ([keyword.id], True)
+    with django_assert_num_queries(0):
+        assert resolve_similar_keyword_ids("lapset") == ([keyword.id], True)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        keyword2.name_fi = "lapset ja nuoret"
+        keyword2.save()
+    assert resolve_similar_keyword_ids("lapset") == ([keyword.id, keyword2.id], True)
+
+
+@pytest.mark.django_db
+def test_similar_keyword_ids_cache_disabled(
+    settings, keyword, django_assert_num_queries, django_cache
+):
+    settings.KEYWORD_RESOLVER_CACHE_TIMEOUT = 0
+    keyword.name_fi = "lapset"
+    keyword.save()
+
+    resolve_similar_keyword_ids("lapset")
+    with django_assert_num_queries(1):
+        resolve_similar_keyword_ids("lapset")
@@ -10,12 +10,21 @@ from helsinki_gdpr.models import SerializableMixin
 from helusers.models import AbstractUser
 
 from events.models import PublicationStatus
-from registrations.models import RegistrationUserAccess
+from helevents.permission_context import UserPermissionContext
+from registrations.models import Registration, RegistrationUserAccess
 from registrations.utils import has_allowed_substitute_user_email_domain
 
 logger = logging.getLogger(__name__)
 
 
+def _get_registration_id(registration_user_accesses):
+    # The registration of a registration.registration_user_accesses manager
+    registration = getattr(registration_user_accesses, "instance", None)
+    if isinstance(registration, Registration):
+        return registration.pk
+    return None
+
+
 class UserModelPermissionMixin:
     """Permission mixin for user models
 
@@ -46,6 +55,17 @@ class UserModelPermissionMixin:
     def token_amr_claim(self, value: str):
         self._token_amr_claim = value
 
+    @property
+    def permission_context(self) -> UserPermissionContext:
+        """
+        The organization and registration ids that determine the permissions of
+        the user. Computed once for the user instance, i.e. once per request.
+        """
+        context = getattr(self, "_permission_context", None)
+        if context is None or context.is_stale:
+            context = self._permission_context = UserPermissionContext(self)
+        return context
+
     @property
     def is_strongly_identified(self) -> bool:
         """Check if the user is strongly identified"""
@@ -324,17 +344,19 @@ class User(AbstractUser, UserModelPermissionMixin, SerializableMixin):
     def is_admin_of(self, publisher):
         if publisher is None:
             return False
-        return publisher in self.get_admin_organizations_and_descendants()
+        return publisher.pk in self.permission_context.admin_organization_ids
 
     def is_registration_admin_of(self, publisher):
         if publisher is None:
             return False
-        return publisher in self.get_registration_admin_organizations_and_descendants()
+        return (
+            publisher.pk in self.permission_context.registration_admin_organization_ids
+        )
 
     def is_financial_admin_of(self, publisher):
         if publisher is None:
             return False
-        return publisher in self.get_financial_admin_organizations_and_descendants()
+        return publisher.pk in self.permission_context.financial_admin_organization_ids
 
     def is_regular_user_of(self, publisher):
         if publisher is None:
@@ -343,16 +365,30 @@ class User(AbstractUser, UserModelPermissionMixin, SerializableMixin):
 
     def is_registration_user_access_user_of(self, registration_user_accesses):
         """Check if current user can be found in registration user accesses"""
-        return (
-            self.is_strongly_identified
-            and registration_user_accesses.filter(email=self.email).exists()
-        )
+        if not self.is_strongly_identified:
+            return False
+
+        registration_id = _get_registration_id(registration_user_accesses)
+        if registration_id is not None:
+            return (
+                registration_id
+                in self.permission_context.registration_user_access_registration_ids
+            )
+
+        return registration_user_accesses.filter(email=self.email).exists()
 
     def is_substitute_user_of(self, registration_user_accesses):
         """Check if current user is a substitute user for registrations"""
         if not has_allowed_substitute_user_email_domain(self.email):
             return False
 
+        registration_id = _get_registration_id(registration_user_accesses)
+        if registration_id is not None:
+            return (
+                registration_id
+                in self.permission_context.substitute_user_registration_ids
+            )
+
         return registration_user_accesses.filter(
             email=self.email, is_substitute_user=True
         ).exists()
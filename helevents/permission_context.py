@@ -0,0 +1,207 @@
+"""
+The organization and registration ids that determine the permissions of a user.
+
+Checking the permissions of a user used to query the user's organizations and
+their descendants and the registration user accesses again for every check,
+often several times per request. UserPermissionContext computes each id set
+once for the user instance, i.e. once per request, and the sets are shared
+between the requests of the user for USER_PERMISSION_CONTEXT_CACHE_TIMEOUT
+seconds when set.
+
+Changes to the organizations, their users, the data sources of the API keys and
+the registration user accesses invalidate the contexts: the contexts of the
+current process right away and the shared contexts once the change has been
+committed.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.base_user import AbstractBaseUser
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils.functional import cached_property
+from django_orghierarchy.models import Organization
+
+from events.models import DataSource
+from registrations.models import RegistrationUserAccess
+from registrations.utils import has_allowed_substitute_user_email_domain
+
+GENERATION_CACHE_KEY = "user_permission_context_generation"
+
+# Incremented on every invalidation in this process
+_generation = 0
+
+
+def _increment_cached_generation():
+    try:
+        cache.incr(GENERATION_CACHE_KEY)
+    except ValueError:
+        cache.set(GENERATION_CACHE_KEY, 1, None)
+
+
+def invalidate_permission_contexts() -> None:
+    global _generation
+    _generation += 1
+
+    if settings.USER_PERMISSION_CONTEXT_CACHE_TIMEOUT:
+        transaction.on_commit(_increment_cached_generation)
+
+
+class UserPermissionContext:
+    def __init__(self, user) -> None:
+        self.user = user
+        self.generation = _generation
+        # The registration user accesses are matched by email
+        self.email = user.email or ""
+
+    @property
+    def is_stale(self) -> bool:
+        return self.generation != _generation or self.email != (self.user.email or "")
+
+    @cached_property
+    def _cache_key_prefix(self) -> str:
+        generation = cache.get_or_set(GENERATION_CACHE_KEY, 0, None)
+        # API key users share the pks of the users
+        user_type = type(self.user).__name__
+        email_hash = hashlib.sha256(self.email.encode()).hexdigest()[:16]
+        return (
+            f"user_permission_context:{generation}:{user_type}:{self.user.pk}:"
+            f"{email_hash}"
+        )
+
+    def _get_ids(self, name: str, get_ids) -> frozenset:
+        timeout = settings.USER_PERMISSION_CONTEXT_CACHE_TIMEOUT
+        if not timeout or self.user.pk is None:
+            return frozenset(get_ids())
+
+        cache_key = f"{self._cache_key_prefix}:{name}"
+        ids = cache.get(cache_key)
+        if ids is None:
+            ids = frozenset(get_ids())
+            cache.set(cache_key, ids, timeout)
+        return ids
+
+    def _get_organization_ids(self, name: str, get_organizations) -> frozenset:
+        return self._get_ids(
+            name, lambda: get_organizations().values_list("pk", flat=True)
+        )
+
+    @cached_property
+    def admin_organization_ids(self) -> frozenset[str]:
+        """Ids of the organizations the user is an admin of and their descendants"""
+        return self._get_organization_ids(
+            "admin_organization_ids",
+            self.user.get_admin_organizations_and_descendants,
+        )
+
+    @cached_property
+    def registration_admin_organization_ids(self) -> frozenset[str]:
+        """
+        Ids of the organizations the user is a registration admin of and their
+        descendants
+        """
+        return self._get_organization_ids(
+            "registration_admin_organization_ids",
+            self.user.get_registration_admin_organizations_and_descendants,
+        )
+
+    @cached_property
+    def financial_admin_organization_ids(self) -> frozenset[str]:
+        """
+        Ids of the organizations the user is a financial admin of and their
+        descendants
+        """
+        return self._get_organization_ids(
+            "financial_admin_organization_ids",
+            self.user.get_financial_admin_organizations_and_descendants,
+        )
+
+    @cached_property
+    def registration_admin_tree_ids(self) -> frozenset[int]:
+        """
+        Tree ids of the organizations the user is a registration admin of and
+        their replacements
+        """
+        return self._get_ids(
+            "registration_admin_tree_ids",
+            self.user.get_registration_admin_tree_ids,
+        )
+
+    @cached_property
+    def registration_user_access_registration_ids(self) -> frozenset[int]:
+        """
+        Ids of the registrations with a registration user access for the user's
+        email. The user must also be strongly identified to use the accesses.
+        """
+        if not self.email:
+            return frozenset()
+
+        return self._get_ids(
+            "registration_user_access_registration_ids",
+            lambda: RegistrationUserAccess.objects.filter(email=self.email).values_list(
+                "registration_id", flat=True
+            ),
+        )
+
+    @cached_property
+    def substitute_user_registration_ids(self) -> frozenset[int]:
+        """Ids of the registrations the user is a substitute user of"""
+        if not has_allowed_substitute_user_email_domain(self.email):
+            return frozenset()
+
+        return self._get_ids(
+            "substitute_user_registration_ids",
+            lambda: RegistrationUserAccess.objects.filter(
+                email=self.email, is_substitute_user=True
+            ).values_list("registration_id", flat=True),
+        )
+
+
+@receiver(m2m_changed, dispatch_uid="permission_context_m2m_changed")
+def permission_context_m2m_changed(sender, instance, model, action, **kwargs):
+    # The admin, registration admin, financial admin and regular users of the
+    # organizations
+    if not action.startswith("post_"):
+        return
+
+    if (isinstance(instance, Organization) and issubclass(model, AbstractBaseUser)) or (
+        isinstance(instance, AbstractBaseUser) and issubclass(model, Organization)
+    ):
+        invalidate_permission_contexts()
+
+
+@receiver(
+    post_save,
+    sender=Organization,
+    dispatch_uid="permission_context_organization_post_save",
+)
+@receiver(
+    post_delete,
+    sender=Organization,
+    dispatch_uid="permission_context_organization_post_delete",
+)
+@receiver(
+    post_save,
+    sender=DataSource,
+    dispatch_uid="permission_context_data_source_post_save",
+)
+@receiver(
+    post_delete,
+    sender=DataSource,
+    dispatch_uid="permission_context_data_source_post_delete",
+)
+@receiver(
+    post_save,
+    sender=RegistrationUserAccess,
+    dispatch_uid="permission_context_registration_user_access_post_save",
+)
+@receiver(
+    post_delete,
+    sender=RegistrationUserAccess,
+    dispatch_uid="permission_context_registration_user_access_post_delete",
+)
+def permission_context_changed(**kwargs):
+    invalidate_permission_contexts()
@@ -1,4 +1,5 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django_orghierarchy.models import Organization
 
 from events.models import DataSource
@@ -170,3 +171,56 @@ class TestUser(TestCase):
         self.user.save(update_fields=["email"])
         del self.user.is_substitute_user
         self.assertFalse(self.user.is_substitute_user)
+
+    def test_permission_context_is_computed_once(self):
+        self.org.admin_users.add(self.user)
+        self.assertTrue(self.user.is_admin_of(self.org))
+
+        with self.assertNumQueries(0):
+            self.assertTrue(self.user.is_admin_of(self.child_org))
+            self.assertFalse(self.user.is_admin_of(self.org_1))
+
+    def test_permission_context_is_invalidated_on_membership_changes(self):
+        self.assertFalse(self.user.is_registration_admin_of(self.child_org))
+
+        self.org.registration_admin_users.add(self.user)
+        self.assertTrue(self.user.is_registration_admin_of(self.child_org))
+
+        self.user.registration_admin_organizations.remove(self.org)
+        self.assertFalse(self.user.is_registration_admin_of(self.child_org))
+
+    def test_permission_context_is_invalidated_on_registration_user_access_changes(
+        self,
+    ):
+        self.user.email = hel_email
+        self.user.save(update_fields=["email"])
+        registration_user_access = RegistrationUserAccessFactory(
+            email=hel_email, is_substitute_user=False
+        )
+        registration_user_accesses = (
+            registration_user_access.registration.registration_user_accesses
+        )
+        self.assertFalse(self.user.is_substitute_user_of(registration_user_accesses))
+
+        registration_user_access.is_substitute_user = True
+        registration_user_access.save(update_fields=["is_substitute_user"])
+        self.assertTrue(self.user.is_substitute_user_of(registration_user_accesses))
+
+        self.user.email = "wrong@test.dev"
+        self.assertFalse(self.user.is_substitute_user_of(registration_user_accesses))
+
+    @override_settings(USER_PERMISSION_CONTEXT_CACHE_TIMEOUT=60)
+    def test_permission_context_is_shared_between_user_instances(self):
+        cache.clear()
+        self.org.admin_users.add(self.user)
+        self.assertTrue(self.user.is_admin_of(self.org))
+
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(user.is_admin_of(self.child_org))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.org.admin_users.remove(self.user)
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertFalse(user.is_admin_of(self.child_org))
@@ -60,7 +60,12 @@ root = environ.Path(__file__) - 2  # two levels back in hierarchy
 env = environ.Env(
     ADMINS=(list, []),
     ALLOWED_HOSTS=(list, []),
+    AUDIT_LOG_ASYNC_WRITES=(bool, False),
+    AUDIT_LOG_BATCH_SIZE=(int, 100),
     AUDIT_LOG_ENABLED=(bool, True),
+    AUDIT_LOG_FLUSH_INTERVAL=(float, 1.0),
+    AUDIT_LOG_QUEUE_SIZE=(int, 10000),
+    AUDIT_LOG_USER_ROLE_CACHE_TIMEOUT=(int, 0),
     AUTO_ENABLED_EXTENSIONS=(list, []),
     COOKIE_PREFIX=(str, "linkedevents"),
     DATABASE_URL=(str, "postgis:///linkedevents"),
@@ -99,10 +104,19 @@ env = environ.Env(
     ESPOO_MAX_RETRIES=(int, 3),
     ESPOO_TIMEOUT=(int, 60),
     ESPOO_WAIT_BETWEEN=(float, 1.0),
+    IMPORTER_HTTP_BACKOFF_FACTOR=(float, 0.5),
+    IMPORTER_HTTP_CACHE_DIR=(str, ""),
+    IMPORTER_HTTP_CACHE_TTL=(int, 3600),
+    IMPORTER_HTTP_MAX_RETRIES=(int, 3),
+    IMPORTER_HTTP_MAX_WORKERS=(int, 4),
+    IMPORTER_HTTP_MIN_REQUEST_INTERVAL=(float, 0.0),
     EXTERNAL_USER_PUBLISHER_ID=(str, "others"),
     ENKORA_API_USER=(str, "JoeEnkora"),
     ENKORA_API_PASSWORD=(str, None),
     EVENT_ADMIN_EXPIRATION_MONTHS=(int, 12),
+    EVENT_QUERY_CACHE_MAX_IDS=(int, 10000),
+    EVENT_QUERY_CACHE_TIMEOUT=(int, 0),
+    EVENT_SEARCH_LEGACY_TEXT=(bool, True),
     EXTRA_INSTALLED_APPS=(list, []),
     FIELD_ENCRYPTION_KEYS=(list, []),
     FINANCIAL_ADMIN_EXPIRATION_MONTHS=(int, 6),
@@ -115,6 +129,8 @@ env = environ.Env(
     INTERNAL_IPS=(list, []),
     LANGUAGES=(list, ["fi", "sv", "en", "zh-hans", "ru", "ar"]),
     LIPPUPISTE_EVENT_API_URL=(str, None),
+    KEYWORD_RESOLVER_CACHE_SIZE=(int, 1000),
+    KEYWORD_RESOLVER_CACHE_TIMEOUT=(int, 300),
     LIPPUPISTE_EVENT_API_CLIENT_ID=(str, None),
     LIPPUPISTE_EVENT_API_CALENDAR_KEY=(str, None),
     LIPPUPISTE_EVENT_API_PASSWORD=(str, None),
@@ -136,6 +152,9 @@ env = environ.Env(
     ),
     ANONYMIZATION_THRESHOLD_DAYS=(int, 30),
     OPENSHIFT_BUILD_COMMIT=(str, ""),
+    PAGINATION_COUNT_CACHE_TIMEOUT=(int, 60),
+    PAGINATION_COUNT_ESTIMATE_THRESHOLD=(int, 10000),
+    PAGINATION_COUNT_STRATEGY=(str, "exact"),
     STRONG_IDENTIFICATION_AUTHENTICATION_METHODS=(
         list,
         ["suomi_fi", "heltunnistussuomifi"],
@@ -164,7 +183,13 @@ env = environ.Env(
     TOKEN_AUTH_REQUIRE_SCOPE_PREFIX=(bool, False),
     TRUST_X_FORWARDED_HOST=(bool, False),
     REGISTRATION_ADMIN_EXPIRATION_MONTHS=(int, 6),
+    REGISTRATION_CAPACITY_COUNTERS=(bool, False),
+    REGISTRATION_ICS_CACHE_TIMEOUT=(int, 0),
+    REGISTRATION_NOTIFICATION_MAX_ATTEMPTS=(int, 5),
+    REGISTRATION_NOTIFICATION_QUEUE=(bool, False),
+    REGISTRATION_NOTIFICATION_RETRY_DELAY=(int, 60),
     REGISTRATION_USER_EXPIRATION_MONTHS=(int, 2),
+    USER_PERMISSION_CONTEXT_CACHE_TIMEOUT=(int, 0),
     WEB_STORE_API_BASE_URL=(str, ""),
     # Reducing reservation seat numbers during grace period does not reduce
     # expiration time
@@ -175,6 +200,7 @@ env = environ.Env(
     WEB_STORE_ORDER_EXPIRATION_HOURS=(int, 48),
     WEB_STORE_WEBHOOK_API_KEY=(str, ""),
     WHITENOISE_STATIC_PREFIX=(str, "/static/"),
+    YSO_DATA_FILE=(str, ""),
 )
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -518,9 +544,36 @@ LIPPUPISTE_EVENT_API_CALENDAR_KEY = env("LIPPUPISTE_EVENT_API_CALENDAR_KEY")
 LIPPUPISTE_EVENT_API_PASSWORD = env("LIPPUPISTE_EVENT_API_PASSWORD")
 LIPPUPISTE_EVENT_API_USERNAME = env("LIPPUPISTE_EVENT_API_USERNAME")
 
+# Used in YSO importer. A local YSO Turtle file to import instead of downloading
+# the current one.
+YSO_DATA_FILE = env("YSO_DATA_FILE")
+
 # Seat reservation duration in minutes
 SEAT_RESERVATION_DURATION = env("SEAT_RESERVATION_DURATION")
 
+# Keep the registration capacities up to date with counters that signups and seat
+# reservations increment and decrement instead of recounting them on every change.
+# See registrations.capacity.
+REGISTRATION_CAPACITY_COUNTERS = env("REGISTRATION_CAPACITY_COUNTERS")
+
+# Seconds to cache the ics files attached to the signup confirmations, 0 disables
+# the cache. Changes to the events are picked up without waiting for the timeout.
+REGISTRATION_ICS_CACHE_TIMEOUT = env("REGISTRATION_ICS_CACHE_TIMEOUT")
+
+# Queue the signup notifications and registration messages to be sent by the
+# send_notifications command instead of sending them within the request. A failed
+# email is retried after REGISTRATION_NOTIFICATION_RETRY_DELAY seconds, doubled
+# after every attempt, until REGISTRATION_NOTIFICATION_MAX_ATTEMPTS is reached.
+REGISTRATION_NOTIFICATION_QUEUE = env("REGISTRATION_NOTIFICATION_QUEUE")
+REGISTRATION_NOTIFICATION_MAX_ATTEMPTS = env("REGISTRATION_NOTIFICATION_MAX_ATTEMPTS")
+REGISTRATION_NOTIFICATION_RETRY_DELAY = env("REGISTRATION_NOTIFICATION_RETRY_DELAY")
+
+# Seconds to share the organization and registration ids that determine a user's
+# permissions between the user's requests, 0 disables the cache. Changes to the
+# organizations, their users and the registration user accesses invalidate the
+# cache. See helevents.permission_context.
+USER_PERMISSION_CONTEXT_CACHE_TIMEOUT = env("USER_PERMISSION_CONTEXT_CACHE_TIMEOUT")
+
 # Urls to Linked Events UI and Linked Registration UI
 LINKED_EVENTS_UI_URL = env("LINKED_EVENTS_UI_URL")
 LINKED_REGISTRATIONS_UI_URL = env("LINKED_REGISTRATIONS_UI_URL")
@@ -570,7 +623,7 @@ def dummy_haystack_connection_for_lang(language_code):
     }
 
 
-HAYSTACK_SIGNAL_PROCESSOR = "haystack.signals.RealtimeSignalProcessor"
+HAYSTACK_SIGNAL_PROCESSOR = "events.signal_processors.BulkEventSaveSignalProcessor"
 
 HAYSTACK_CONNECTIONS = {
     "default": {
@@ -624,6 +677,18 @@ else:
 # Ongoing events will be cached forever
 ONGOING_EVENTS_CACHE_TIMEOUT = None
 
+# Seconds to cache the event ids matched by anonymous event list queries,
+# 0 disables the cache. Queries matching more events are not cached.
+EVENT_QUERY_CACHE_TIMEOUT = env("EVENT_QUERY_CACHE_TIMEOUT")
+EVENT_QUERY_CACHE_MAX_IDS = env("EVENT_QUERY_CACHE_MAX_IDS")
+
+# Default strategy for counting paginated results: "exact", "cached" (for
+# PAGINATION_COUNT_CACHE_TIMEOUT seconds) or "estimate" (the planner estimate,
+# used if it exceeds PAGINATION_COUNT_ESTIMATE_THRESHOLD rows)
+PAGINATION_COUNT_STRATEGY = env("PAGINATION_COUNT_STRATEGY")
+PAGINATION_COUNT_CACHE_TIMEOUT = env("PAGINATION_COUNT_CACHE_TIMEOUT")
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = env("PAGINATION_COUNT_ESTIMATE_THRESHOLD")
+
 if env("REDIS_URL"):
     # django.core.cache.backends.locmem.LocMemCache will be used as cache backend
     # if redis is not defined.
@@ -664,6 +729,16 @@ if env("REDIS_URL"):
 # this is relevant for the fulltext search as implemented in _filter_event_queryset()
 FULLTEXT_SEARCH_LANGUAGES = {"fi": "finnish", "sv": "swedish", "en": "english"}
 
+# Number of resolved keyword search terms each worker caches and the seconds
+# they are cached for, 0 disables the cache
+KEYWORD_RESOLVER_CACHE_SIZE = env("KEYWORD_RESOLVER_CACHE_SIZE")
+KEYWORD_RESOLVER_CACHE_TIMEOUT = env("KEYWORD_RESOLVER_CACHE_TIMEOUT")
+
+# Keep the substring matching of the text and combined_text event filters.
+# When disabled, the filters use the full text search vectors, which requires
+# the events_eventfulltext relation (see the refresh_full_text command).
+EVENT_SEARCH_LEGACY_TEXT = env("EVENT_SEARCH_LEGACY_TEXT")
+
 SESSION_SERIALIZER = "django.contrib.sessions.serializers.PickleSerializer"
 
 HELUSERS_BACK_CHANNEL_LOGOUT_ENABLED = env("HELUSERS_BACK_CHANNEL_LOGOUT_ENABLED")
@@ -709,9 +784,34 @@ ESPOO_MAX_RETRIES = env("ESPOO_MAX_RETRIES")
 ESPOO_TIMEOUT = env("ESPOO_TIMEOUT")
 ESPOO_WAIT_BETWEEN = env("ESPOO_WAIT_BETWEEN")
 
+# The HTTP requests of the importers: the number of concurrent requests, the
+# retries of failed requests and the minimum interval in seconds between the
+# requests to the same host
+IMPORTER_HTTP_BACKOFF_FACTOR = env("IMPORTER_HTTP_BACKOFF_FACTOR")
+IMPORTER_HTTP_MAX_RETRIES = env("IMPORTER_HTTP_MAX_RETRIES")
+IMPORTER_HTTP_MAX_WORKERS = env("IMPORTER_HTTP_MAX_WORKERS")
+IMPORTER_HTTP_MIN_REQUEST_INTERVAL = env("IMPORTER_HTTP_MIN_REQUEST_INTERVAL")
+# The response cache of event_import --cached and --replay. Defaults to the
+# http_cache directory in the data directory. The cached responses younger than
+# the TTL in seconds are used without revalidating them.
+IMPORTER_HTTP_CACHE_DIR = env("IMPORTER_HTTP_CACHE_DIR")
+IMPORTER_HTTP_CACHE_TTL = env("IMPORTER_HTTP_CACHE_TTL")
+
 # Audit log
 AUDIT_LOG_ORIGIN = "linkedevents"
 AUDIT_LOG_ENABLED = env("AUDIT_LOG_ENABLED")
+# Write the audit log entries in batches from a background thread
+AUDIT_LOG_ASYNC_WRITES = env("AUDIT_LOG_ASYNC_WRITES")
+# The maximum number of entries written at once
+AUDIT_LOG_BATCH_SIZE = env("AUDIT_LOG_BATCH_SIZE")
+# Seconds a queued entry waits at most before it is written
+AUDIT_LOG_FLUSH_INTERVAL = env("AUDIT_LOG_FLUSH_INTERVAL")
+# The maximum number of queued entries, requests write synchronously when full
+AUDIT_LOG_QUEUE_SIZE = env("AUDIT_LOG_QUEUE_SIZE")
+# Seconds the resolved role of a user is cached for the audit log entries. The
+# cached role is not invalidated when the permissions of the user change, so a
+# changed role is logged once the timeout has passed. Disabled by default.
+AUDIT_LOG_USER_ROLE_CACHE_TIMEOUT = env("AUDIT_LOG_USER_ROLE_CACHE_TIMEOUT")
 
 FULL_TEXT_WEIGHT_OVERRIDES = env("FULL_TEXT_WEIGHT_OVERRIDES")
 
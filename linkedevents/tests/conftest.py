@@ -11,6 +11,7 @@ from rest_framework.test import APIClient
 from sentry_sdk.envelope import Envelope
 from sentry_sdk.transport import Transport
 
+from events.keywords import term_cache
 from events.models import DataSource
 
 OTHER_DATA_SOURCE_ID = "testotherdatasourceid"
@@ -174,6 +175,12 @@ def django_cache():
     cache.clear()
 
 
+@pytest.fixture(autouse=True)
+def clear_keyword_resolver_cache():
+    yield
+    term_cache.clear()
+
+
 class TestTransport(Transport):
     """Copied from https://github.com/getsentry/sentry-python/blob/master/tests/conftest.py."""
 
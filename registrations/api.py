@@ -6,7 +6,7 @@ from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.db import transaction
 from django.db.models import ProtectedError
-from django.http import HttpResponse
+from django.http import FileResponse, StreamingHttpResponse
 from django.template.loader import render_to_string
 from django.utils import translation
 from django.utils.timezone import localtime
@@ -39,6 +39,7 @@ from linkedevents.schema_utils import (
     get_common_api_error_responses,
 )
 from registrations.auth import WebStoreWebhookAuthentication
+from registrations.capacity import batched_capacity_updates
 from registrations.exceptions import (
     ConflictException,
     PriceGroupValidationError,
@@ -46,7 +47,11 @@ from registrations.exceptions import (
     WebStoreProductMappingValidationError,
     WebStoreRefundValidationError,
 )
-from registrations.exports import RegistrationSignUpsExportXLSX
+from registrations.exports import (
+    RegistrationSignUpsExportCSV,
+    RegistrationSignUpsExportJSONL,
+    RegistrationSignUpsExportXLSX,
+)
 from registrations.filters import (
     ActionDependingBackend,
     PriceGroupFilter,
@@ -54,6 +59,7 @@ from registrations.filters import (
     SignUpGroupFilter,
 )
 from registrations.models import (
+    NotificationJob,
     PriceGroup,
     Registration,
     RegistrationUserAccess,
@@ -196,7 +202,9 @@ class RegistrationViewSet(
         registration_admin_tree_ids = set()
 
         if user and user.is_authenticated:
-            registration_admin_tree_ids = user.get_registration_admin_tree_ids()
+            registration_admin_tree_ids = (
+                user.permission_context.registration_admin_tree_ids
+            )
 
         context["registration_admin_tree_ids"] = registration_admin_tree_ids
         return context
@@ -399,9 +407,10 @@ class RegistrationViewSet(
     def _get_messages(subject, cleaned_body, plain_text_body, contact_persons):
         messages = []
 
+        render_cache = {}
         for contact_person in contact_persons:
             message = contact_person.get_registration_message(
-                subject, cleaned_body, plain_text_body
+                subject, cleaned_body, plain_text_body, render_cache=render_cache
             )
             messages.append(message)
 
@@ -464,10 +473,24 @@ class RegistrationViewSet(
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        messages = self._get_messages(
-            subject, cleaned_body, plain_text_body, message_contact_persons
-        )
-        send_mass_html_mail(messages, fail_silently=False)
+        if settings.REGISTRATION_NOTIFICATION_QUEUE:
+            NotificationJob.objects.bulk_create(
+                [
+                    NotificationJob.for_contact_person(
+                        contact_person,
+                        NotificationJob.REGISTRATION_MESSAGE,
+                        subject=subject,
+                        cleaned_body=cleaned_body,
+                        plain_text_body=plain_text_body,
+                    )
+                    for contact_person in message_contact_persons
+                ]
+            )
+        else:
+            messages = self._get_messages(
+                subject, cleaned_body, plain_text_body, message_contact_persons
+            )
+            send_mass_html_mail(messages, fail_silently=False)
 
         self._add_audit_logged_object_ids(message_contact_persons)
 
@@ -491,10 +514,11 @@ class RegistrationViewSet(
         )
 
     @extend_schema(
-        summary="Export attendees as an XLSX file",
+        summary="Export attendees as an XLSX, CSV or JSON lines file",
         description=(
-            "Registration attendees XLSX export can be made if the user has appropriate access "  # noqa: E501
-            "permissions."
+            "Registration attendees export can be made if the user has appropriate access "  # noqa: E501
+            "permissions. The CSV and JSON lines files are streamed as they are generated "  # noqa: E501
+            "and contain only the attendees' data."
         ),
         parameters=[
             OpenApiParameter(
@@ -511,6 +535,8 @@ class RegistrationViewSet(
                 200,
                 "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             ): OpenApiTypes.BINARY,
+            (200, "text/csv"): OpenApiTypes.STR,
+            (200, "application/x-ndjson"): OpenApiTypes.STR,
             **get_common_api_error_responses(),
             404: OpenApiResponse(
                 description="Registration not found.",
@@ -521,7 +547,7 @@ class RegistrationViewSet(
         methods=["get"],
         detail=True,
         permission_classes=[CanAccessRegistrationSignups],
-        url_path=r"signups/export/(?P<file_format>xlsx)",
+        url_path=r"signups/export/(?P<file_format>xlsx|csv|jsonl)",
     )
     def signups_export(self, request, file_format=None, pk=None, version=None):
         serializer = self.get_serializer(data=request.query_params)
@@ -531,15 +557,26 @@ class RegistrationViewSet(
         registration = self.get_object(skip_log_ids=True)
 
         with translation.override(ui_language):
-            xlsx_export = RegistrationSignUpsExportXLSX(registration)
-            xlsx = xlsx_export.get_xlsx()
-
-        response = HttpResponse(
-            xlsx,
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={
-                "Content-Disposition": 'attachment; filename="registered_persons.xlsx"'
-            },
+            if file_format == "csv":
+                response = StreamingHttpResponse(
+                    RegistrationSignUpsExportCSV(registration).iter_csv(),
+                    content_type="text/csv",
+                )
+            elif file_format == "jsonl":
+                response = StreamingHttpResponse(
+                    RegistrationSignUpsExportJSONL(registration).iter_lines(),
+                    content_type="application/x-ndjson",
+                )
+            else:
+                # An XLSX file is a zip archive that can be streamed only after
+                # it has been written completely => stream it from a temp file.
+                response = FileResponse(
+                    RegistrationSignUpsExportXLSX(registration).get_xlsx_file(),
+                    content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                )
+
+        response["Content-Disposition"] = (
+            f'attachment; filename="registered_persons.{file_format}"'
         )
 
         self._add_audit_logged_object_ids(registration.signups.all().only("pk"))
@@ -665,21 +702,28 @@ class SignUpViewSet(
         signup_with_payment = next(
             (signup for signup in data["signups"] if signup.get("create_payment")), None
         )
-        if settings.WEB_STORE_INTEGRATION_ENABLED and signup_with_payment:
-            signup_serializer = SignUpSerializer(
-                data=signup_with_payment, context=context
-            )
-            signup_serializer.is_valid(raise_exception=True)
-            signup_instances = [
-                signup_serializer.create(signup_serializer.validated_data)
-            ]
-        else:
-            signup_instances = serializer.create_signups(serializer.validated_data)
-            serializer.notify_contact_persons(signup_instances)
+        # Update the capacities of the registration once for the signups and
+        # the deleted reservation
+        with batched_capacity_updates():
+            if settings.WEB_STORE_INTEGRATION_ENABLED and signup_with_payment:
+                signup_serializer = SignUpSerializer(
+                    data=signup_with_payment, context=context
+                )
+                signup_serializer.is_valid(raise_exception=True)
+                signup_instances = [
+                    signup_serializer.create(signup_serializer.validated_data)
+                ]
+                created_in_bulk = False
+            else:
+                signup_instances = serializer.create_signups(serializer.validated_data)
+                created_in_bulk = True
 
-        # Delete reservation
-        reservation = serializer.validated_data["reservation"]
-        reservation.delete()
+            # Delete reservation
+            reservation = serializer.validated_data["reservation"]
+            reservation.delete()
+
+        if created_in_bulk:
+            serializer.notify_contact_persons(signup_instances)
 
         self._add_audit_logged_object_ids(signup_instances)
 
@@ -0,0 +1,369 @@
+"""
+Registration capacity accounting.
+
+The remaining capacities of a registration are stored on the registration so
+that events can be filtered by them. By default they are recalculated after
+every change to the signups and seat reservations of the registration, which
+locks the registration and counts its signups and reserved seats.
+
+With REGISTRATION_CAPACITY_COUNTERS enabled, the attendee, waiting list and
+reserved seat counts are instead kept in counters on the registration. Every
+change applies its delta to the counters and recalculates the remaining
+capacities in a single UPDATE within the transaction of the change. Seat
+reservations are admitted with a conditional UPDATE of the counters, see
+reserve_seats. Seats of expired reservations are counted until the
+reservations are deleted by the delete_expired_seat_reservations command. The
+reconcile_registration_capacities command reports and fixes drift between the
+counters and the actual counts.
+"""
+
+import threading
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from contextlib import contextmanager
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Greatest
+
+from registrations.models import Registration, SeatReservationCode, SignUp
+from registrations.utils import move_waitlisted_to_attending
+
+_STATUS_COUNTERS = {
+    SignUp.AttendeeStatus.ATTENDING: "attendee_count",
+    SignUp.AttendeeStatus.WAITING_LIST: "waiting_list_count",
+}
+
+
+_batch = threading.local()
+
+
+class _CapacityChanges:
+    def __init__(self):
+        self.deltas = defaultdict(Counter)
+        self.recalculations = set()
+
+
+def capacity_counters_enabled() -> bool:
+    return settings.REGISTRATION_CAPACITY_COUNTERS
+
+
+def _get_batch() -> Optional[_CapacityChanges]:
+    return getattr(_batch, "changes", None)
+
+
+@contextmanager
+def batched_capacity_updates():
+    """
+    Apply the capacity changes made within the block once per registration
+    when the block exits instead of after every signup and reservation
+    change. Nested blocks are applied by the outermost one.
+    """
+    if _get_batch() is not None:
+        yield
+        return
+
+    _batch.changes = changes = _CapacityChanges()
+    try:
+        yield
+    finally:
+        _batch.changes = None
+
+    for registration_id, deltas in changes.deltas.items():
+        update_capacity_counters(registration_id, **deltas)
+    for registration_id in changes.recalculations:
+        schedule_capacity_recalculation(registration_id)
+
+
+def schedule_capacity_recalculation(registration_id: int) -> None:
+    if (batch := _get_batch()) is not None:
+        batch.recalculations.add(registration_id)
+        return
+
+    transaction.on_commit(lambda: recalculate_registration_capacities(registration_id))
+
+
+def _zero_floor(expression):
+    return Greatest(expression, Value(0), output_field=IntegerField())
+
+
+def _remaining_attendee_capacity(attendee_count, reserved_seats_count):
+    # The same as Registration.calculate_remaining_attendee_capacity
+    return Case(
+        When(maximum_attendee_capacity__isnull=True, then=Value(None)),
+        default=_zero_floor(
+            F("maximum_attendee_capacity") - attendee_count - reserved_seats_count
+        ),
+        output_field=IntegerField(),
+    )
+
+
+def _remaining_waiting_list_capacity(
+    attendee_count, waiting_list_count, reserved_seats_count
+):
+    # The same as Registration.calculate_remaining_waiting_list_capacity
+    waiting_list_reserved_seats = Case(
+        When(maximum_attendee_capacity__isnull=True, then=reserved_seats_count),
+        default=_zero_floor(
+            reserved_seats_count
+            - _zero_floor(F("maximum_attendee_capacity") - attendee_count)
+        ),
+        output_field=IntegerField(),
+    )
+    return Case(
+        When(waiting_list_capacity__isnull=True, then=Value(None)),
+        default=_zero_floor(
+            F("waiting_list_capacity")
+            - waiting_list_count
+            - waiting_list_reserved_seats
+        ),
+        output_field=IntegerField(),
+    )
+
+
+def _has_capacity_for(seats: int) -> Q:
+    # The same rules as SeatReservationCodeSerializer._validate_registration_capacities
+    reserved_seats_count = F("reserved_seats_count") + seats
+    return (
+        Q(maximum_attendee_capacity__isnull=True)
+        | Q(maximum_attendee_capacity__gt=F("attendee_count"))
+        & Q(maximum_attendee_capacity__gte=F("attendee_count") + reserved_seats_count)
+        | Q(maximum_attendee_capacity__lte=F("attendee_count"))
+        & (
+            Q(waiting_list_capacity__isnull=True)
+            | Q(
+                waiting_list_capacity__gte=F("waiting_list_count")
+                + reserved_seats_count
+            )
+        )
+    )
+
+
+def _apply_counter_deltas(
+    registrations: QuerySet,
+    registration_id: int,
+    attendee_count: int = 0,
+    waiting_list_count: int = 0,
+    reserved_seats_count: int = 0,
+) -> int:
+    # The expressions of an UPDATE see the counts before the update
+    new_attendee_count = F("attendee_count") + attendee_count
+    new_waiting_list_count = F("waiting_list_count") + waiting_list_count
+    new_reserved_seats_count = F("reserved_seats_count") + reserved_seats_count
+    updated = registrations.update(
+        attendee_count=new_attendee_count,
+        waiting_list_count=new_waiting_list_count,
+        reserved_seats_count=new_reserved_seats_count,
+        remaining_attendee_capacity=_remaining_attendee_capacity(
+            new_attendee_count, new_reserved_seats_count
+        ),
+        remaining_waiting_list_capacity=_remaining_waiting_list_capacity(
+            new_attendee_count, new_waiting_list_count, new_reserved_seats_count
+        ),
+    )
+
+    # A signup that uses its reserved seats frees none of them
+    freed_seats = max(0, -(attendee_count + reserved_seats_count))
+    if updated and freed_seats:
+        transaction.on_commit(
+            lambda: _fill_freed_seats_from_waiting_list(registration_id, freed_seats)
+        )
+    return updated
+
+
+def update_capacity_counters(registration_id: int, **deltas: int) -> None:
+    """
+    Add the deltas to the counters of the registration and recalculate its
+    remaining capacities from the new counts.
+    """
+    if (batch := _get_batch()) is not None:
+        batch.deltas[registration_id].update(deltas)
+        return
+
+    if any(deltas.values()):
+        _apply_counter_deltas(
+            Registration.objects.filter(pk=registration_id), registration_id, **deltas
+        )
+
+
+def reserve_seats(registration_id: int, seats: int, reserved_seats: int = 0) -> bool:
+    """
+    Change the seats reserved by a reservation from reserved_seats to seats if
+    the registration has capacity for them. The capacity is checked and the
+    counters are updated in a single conditional UPDATE, so concurrent
+    reservations cannot oversell the registration. Return whether the seats
+    were reserved.
+    """
+    delta = seats - reserved_seats
+    if not delta:
+        return True
+
+    registrations = Registration.objects.filter(pk=registration_id)
+    if delta > 0:
+        registrations = registrations.filter(_has_capacity_for(delta))
+    return bool(
+        _apply_counter_deltas(
+            registrations, registration_id, reserved_seats_count=delta
+        )
+    )
+
+
+@transaction.atomic
+def _fill_freed_seats_from_waiting_list(registration_id: int, count: int) -> None:
+    registration = (
+        Registration.objects.filter(pk=registration_id).select_for_update().first()
+    )
+    if registration is None or not registration.remaining_attendee_capacity:
+        return
+
+    move_waitlisted_to_attending(
+        registration, count=min(count, registration.remaining_attendee_capacity)
+    )
+
+
+def count_signup_changes(signups: Iterable[SignUp], created: bool = False) -> None:
+    """
+    Update the counters by the changes in the counted statuses of the signups
+    since they were loaded or last counted.
+    """
+    deltas = defaultdict(Counter)
+    for signup in signups:
+        old_status: Optional[str] = (
+            None if created else getattr(signup, "_counted_attendee_status", None)
+        )
+        new_status = signup.counted_attendee_status
+        if old_status != new_status:
+            if old_status is not None:
+                deltas[signup.registration_id][_STATUS_COUNTERS[old_status]] -= 1
+            if new_status is not None:
+                deltas[signup.registration_id][_STATUS_COUNTERS[new_status]] += 1
+        signup._counted_attendee_status = new_status
+
+    for registration_id, registration_deltas in deltas.items():
+        update_capacity_counters(registration_id, **registration_deltas)
+
+
+def count_deleted_signup(signup: SignUp) -> None:
+    status = getattr(signup, "_counted_attendee_status", signup.counted_attendee_status)
+    if status is not None:
+        update_capacity_counters(
+            signup.registration_id, **{_STATUS_COUNTERS[status]: -1}
+        )
+    signup._counted_attendee_status = None
+
+
+def count_reservation_change(reservation: SeatReservationCode) -> None:
+    # Seats reserved with reserve_seats have already been counted
+    old_seats = getattr(reservation, "_counted_seats", 0)
+    update_capacity_counters(
+        reservation.registration_id, reserved_seats_count=reservation.seats - old_seats
+    )
+    reservation._counted_seats = reservation.seats
+
+
+def count_deleted_reservation(reservation: SeatReservationCode) -> None:
+    seats = getattr(reservation, "_counted_seats", reservation.seats)
+    update_capacity_counters(reservation.registration_id, reserved_seats_count=-seats)
+    reservation._counted_seats = 0
+
+
+def _count_subquery(queryset, aggregate):
+    return Coalesce(
+        Subquery(
+            queryset.filter(registration=OuterRef("pk"))
+            .order_by()
+            .values("registration")
+            .annotate(value=aggregate)
+            .values("value"),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def annotate_actual_counts(queryset: QuerySet) -> QuerySet:
+    """Annotate the registrations with the counts the counters should have."""
+    return queryset.annotate(
+        actual_attendee_count=_count_subquery(
+            SignUp.objects.filter(attendee_status=SignUp.AttendeeStatus.ATTENDING),
+            Count("pk"),
+        ),
+        actual_waiting_list_count=_count_subquery(
+            SignUp.objects.filter(attendee_status=SignUp.AttendeeStatus.WAITING_LIST),
+            Count("pk"),
+        ),
+        actual_reserved_seats_count=_count_subquery(
+            SeatReservationCode.objects.all(), Sum("seats")
+        ),
+    )
+
+
+@transaction.atomic
+def recalculate_registration_capacities(registration_id: int) -> None:
+    """Recount the signups and reserved seats and recalculate the capacities."""
+    registration = (
+        Registration.objects.filter(pk=registration_id).select_for_update().first()
+    )
+    if registration is None:
+        return
+
+    reserved_seats_count, active_reserved_seats = (
+        registration.aggregate_reserved_seats()
+    )
+    registration.reserved_seats_count = reserved_seats_count
+    registration.attendee_count = registration.count_signups(
+        SignUp.AttendeeStatus.ATTENDING
+    )
+    registration.waiting_list_count = registration.count_signups(
+        SignUp.AttendeeStatus.WAITING_LIST
+    )
+    # Calculate the capacities from the actual counts regardless of the mode
+    registration.reserved_seats_amount = active_reserved_seats
+    registration.current_attendee_count = registration.attendee_count
+    registration.current_waiting_list_count = registration.waiting_list_count
+
+    new_remaining_attendee_capacity = (
+        registration.calculate_remaining_attendee_capacity()
+    )
+    old_remaining_attendee_capacity = registration.remaining_attendee_capacity
+    registration.remaining_attendee_capacity = new_remaining_attendee_capacity
+
+    registration.remaining_waiting_list_capacity = (
+        registration.calculate_remaining_waiting_list_capacity()
+    )
+
+    registration._capacities_recalculation_save = True
+    registration.save(
+        update_fields=[
+            "remaining_attendee_capacity",
+            "remaining_waiting_list_capacity",
+            "attendee_count",
+            "waiting_list_count",
+            "reserved_seats_count",
+        ]
+    )
+
+    if (
+        new_remaining_attendee_capacity is not None
+        and old_remaining_attendee_capacity is not None
+    ) and new_remaining_attendee_capacity > old_remaining_attendee_capacity:
+        # Registration attendee capacity has been increased
+        # => it's possible to add more attending signups to the registration from the waiting list  # noqa: E501
+        # => add as many as possible.
+        move_waitlisted_to_attending(
+            registration, count=new_remaining_attendee_capacity
+        )
@@ -0,0 +1,120 @@
+"""
+Caches for the rendered parts of the signup emails.
+
+The ics file attached to the signup confirmations is the same for every
+contact person of a registration with the same service language. When enabled
+with REGISTRATION_ICS_CACHE_TIMEOUT, it's cached under a key built from the
+registration, the language and a fingerprint of the modification times of the
+calendar events and their locations, so changes to the events are picked up
+without explicit invalidation.
+
+Emails sent to many contact persons at once differ only by a few personal
+variables. render_personalized_template renders a template once per cache key
+with placeholders in place of the personal variables and replaces the
+placeholders with the values of each recipient. The rendered templates are
+kept in a dict given by the caller, e.g. for one batch of notifications.
+"""
+
+import hashlib
+import logging
+import re
+import secrets
+from collections.abc import Callable
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.html import escape
+
+from events.models import Event
+from registrations.utils import create_events_ics_file_content
+
+logger = logging.getLogger(__name__)
+
+
+def _get_calendar_events_fingerprint(events) -> str:
+    if isinstance(events, list):
+        events = Event.objects.filter(pk__in=[event.pk for event in events])
+    modification_times = events.order_by("pk").values_list(
+        "pk", "last_modified_time", "location__last_modified_time"
+    )
+    return hashlib.sha256(repr(list(modification_times)).encode()).hexdigest()
+
+
+def _create_ics_content(events, language) -> Optional[bytes]:
+    try:
+        return create_events_ics_file_content(events, language)
+    except ValueError as error:
+        logger.error(error)
+        return None
+
+
+def get_registration_ics_content(
+    registration, language, render_cache: Optional[dict] = None
+) -> Optional[bytes]:
+    """
+    Return the ics file of the calendar events of the registration in the
+    given language or None if the registration has no valid calendar events.
+    """
+    local_key = ("ics", registration.pk, language)
+    if render_cache is not None and local_key in render_cache:
+        return render_cache[local_key]
+
+    events = registration.get_calendar_events()
+    if not events:
+        ics_content = None
+    elif timeout := settings.REGISTRATION_ICS_CACHE_TIMEOUT:
+        fingerprint = _get_calendar_events_fingerprint(events)
+        cache_key = f"registration_ics:{registration.pk}:{language}:{fingerprint}"
+        ics_content = cache.get(cache_key)
+        if ics_content is None:
+            ics_content = _create_ics_content(events, language)
+            if ics_content is not None:
+                cache.set(cache_key, ics_content, timeout)
+    else:
+        ics_content = _create_ics_content(events, language)
+
+    if render_cache is not None:
+        render_cache[local_key] = ics_content
+    return ics_content
+
+
+def render_personalized_template(
+    render_cache: dict,
+    cache_key: tuple,
+    template_name: str,
+    get_context: Callable[[dict], dict],
+    personal_variables: dict,
+) -> str:
+    """
+    Render the template for one recipient. get_context is called with the
+    personal variables, the non-empty ones replaced with placeholders, and
+    returns the template context. The context must otherwise be the same for
+    every recipient with the same cache_key. The template may output the
+    personal variables as such or autoescaped, but not through other filters.
+    """
+    # Empty values are rendered as such since the template may test them
+    empty_variables = tuple(
+        (name, value) for name, value in personal_variables.items() if not value
+    )
+    template_key = ("template", template_name, *cache_key, empty_variables)
+    if (cached := render_cache.get(template_key)) is None:
+        # Tokens that cannot appear in the other content of the template. The
+        # ampersand shows whether the variable was escaped in the output.
+        nonce = secrets.token_hex(8)
+        placeholders = {
+            name: f"[[&{nonce}:{name}]]" if value else value
+            for name, value in personal_variables.items()
+        }
+        pattern = re.compile(rf"\[\[&(amp;)?{nonce}:(\w+)\]\]")
+        rendered = render_to_string(template_name, get_context(placeholders))
+        cached = render_cache[template_key] = (pattern, rendered)
+
+    pattern, rendered = cached
+
+    def substitute(match):
+        value = str(personal_variables[match[2]])
+        return escape(value) if match[1] else value
+
+    return pattern.sub(substitute, rendered)
@@ -1,19 +1,26 @@
-import io
+import csv
+import json
+import tempfile
+from collections.abc import Iterator
 
 from django.utils import translation
 from django.utils.translation import gettext as _
 from xlsxwriter import Workbook
 from xlsxwriter.worksheet import Worksheet
 
-from registrations.models import Registration
+from registrations.models import Registration, SignUp
 
+# The number of signups fetched at a time from the server-side cursor
+EXPORT_CHUNK_SIZE = 500
 
-class RegistrationSignUpsExportXLSX:
+# Spreadsheet applications evaluate cells starting with these as formulas
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+class RegistrationSignUpsExport:
     def __init__(self, registration: Registration) -> None:
-        self.worksheet_header = "{event_name} - {registered_persons}".format(
-            event_name=registration.event.name,
-            registered_persons=_("Registered persons"),
-        )
+        self.language = translation.get_language()
+        self.event_name = registration.event.name
 
         self.signups = (
             registration.signups.all()
@@ -33,30 +40,30 @@ class RegistrationSignUpsExportXLSX:
         )
 
         self.columns = self._get_columns()
-        self.formats = {}
-
-        self.date_formats = {
-            "fi": "dd.mm.yyyy",
-            "sv": "dd.mm.yyyy",
-            "en": "dd mmm yyyy",
-        }
 
     @staticmethod
     def _get_columns() -> list[dict]:
         return [
             {
+                "key": "name",
                 "header": _("Name"),
                 "accessor": lambda signup: (
                     f"{signup.last_name or ''} {signup.first_name or ''}".strip()
                 ),
             },
             {
+                "key": "date_of_birth",
                 "header": _("Date of birth"),
                 "accessor": "date_of_birth",
                 "format": "date_format",
             },
-            {"header": _("Phone number"), "accessor": "phone_number"},
             {
+                "key": "phone_number",
+                "header": _("Phone number"),
+                "accessor": "phone_number",
+            },
+            {
+                "key": "contact_person_email",
                 "header": _("Contact person's email"),
                 "accessor": lambda signup: (
                     signup.actual_contact_person.email
@@ -65,6 +72,7 @@ class RegistrationSignUpsExportXLSX:
                 ),
             },
             {
+                "key": "contact_person_phone_number",
                 "header": _("Contact person's phone number"),
                 "accessor": lambda signup: (
                     signup.actual_contact_person.phone_number
@@ -73,11 +81,51 @@ class RegistrationSignUpsExportXLSX:
                 ),
             },
             {
+                "key": "attendee_status",
                 "header": "Status",  # In the UI, this same word is used for all three languages  # noqa: E501
                 "accessor": lambda signup: str(signup.get_attendee_status_display()),
             },
         ]
 
+    def _get_signup_values(self, signup: SignUp) -> list:
+        values = []
+
+        for column in self.columns:
+            if callable(column["accessor"]):
+                values.append(column["accessor"](signup))
+            else:
+                values.append(getattr(signup, column["accessor"], None))
+
+        return values
+
+    def _iter_signups(self) -> Iterator[SignUp]:
+        # Fetch the signups in chunks from a server-side cursor instead of loading
+        # all of them into memory.
+        return self.signups.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    def _iter_translated(self, items: Iterator) -> Iterator:
+        # Streamed content is generated after the view has returned => activate
+        # the export language while generating it.
+        with translation.override(self.language):
+            yield from items
+
+
+class RegistrationSignUpsExportXLSX(RegistrationSignUpsExport):
+    def __init__(self, registration: Registration) -> None:
+        super().__init__(registration)
+
+        self.worksheet_header = "{event_name} - {registered_persons}".format(
+            event_name=self.event_name,
+            registered_persons=_("Registered persons"),
+        )
+        self.formats = {}
+
+        self.date_formats = {
+            "fi": "dd.mm.yyyy",
+            "sv": "dd.mm.yyyy",
+            "en": "dd mmm yyyy",
+        }
+
     @staticmethod
     def _add_info_texts(worksheet: Worksheet, row: int = 1) -> None:
         worksheet.write(
@@ -102,62 +150,56 @@ class RegistrationSignUpsExportXLSX:
         )
         worksheet.set_row(row + 1, 20)
 
-    def _get_signups_table_columns(self) -> list[dict]:
-        table_columns = [
-            {
-                "header": column["header"],
-                "format": (
-                    self.formats.get(column["format"]) if "format" in column else None
-                ),
-            }
+    def _get_column_formats(self) -> list:
+        return [
+            self.formats.get(column["format"]) if "format" in column else None
             for column in self.columns
         ]
 
-        return table_columns
-
-    def _get_signups_table_data(self) -> list[list]:
-        table_data = []
-
-        for signup in self.signups:
-            signup_data = []
-
-            for column in self.columns:
-                if callable(column["accessor"]):
-                    col_value = column["accessor"](signup)
-                else:
-                    col_value = getattr(signup, column["accessor"], None)
-
-                signup_data.append(col_value or "-")
-
-            table_data.append(signup_data)
-
-        return table_data
+    def _iter_signups_table_data(self) -> Iterator[list]:
+        for signup in self._iter_signups():
+            yield [value or "-" for value in self._get_signup_values(signup)]
 
     def _add_signups_table(self, worksheet: Worksheet, row: int = 4) -> None:
-        table_columns = self._get_signups_table_columns()
-        table_data = self._get_signups_table_data()
-
-        worksheet.add_table(
+        # Worksheet tables are not supported in the constant memory mode => write
+        # the header row and add an autofilter to the written rows instead.
+        worksheet.write_row(
             row,
             0,
-            row + len(table_data),
-            len(self.columns) - 1,
-            {
-                "columns": table_columns,
-                "data": table_data,
-            },
+            [column["header"] for column in self.columns],
+            self.formats["header"],
         )
 
-    def get_xlsx(self) -> bytes:
-        output = io.BytesIO()
+        column_formats = self._get_column_formats()
+        column_widths = [len(str(column["header"])) for column in self.columns]
+        last_row = row
+
+        for signup_data in self._iter_signups_table_data():
+            last_row += 1
+            for col, (value, cell_format) in enumerate(
+                zip(signup_data, column_formats)
+            ):
+                worksheet.write(last_row, col, value, cell_format)
+                column_widths[col] = max(column_widths[col], len(str(value)))
+
+        worksheet.autofilter(row, 0, last_row, len(self.columns) - 1)
+        worksheet.freeze_panes(row + 1, 0)
 
-        with Workbook(output, {"in_memory": True}) as workbook:
+        # worksheet.autofit() only sees the last row in the constant memory mode
+        for col, width in enumerate(column_widths):
+            worksheet.set_column(col, col, width + 2)
+
+    def write_xlsx(self, output) -> None:
+        with Workbook(output, {"constant_memory": True}) as workbook:
             # Add formatting options.
             self.formats["bold"] = workbook.add_format({"bold": True})
+            self.formats["header"] = workbook.add_format(
+                {"bold": True, "bottom": 1, "bg_color": "#D9D9D9"}
+            )
             self.formats["date_format"] = workbook.add_format(
                 {
                     "num_format": self.date_formats.get(
-                        translation.get_language(), self.date_formats["fi"]
+                        self.language, self.date_formats["fi"]
                     ),
                 }
             )
@@ -168,14 +210,67 @@ class RegistrationSignUpsExportXLSX:
             # Add the worksheet's title to the beginning of the worksheet.
             worksheet.write(0, 0, self.worksheet_header, self.formats["bold"])
 
+            # Add info texts about data protection and contact information.
+            self._add_info_texts(worksheet, 2)
+
             # Add a table containing the signups' data.
             self._add_signups_table(worksheet, 6)
 
-            # Automatically try to adjust signup table column widths to make values
-            # visible in the columns.
-            worksheet.autofit()
+    def get_xlsx_file(self):
+        """
+        Write the export into a temporary file and return the file positioned at
+        its beginning. Only one row of the worksheet is kept in memory at a time.
+        """
+        output = tempfile.TemporaryFile()
+        try:
+            self.write_xlsx(output)
+        except Exception:
+            output.close()
+            raise
 
-            # Add info texts about data protection and contact information.
-            self._add_info_texts(worksheet, 2)
+        output.seek(0)
+        return output
+
+
+class _EchoBuffer:
+    """A file-like object that returns what is written into it."""
+
+    def write(self, value):
+        return value
+
+
+def _escape_csv_value(value):
+    # The signup data comes from the public signup form => prevent it from being
+    # evaluated as a formula when the file is opened in a spreadsheet.
+    if value is None:
+        return ""
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+class RegistrationSignUpsExportCSV(RegistrationSignUpsExport):
+    def _iter_csv(self) -> Iterator[str]:
+        writer = csv.writer(_EchoBuffer())
+
+        yield writer.writerow([column["header"] for column in self.columns])
+
+        for signup in self._iter_signups():
+            yield writer.writerow(
+                [_escape_csv_value(value) for value in self._get_signup_values(signup)]
+            )
+
+    def iter_csv(self) -> Iterator[str]:
+        return self._iter_translated(self._iter_csv())
+
+
+class RegistrationSignUpsExportJSONL(RegistrationSignUpsExport):
+    def _iter_lines(self) -> Iterator[str]:
+        keys = [column["key"] for column in self.columns]
+
+        for signup in self._iter_signups():
+            values = self._get_signup_values(signup)
+            yield json.dumps(dict(zip(keys, values)), default=str) + "\n"
 
-        return output.getvalue()
+    def iter_lines(self) -> Iterator[str]:
+        return self._iter_translated(self._iter_lines())
@@ -1,13 +1,11 @@
 import django_filters
 from django.db.models import Q, Value
 from django.db.models.functions import Concat
-from django.utils.functional import cached_property
 from django.utils.translation import gettext as _
 from rest_framework.exceptions import PermissionDenied as DRFPermissionDenied
 from rest_framework.exceptions import ValidationError
 
 from registrations.models import PriceGroup, Registration, SignUp, SignUpGroup
-from registrations.utils import has_allowed_substitute_user_email_domain
 
 
 class ActionDependingBackend(django_filters.rest_framework.DjangoFilterBackend):
@@ -25,13 +23,26 @@ class ActionDependingFilter(django_filters.rest_framework.FilterSet):
 
 
 class SignUpBaseFilter(ActionDependingFilter):
-    @cached_property
+    @property
     def _user_admin_organizations(self):
-        return self.request.user.get_admin_organizations_and_descendants()
+        return self.request.user.permission_context.admin_organization_ids
 
-    @cached_property
+    @property
     def _user_registration_admin_organizations(self):
-        return self.request.user.get_registration_admin_organizations_and_descendants()
+        return self.request.user.permission_context.registration_admin_organization_ids
+
+    def _get_user_access_registration_ids(self):
+        # Registrations to which the user has access as a substitute user or as
+        # a strongly identified registration user
+        user = self.request.user
+        registration_ids = set(user.permission_context.substitute_user_registration_ids)
+
+        if user.is_strongly_identified:
+            registration_ids |= (
+                user.permission_context.registration_user_access_registration_ids
+            )
+
+        return registration_ids
 
     def filter_queryset(self, queryset):
         queryset = super().filter_queryset(queryset)
@@ -44,21 +55,16 @@ class SignUpBaseFilter(ActionDependingFilter):
         # By default, return only signups of registrations to which
         # user has admin rights or is registration user who is
         # strongly identified.
-        qs_filter = Q(
-            registration__event__publisher__in=self._user_registration_admin_organizations
-        ) | (
-            Q(registration__event__publisher__in=self._user_admin_organizations)
-            & Q(registration__created_by=user)
-        )
-
-        if has_allowed_substitute_user_email_domain(user.email):
-            qs_filter |= Q(
-                registration__registration_user_accesses__email=user.email,
-                registration__registration_user_accesses__is_substitute_user=True,
+        qs_filter = (
+            Q(
+                registration__event__publisher__in=self._user_registration_admin_organizations
             )
-
-        if user.is_strongly_identified:
-            qs_filter |= Q(registration__registration_user_accesses__email=user.email)
+            | (
+                Q(registration__event__publisher__in=self._user_admin_organizations)
+                & Q(registration__created_by=user)
+            )
+            | Q(registration__in=self._get_user_access_registration_ids())
+        )
 
         return queryset.filter(qs_filter)
 
@@ -78,20 +84,14 @@ class SignUpBaseFilter(ActionDependingFilter):
         if user.is_superuser:
             return queryset.filter(registration__in=registrations)
 
-        qs_filter = Q(
-            event__publisher__in=self._user_registration_admin_organizations
-        ) | (
-            Q(event__publisher__in=self._user_admin_organizations) & Q(created_by=user)
-        )
-
-        if has_allowed_substitute_user_email_domain(user.email):
-            qs_filter |= Q(
-                registration_user_accesses__email=user.email,
-                registration_user_accesses__is_substitute_user=True,
+        qs_filter = (
+            Q(event__publisher__in=self._user_registration_admin_organizations)
+            | (
+                Q(event__publisher__in=self._user_admin_organizations)
+                & Q(created_by=user)
             )
-
-        if user.is_strongly_identified:
-            qs_filter |= Q(registration_user_accesses__email=user.email)
+            | Q(pk__in=self._get_user_access_registration_ids())
+        )
 
         registrations = registrations.filter(qs_filter)
 
@@ -1,21 +1,94 @@
+import time
 from datetime import timedelta
 
 from django.conf import settings
 from django.core.management import BaseCommand
 from django.db import transaction
+from django.db.models import Q
 from django.db.models.functions import Greatest
 from django.utils.timezone import localtime
 
-from registrations.models import SignUp, SignUpGroup
+from registrations.models import (
+    SignUp,
+    SignUpContactPerson,
+    SignUpGroup,
+    SignUpGroupProtectedData,
+    SignUpProtectedData,
+    anonymize_replacement,
+)
+
+BATCH_SIZE = 500
+
+
+def _anonymize_contact_persons(signup_ids, signup_group_ids):
+    SignUpContactPerson.all_objects.filter(
+        Q(signup_id__in=signup_ids) | Q(signup_group_id__in=signup_group_ids)
+    ).update(
+        email=anonymize_replacement,
+        phone_number=anonymize_replacement,
+        first_name=anonymize_replacement,
+        last_name=anonymize_replacement,
+        membership_number=anonymize_replacement,
+    )
+
+
+def _anonymize_signups(signup_ids, now):
+    if not signup_ids:
+        return
+
+    _anonymize_contact_persons(signup_ids, [])
+    SignUpProtectedData.all_objects.filter(signup_id__in=signup_ids).update(
+        extra_info=None
+    )
+    SignUp.all_objects.filter(pk__in=signup_ids).update(
+        first_name=anonymize_replacement,
+        last_name=anonymize_replacement,
+        street_address=anonymize_replacement,
+        anonymization_time=now,
+        created_by=None,
+        last_modified_by=None,
+        last_modified_time=now,
+    )
+
+
+def _anonymize_signup_groups(signup_group_ids, now):
+    _anonymize_contact_persons([], signup_group_ids)
+    SignUpGroupProtectedData.all_objects.filter(
+        signup_group_id__in=signup_group_ids
+    ).update(extra_info=None)
+    SignUpGroup.all_objects.filter(pk__in=signup_group_ids).update(
+        anonymization_time=now,
+        created_by=None,
+        last_modified_by=None,
+        last_modified_time=now,
+    )
 
 
 class Command(BaseCommand):
     help = (
         "Anonymize signups and signup groups of the registration with past "
         "enrolment times. The threshold of anonymization can be specified as "
-        "days in the ANONYMIZATION_THRESHOLD_DAYS environment variable."
+        "days in the ANONYMIZATION_THRESHOLD_DAYS environment variable. The "
+        "signups are anonymized in batches, each in its own transaction, so an "
+        "interrupted run can be continued by running the command again."
     )
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help=(
+                "Number of signup groups or signups anonymized in one transaction. "
+                f"Defaults to {BATCH_SIZE}."
+            ),
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count the signup groups and signups without anonymizing them.",
+        )
+
     def _build_compare_time_annotation(self):
         return {
             "compare_time": Greatest(
@@ -24,42 +97,106 @@ class Command(BaseCommand):
             ),
         }
 
+    def _get_past_objects(self, queryset, threshold_time):
+        # The anonymization time works as the checkpoint of an interrupted run
+        return queryset.annotate(**self._build_compare_time_annotation()).filter(
+            compare_time__lt=threshold_time,
+            anonymization_time__isnull=True,
+        )
+
+    @staticmethod
+    def _get_batch_ids(queryset, last_pk, batch_size, dry_run):
+        queryset = queryset.filter(pk__gt=last_pk).order_by("pk")
+        if not dry_run:
+            queryset = queryset.select_for_update(of=("self",))
+        return list(queryset.values_list("pk", flat=True)[:batch_size])
+
+    def _anonymize_signup_groups_batch(self, threshold_time, last_pk, options):
+        signup_group_ids = self._get_batch_ids(
+            self._get_past_objects(SignUpGroup.objects.all(), threshold_time),
+            last_pk,
+            options["batch_size"],
+            options["dry_run"],
+        )
+        signups = SignUp.objects.filter(
+            signup_group_id__in=signup_group_ids, anonymization_time__isnull=True
+        ).order_by("pk")
+        if not options["dry_run"]:
+            signups = signups.select_for_update()
+        signup_ids = list(signups.values_list("pk", flat=True))
+
+        if signup_group_ids and not options["dry_run"]:
+            now = localtime()
+            _anonymize_signups(signup_ids, now)
+            _anonymize_signup_groups(signup_group_ids, now)
+
+        return signup_group_ids, len(signup_ids)
+
+    def _anonymize_signups_batch(self, threshold_time, last_pk, options):
+        # The signups of the past signup groups are anonymized with the groups
+        signups = self._get_past_objects(SignUp.objects.all(), threshold_time).filter(
+            Q(signup_group__isnull=True)
+            | Q(signup_group__deleted=True)
+            | Q(signup_group__anonymization_time__isnull=False)
+        )
+        signup_ids = self._get_batch_ids(
+            signups, last_pk, options["batch_size"], options["dry_run"]
+        )
+
+        if not options["dry_run"]:
+            _anonymize_signups(signup_ids, localtime())
+
+        return signup_ids, 0
+
+    def _run_batches(self, anonymize_batch, threshold_time, options):
+        action = "to anonymize" if options["dry_run"] else "anonymized"
+        last_pk = 0
+        total = total_related = 0
+
+        while True:
+            with transaction.atomic():
+                ids, related_count = anonymize_batch(threshold_time, last_pk, options)
+            if not ids:
+                return total, total_related
+
+            last_pk = ids[-1]
+            total += len(ids)
+            total_related += related_count
+            self.stdout.write(f"  {total} {action}")
+
+            if len(ids) < options["batch_size"]:
+                return total, total_related
+
+    def _write_summary(self, message, count, started):
+        duration = time.monotonic() - started
+        throughput = count / duration if duration else 0
+        self.stdout.write(f"{message} in {duration:.1f} s ({throughput:.0f} / s)")
+
     def handle(self, *args, **options):
         threshold_time = localtime() - timedelta(
             days=settings.ANONYMIZATION_THRESHOLD_DAYS
         )
+        action = "to anonymize" if options["dry_run"] else "anonymized"
 
         # Anonymize all the signup groups and the related signups
         self.stdout.write(
             "Start anonymizing past signup groups and the related signups"
         )
-        signup_groups = (
-            SignUpGroup.objects.prefetch_related("signups")
-            .annotate(**self._build_compare_time_annotation())
-            .select_for_update()
-            .filter(
-                compare_time__lt=threshold_time,
-                anonymization_time__isnull=True,
-            )
+        started = time.monotonic()
+        signup_groups_count, group_signups_count = self._run_batches(
+            self._anonymize_signup_groups_batch, threshold_time, options
+        )
+        self._write_summary(
+            f"{signup_groups_count} signup groups with {group_signups_count} "
+            f"signups {action}",
+            signup_groups_count + group_signups_count,
+            started,
         )
-
-        with transaction.atomic():
-            for signup_group in signup_groups:
-                signup_group.anonymize()
-        self.stdout.write(f"{len(signup_groups)} signup groups anonymized")
 
         # Anonymize all signups without a group
         self.stdout.write("Start anonymizing past signups")
-        signups = (
-            SignUp.objects.annotate(**self._build_compare_time_annotation())
-            .select_for_update()
-            .filter(
-                compare_time__lt=threshold_time,
-                anonymization_time__isnull=True,
-            )
+        started = time.monotonic()
+        signups_count, _ = self._run_batches(
+            self._anonymize_signups_batch, threshold_time, options
         )
-
-        with transaction.atomic():
-            for signup in signups:
-                signup.anonymize()
-        self.stdout.write(f"{len(signups)} signups anonymized")
+        self._write_summary(f"{signups_count} signups {action}", signups_count, started)
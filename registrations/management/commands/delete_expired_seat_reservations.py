@@ -1,26 +1,75 @@
-from datetime import timedelta
+import logging
+import time
 
 from django.core.management import BaseCommand
-from django.db.models import DateTimeField, ExpressionWrapper, F
+from django.db import transaction
 from django.utils.timezone import localtime
 
 from registrations.models import SeatReservationCode
-from registrations.utils import code_validity_duration
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+INTERVAL = 60
 
 
 class Command(BaseCommand):
     help = (
         "Deletes SeatReservationCode instances whose expiration time has passed at "
-        "the current moment."
+        "the current moment. The reservations are deleted in batches. With --loop, "
+        "keeps sweeping the expired reservations until interrupted."
     )
 
-    def handle(self, *args, **options):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help=f"Number of reservations deleted at once. Defaults to {BATCH_SIZE}.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and sweep the expired reservations periodically.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=INTERVAL,
+            help=f"Seconds between the sweeps with --loop. Defaults to {INTERVAL}.",
+        )
+
+    @staticmethod
+    @transaction.atomic
+    def _delete_batch(now, batch_size):
+        # Reservations that are being used for signups are left for the next batch
+        expired_ids = list(
+            SeatReservationCode.objects.filter(expiration__lt=now)
+            .order_by()
+            .select_for_update(skip_locked=True)
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if expired_ids:
+            SeatReservationCode.objects.filter(pk__in=expired_ids).delete()
+        return len(expired_ids)
+
+    def sweep(self, batch_size):
         now = localtime()
+        deleted = 0
+        while True:
+            batch_deleted = self._delete_batch(now, batch_size)
+            deleted += batch_deleted
+            if batch_deleted < batch_size:
+                return deleted
 
-        SeatReservationCode.objects.annotate(
-            expires_at=ExpressionWrapper(
-                F("timestamp")
-                + timedelta(minutes=1) * code_validity_duration(F("seats")),
-                output_field=DateTimeField(),
-            )
-        ).filter(expires_at__lt=now).delete()
+    def handle(self, *args, **options):
+        try:
+            while True:
+                deleted = self.sweep(options["batch_size"])
+                if deleted:
+                    logger.info(f"Deleted {deleted} expired seat reservations")
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
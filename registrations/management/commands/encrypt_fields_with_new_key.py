@@ -1,30 +1,267 @@
-from django.core.management import BaseCommand
-from django.db import transaction
+import copy
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.core.management import BaseCommand, CommandError
+from django.db import models, transaction
+from django.db.models.functions import Cast
 
 from registrations.models import SignUpGroupProtectedData, SignUpProtectedData
 
+BATCH_SIZE = 1000
+
+ENCRYPTED_FIELDS = {
+    SignUpGroupProtectedData: ["extra_info"],
+    SignUpProtectedData: ["extra_info", "date_of_birth"],
+}
+
+
+class _InlineExecutor(Executor):
+    """Runs the work in the current process when no workers are requested."""
+
+    def map(self, fn, *iterables, **kwargs):
+        return map(fn, *iterables)
+
+
+def _get_primary_key_field(field):
+    # A copy of the field that only accepts data encrypted with the primary key
+    primary_key_field = copy.copy(field)
+    primary_key_field.keys = field.keys[:1]
+    return primary_key_field
+
+
+def _decrypts_with(field, value) -> bool:
+    try:
+        field.decrypt(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _reencrypt_rows(args):
+    """
+    Re-encrypt the raw encrypted values of the rows with the primary key. Return
+    the pks and the new values of the rows that were encrypted with another key.
+    """
+    model, field_names, rows = args
+    fields = [model._meta.get_field(field_name) for field_name in field_names]
+    primary_key_fields = [_get_primary_key_field(field) for field in fields]
+
+    reencrypted_rows = []
+    for pk, *values in rows:
+        new_values = []
+        for field, primary_key_field, value in zip(fields, primary_key_fields, values):
+            if value is None or _decrypts_with(primary_key_field, value):
+                new_values.append(None)
+            else:
+                new_values.append(primary_key_field.encrypt(field.decrypt(value)))
+
+        if any(new_values):
+            reencrypted_rows.append((pk, new_values))
+
+    return reencrypted_rows
+
+
+def _verify_rows(args):
+    """Return the pks of the rows that cannot be decrypted with the primary key."""
+    model, field_names, rows = args
+    primary_key_fields = [
+        _get_primary_key_field(model._meta.get_field(field_name))
+        for field_name in field_names
+    ]
+
+    return [
+        pk
+        for pk, *values in rows
+        if not all(
+            value is None or _decrypts_with(field, value)
+            for field, value in zip(primary_key_fields, values)
+        )
+    ]
+
+
+def _chunked(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
 
 class Command(BaseCommand):
     help = (
         "Encrypts existing encrypted data with a new encryption key. Please remember to prepend "  # noqa: E501
         "the new key to the secrets value of the FIELD_ENCRYPTION_KEYS setting before running "  # noqa: E501
-        "this command."
+        "this command. The rows are re-encrypted in batches in parallel worker processes, and "  # noqa: E501
+        "rows already encrypted with the new key are skipped, so an interrupted run can be "  # noqa: E501
+        "continued by running the command again. Finally, verifies that all rows can be "  # noqa: E501
+        "decrypted with the new key."
     )
 
-    def handle(self, *args, **options):
-        signup_group_protected_data = (
-            SignUpGroupProtectedData.objects.select_for_update().all()
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help=(
+                "Number of rows re-encrypted in one transaction. "
+                f"Defaults to {BATCH_SIZE}."
+            ),
         )
-        signup_protected_data = SignUpProtectedData.objects.select_for_update().all()
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help=(
+                "Number of worker processes decrypting and encrypting the data. "
+                "With 1, the data is processed in the command's process. Defaults "
+                "to the number of CPUs."
+            ),
+        )
+        parser.add_argument(
+            "--verify-only",
+            action="store_true",
+            help="Only verify that all rows can be decrypted with the new key.",
+        )
+
+    @staticmethod
+    def _get_raw_rows(model, field_names, last_pk, batch_size, lock=False):
+        # Cast to a plain binary field to read the encrypted values as such
+        queryset = (
+            model.all_objects.filter(pk__gt=last_pk)
+            .annotate(
+                **{
+                    f"raw_{field_name}": Cast(field_name, models.BinaryField())
+                    for field_name in field_names
+                }
+            )
+            .order_by("pk")
+        )
+        if lock:
+            queryset = queryset.select_for_update()
+
+        rows = queryset.values_list(
+            "pk", *[f"raw_{field_name}" for field_name in field_names]
+        )[:batch_size]
+        return [
+            (pk, *[None if value is None else bytes(value) for value in values])
+            for pk, *values in rows
+        ]
+
+    @staticmethod
+    def _split_for_workers(model, field_names, rows, workers):
+        chunk_size = -(-len(rows) // max(workers, 1))
+        return [(model, field_names, chunk) for chunk in _chunked(rows, chunk_size)]
+
+    def _reencrypt_batch(self, executor, model, field_names, last_pk, options):
+        rows = self._get_raw_rows(
+            model, field_names, last_pk, options["batch_size"], lock=True
+        )
+        if not rows:
+            return rows, 0
+
+        objs = []
+        for reencrypted_rows in executor.map(
+            _reencrypt_rows,
+            self._split_for_workers(model, field_names, rows, options["workers"]),
+        ):
+            for pk, new_values in reencrypted_rows:
+                obj = model(pk=pk)
+                update_fields = []
+                for field_name, value in zip(field_names, new_values):
+                    if value is not None:
+                        # Write the encrypted value as such instead of
+                        # encrypting it again
+                        setattr(
+                            obj, field_name, models.Value(value, models.BinaryField())
+                        )
+                        update_fields.append(field_name)
+                objs.append((obj, update_fields))
+
+        # bulk_update() writes the same fields for every object => group them
+        objs_by_fields = {}
+        for obj, update_fields in objs:
+            objs_by_fields.setdefault(tuple(update_fields), []).append(obj)
+        for update_fields, field_objs in objs_by_fields.items():
+            model.all_objects.bulk_update(field_objs, update_fields)
+
+        return rows, len(objs)
+
+    def _reencrypt(self, executor, model, field_names, options):
+        self.stdout.write(f"Start encrypting {model.__name__} with the new key")
+        started = time.monotonic()
+        last_pk = 0
+        processed = reencrypted = 0
+
+        while True:
+            with transaction.atomic():
+                rows, batch_reencrypted = self._reencrypt_batch(
+                    executor, model, field_names, last_pk, options
+                )
+            if not rows:
+                break
+
+            last_pk = rows[-1][0]
+            processed += len(rows)
+            reencrypted += batch_reencrypted
+            self.stdout.write(
+                f"  {processed} rows processed, {reencrypted} re-encrypted "
+                f"(last pk {last_pk})"
+            )
+
+        duration = time.monotonic() - started
+        self.stdout.write(
+            f"{reencrypted} of {processed} {model.__name__} rows re-encrypted "
+            f"in {duration:.1f} s"
+        )
+
+    def _verify(self, executor, model, field_names, options):
+        self.stdout.write(f"Start verifying {model.__name__}")
+        last_pk = 0
+        processed = 0
+        failed_pks = []
+
+        while rows := self._get_raw_rows(
+            model, field_names, last_pk, options["batch_size"]
+        ):
+            for pks in executor.map(
+                _verify_rows,
+                self._split_for_workers(model, field_names, rows, options["workers"]),
+            ):
+                failed_pks.extend(pks)
+            last_pk = rows[-1][0]
+            processed += len(rows)
+
+        if failed_pks:
+            self.stderr.write(
+                f"{len(failed_pks)} of {processed} {model.__name__} rows cannot be "
+                f"decrypted with the new key: {failed_pks}"
+            )
+        else:
+            self.stdout.write(
+                f"All {processed} {model.__name__} rows can be decrypted with the "
+                "new key"
+            )
+        return failed_pks
+
+    def handle(self, *args, **options):
+        if options["workers"] > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=options["workers"], initializer=django.setup
+            )
+        else:
+            executor = _InlineExecutor()
 
-        group_update_fields = ["extra_info"]
-        signup_update_fields = ["extra_info", "date_of_birth"]
+        with executor:
+            if not options["verify_only"]:
+                for model, field_names in ENCRYPTED_FIELDS.items():
+                    self._reencrypt(executor, model, field_names, options)
 
-        with transaction.atomic():
-            for group_data in signup_group_protected_data:
-                # Simply saving will cause the encrypted data to be fetched
-                # and then saved with the new encryption key.
-                group_data.save(update_fields=group_update_fields)
+            failed = False
+            for model, field_names in ENCRYPTED_FIELDS.items():
+                if self._verify(executor, model, field_names, options):
+                    failed = True
 
-            for signup_data in signup_protected_data:
-                signup_data.save(update_fields=signup_update_fields)
+        if failed:
+            raise CommandError("Some rows cannot be decrypted with the new key")
@@ -0,0 +1,120 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.exceptions import APIException
+
+from registrations.capacity import annotate_actual_counts
+from registrations.models import Registration, SeatReservationCode
+from registrations.serializers import SeatReservationCodeSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulates concurrent seat reservations against one registration and "
+        "reports the throughput and the number of oversold seats. The reservations "
+        "are made with the same serializer as the API. Meant for test and staging "
+        "databases, the created reservations are deleted afterwards unless --keep "
+        "is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "registration_id", type=int, help="The registration to reserve seats for."
+        )
+        parser.add_argument(
+            "--reservers",
+            type=int,
+            default=100,
+            help="The number of reservations to attempt. Defaults to 100.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=10,
+            help="The number of reservations made at the same time. Defaults to 10.",
+        )
+        parser.add_argument(
+            "--seats",
+            type=int,
+            default=1,
+            help="The number of seats per reservation. Defaults to 1.",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the created reservations.",
+        )
+
+    @staticmethod
+    def _reserve(registration_id, seats):
+        request = SimpleNamespace(user=AnonymousUser())
+        serializer = SeatReservationCodeSerializer(
+            data={"registration": registration_id, "seats": seats},
+            context={"request": request},
+        )
+        try:
+            if not serializer.is_valid():
+                return None
+            return serializer.save().pk
+        except APIException:
+            return None
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _get_oversold_seats(registration_id):
+        registration = annotate_actual_counts(
+            Registration.objects.filter(pk=registration_id)
+        ).get()
+        if (
+            registration.maximum_attendee_capacity is None
+            or registration.waiting_list_capacity is None
+        ):
+            # An unlimited capacity cannot be oversold
+            return 0
+
+        capacity = (
+            registration.maximum_attendee_capacity + registration.waiting_list_capacity
+        )
+        taken = (
+            registration.actual_attendee_count
+            + registration.actual_waiting_list_count
+            + registration.actual_reserved_seats_count
+        )
+        return max(taken - capacity, 0)
+
+    def handle(self, *args, **options):
+        registration_id = options["registration_id"]
+        if not Registration.objects.filter(pk=registration_id).exists():
+            raise CommandError(f"Registration {registration_id} does not exist.")
+
+        reservers = options["reservers"]
+        seats = options["seats"]
+        oversold_before = self._get_oversold_seats(registration_id)
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            results = list(
+                executor.map(
+                    lambda _index: self._reserve(registration_id, seats),
+                    range(reservers),
+                )
+            )
+        elapsed = time.monotonic() - start
+
+        reservation_ids = [pk for pk in results if pk is not None]
+        oversold = self._get_oversold_seats(registration_id) - oversold_before
+
+        self.stdout.write(f"Reservations attempted: {reservers}")
+        self.stdout.write(f"Reservations admitted: {len(reservation_ids)}")
+        self.stdout.write(f"Reservations rejected: {reservers - len(reservation_ids)}")
+        self.stdout.write(f"Elapsed: {elapsed:.2f} s")
+        self.stdout.write(f"Throughput: {reservers / elapsed:.1f} reservations/s")
+        self.stdout.write(f"Oversold seats: {oversold}")
+
+        if not options["keep"]:
+            SeatReservationCode.objects.filter(pk__in=reservation_ids).delete()
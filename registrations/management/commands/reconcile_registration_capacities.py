@@ -0,0 +1,72 @@
+from django.core.management import BaseCommand
+from django.db.models import F, Q
+
+from registrations.capacity import (
+    annotate_actual_counts,
+    recalculate_registration_capacities,
+)
+from registrations.models import Registration
+
+COUNTERS = ("attendee_count", "waiting_list_count", "reserved_seats_count")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the capacity counters of registrations with the actual counts of "
+        "their signups and seat reservations and reports the drift. With --fix, "
+        "recounts the capacities of the drifted registrations."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Recount the capacities of the registrations that have drifted.",
+        )
+        parser.add_argument(
+            "--registration",
+            action="append",
+            type=int,
+            dest="registration_ids",
+            help="Only check the registration with the given id. Can be repeated.",
+        )
+
+    def handle(self, *args, **options):
+        registrations = Registration.objects.all()
+        if options["registration_ids"]:
+            registrations = registrations.filter(pk__in=options["registration_ids"])
+
+        drift = Q()
+        for counter in COUNTERS:
+            drift |= ~Q(**{counter: F(f"actual_{counter}")})
+        drifted = (
+            annotate_actual_counts(registrations)
+            .filter(drift)
+            .order_by("pk")
+            .values("pk", *COUNTERS, *(f"actual_{counter}" for counter in COUNTERS))
+        )
+
+        drifted = list(drifted)
+        drifted_count = len(drifted)
+        for values in drifted:
+            differences = ", ".join(
+                f"{counter} {values[counter]} != {values[f'actual_{counter}']}"
+                for counter in COUNTERS
+                if values[counter] != values[f"actual_{counter}"]
+            )
+            self.stdout.write(f"Registration {values['pk']}: {differences}")
+
+            if options["fix"]:
+                recalculate_registration_capacities(values["pk"])
+
+        if not drifted_count:
+            self.stdout.write("No drift in the registration capacity counters.")
+        elif options["fix"]:
+            self.stdout.write(
+                f"Recounted the capacities of {drifted_count} registrations."
+            )
+        else:
+            self.stdout.write(
+                f"{drifted_count} registrations have drifted, "
+                "use --fix to recount them."
+            )
@@ -0,0 +1,151 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.utils.timezone import localtime
+
+from registrations.models import NotificationJob
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+INTERVAL = 5
+MAX_CONNECTION_RETRY_INTERVAL = 300
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends the signup notifications and registration messages queued when "
+        "REGISTRATION_NOTIFICATION_QUEUE is enabled. The emails are rendered and "
+        "sent in batches over one connection to the email backend, and the ics "
+        "files and templates are rendered once per registration and language "
+        "within a batch. The contents of the emails that fail to be sent "
+        "REGISTRATION_NOTIFICATION_MAX_ATTEMPTS times are removed. With --loop, "
+        "keeps sending the queued emails until interrupted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help=f"Number of emails sent at once. Defaults to {BATCH_SIZE}.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and send the queued emails periodically.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=INTERVAL,
+            help=f"Seconds between the runs with --loop. Defaults to {INTERVAL}.",
+        )
+
+    @staticmethod
+    def _get_retry_time(now, attempts):
+        delay = settings.REGISTRATION_NOTIFICATION_RETRY_DELAY * 2 ** (attempts - 1)
+        return now + timedelta(seconds=delay)
+
+    @classmethod
+    @transaction.atomic
+    def _send_batch(cls, batch_size):
+        now = localtime()
+        # Jobs that are being sent by another worker are left for the next batch
+        jobs = list(
+            NotificationJob.objects.filter(
+                next_attempt_time__lte=now,
+                attempts__lt=settings.REGISTRATION_NOTIFICATION_MAX_ATTEMPTS,
+            )
+            .select_related(
+                "contact_person__service_language",
+                "contact_person__signup__registration__event",
+                "contact_person__signup_group__registration__event",
+            )
+            .select_for_update(skip_locked=True, of=("self",))
+            .order_by("pk")[:batch_size]
+        )
+        if not jobs:
+            return 0, 0
+
+        # Render the jobs of the same registration and language one after another
+        jobs.sort(key=lambda job: (job.registration_id or 0, job.language, job.pk))
+        render_cache = {}
+        sent_ids = []
+        failed_jobs = []
+
+        with get_connection() as connection:
+            for job in jobs:
+                try:
+                    email = job.get_email(render_cache=render_cache)
+                    if email is None:
+                        logger.warning(
+                            f"Dropped notification job {job.pk}, "
+                            "its contact person has been deleted"
+                        )
+                    else:
+                        email.connection = connection
+                        email.send(fail_silently=False)
+                except Exception as error:
+                    logger.exception(f"Failed to send notification job {job.pk}")
+                    job.attempts += 1
+                    job.last_error = str(error)
+                    job.next_attempt_time = cls._get_retry_time(now, job.attempts)
+                    if job.attempts >= settings.REGISTRATION_NOTIFICATION_MAX_ATTEMPTS:
+                        logger.error(
+                            f"Gave up sending notification job {job.pk} after "
+                            f"{job.attempts} attempts"
+                        )
+                        job.scrub()
+                    failed_jobs.append(job)
+                else:
+                    sent_ids.append(job.pk)
+
+        NotificationJob.objects.filter(pk__in=sent_ids).delete()
+        NotificationJob.objects.bulk_update(
+            failed_jobs,
+            ["attempts", "last_error", "next_attempt_time", "options", "message"],
+        )
+        return len(sent_ids), len(failed_jobs)
+
+    def send(self, batch_size):
+        sent = failed = 0
+        while True:
+            batch_sent, batch_failed = self._send_batch(batch_size)
+            sent += batch_sent
+            failed += batch_failed
+            if batch_sent + batch_failed < batch_size:
+                return sent, failed
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        try:
+            while True:
+                try:
+                    sent, failed = self.send(options["batch_size"])
+                except OSError:
+                    # The email backend cannot be connected to, the batch has been
+                    # rolled back and the jobs are sent once the backend is back.
+                    logger.exception("Failed to connect to the email backend")
+                    if not options["loop"]:
+                        break
+                    interval = min(
+                        max(interval, 1) * 2,
+                        max(options["interval"], MAX_CONNECTION_RETRY_INTERVAL),
+                    )
+                    time.sleep(interval)
+                    continue
+
+                interval = options["interval"]
+                if sent or failed:
+                    logger.info(f"Sent {sent} notifications, {failed} failed")
+                if not options["loop"]:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
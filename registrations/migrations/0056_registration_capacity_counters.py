@@ -0,0 +1,67 @@
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def forward(apps, schema_editor):
+    Registration = apps.get_model("registrations", "Registration")  # noqa: N806
+    SignUp = apps.get_model("registrations", "SignUp")  # noqa: N806
+    SeatReservationCode = apps.get_model("registrations", "SeatReservationCode")  # noqa: N806
+
+    def count_signups(attendee_status):
+        return Coalesce(
+            Subquery(
+                SignUp.objects.filter(
+                    registration=OuterRef("pk"),
+                    attendee_status=attendee_status,
+                    deleted=False,
+                )
+                .order_by()
+                .values("registration")
+                .annotate(count=Count("pk"))
+                .values("count"),
+                output_field=IntegerField(),
+            ),
+            Value(0),
+        )
+
+    Registration.objects.update(
+        attendee_count=count_signups("attending"),
+        waiting_list_count=count_signups("waitlisted"),
+        reserved_seats_count=Coalesce(
+            Subquery(
+                SeatReservationCode.objects.filter(registration=OuterRef("pk"))
+                .order_by()
+                .values("registration")
+                .annotate(seats_sum=Sum("seats"))
+                .values("seats_sum"),
+                output_field=IntegerField(),
+            ),
+            Value(0),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("registrations", "0055_seatreservationcode_expiration"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="registration",
+            name="attendee_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="registration",
+            name="waiting_list_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="registration",
+            name="reserved_seats_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(forward, migrations.RunPython.noop),
+    ]
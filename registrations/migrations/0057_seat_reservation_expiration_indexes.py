@@ -0,0 +1,26 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Creating the indexes concurrently does not block reservations
+    atomic = False
+
+    dependencies = [
+        ("registrations", "0056_registration_capacity_counters"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="seatreservationcode",
+            index=models.Index(
+                fields=["registration", "expiration"],
+                include=["seats"],
+                name="seat_reservation_expiration",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="seatreservationcode",
+            index=models.Index(fields=["expiration"], name="seat_reservation_expired"),
+        ),
+    ]
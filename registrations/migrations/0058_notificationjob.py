@@ -0,0 +1,67 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("registrations", "0057_seat_reservation_expiration_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationJob",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("notification_type", models.CharField(max_length=64)),
+                (
+                    "language",
+                    models.CharField(blank=True, default="", max_length=10),
+                ),
+                ("options", models.JSONField(blank=True, default=dict)),
+                ("message", models.JSONField(blank=True, null=True)),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("last_error", models.TextField(blank=True, default="")),
+                ("created_time", models.DateTimeField(auto_now_add=True)),
+                (
+                    "next_attempt_time",
+                    models.DateTimeField(default=django.utils.timezone.localtime),
+                ),
+                (
+                    "contact_person",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="registrations.signupcontactperson",
+                    ),
+                ),
+                (
+                    "registration",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="registrations.registration",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["next_attempt_time"], name="notification_job_due"
+                    )
+                ],
+            },
+        ),
+    ]
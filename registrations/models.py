@@ -1,3 +1,5 @@
+import copy
+import hashlib
 import logging
 from datetime import timedelta
 from decimal import ROUND_HALF_UP, Decimal
@@ -10,14 +12,7 @@ from django.core.exceptions import ValidationError
 from django.core.mail import EmailMultiAlternatives, send_mail
 from django.core.validators import MinValueValidator
 from django.db import models, transaction
-from django.db.models import (
-    DateTimeField,
-    ExpressionWrapper,
-    F,
-    Q,
-    Sum,
-    UniqueConstraint,
-)
+from django.db.models import Q, Sum, UniqueConstraint
 from django.forms.fields import MultipleChoiceField
 from django.template.loader import render_to_string
 from django.utils import translation
@@ -31,6 +26,10 @@ from helsinki_gdpr.models import SerializableMixin
 from rest_framework import status
 
 from events.models import Event, Language, Offer, PublicationStatus
+from registrations.email_cache import (
+    get_registration_ics_content,
+    render_personalized_template,
+)
 from registrations.enums import VatPercentage
 from registrations.exceptions import (
     PriceGroupValidationError,
@@ -52,7 +51,6 @@ from registrations.notifications import (
 from registrations.utils import (
     cancel_web_store_order,
     code_validity_duration,
-    create_events_ics_file_content,
     create_or_update_web_store_merchant,
     create_web_store_api_order,
     create_web_store_product_accounting,
@@ -60,6 +58,7 @@ from registrations.utils import (
     create_web_store_refunds,
     get_checkout_url_with_lang_param,
     get_email_noreply_address,
+    get_signup_edit_url,
     get_ui_locales,
     get_web_store_order_status,
     get_web_store_payment_status,
@@ -496,6 +495,11 @@ class Registration(CreatedModifiedBaseModel):
         default=None,
     )
 
+    # Counters maintained by registrations.capacity
+    attendee_count = models.IntegerField(default=0, editable=False)
+    waiting_list_count = models.IntegerField(default=0, editable=False)
+    reserved_seats_count = models.IntegerField(default=0, editable=False)
+
     @property
     def has_payments(self):
         return (
@@ -511,37 +515,43 @@ class Registration(CreatedModifiedBaseModel):
     def publisher(self):
         return self.event.publisher
 
+    def aggregate_reserved_seats(self) -> tuple[int, int]:
+        """
+        Return the amount of seats in all of the reservations and in the
+        reservations that have not expired.
+        """
+        # Served by the (registration, expiration) index of the reservations
+        seats = self.reservations.aggregate(
+            total=Sum("seats", output_field=models.IntegerField()),
+            active=Sum(
+                "seats",
+                filter=Q(expiration__gte=localtime()),
+                output_field=models.IntegerField(),
+            ),
+        )
+        return seats["total"] or 0, seats["active"] or 0
+
+    def count_signups(self, attendee_status: str) -> int:
+        return self.signups.filter(attendee_status=attendee_status).count()
+
     @cached_property
     def reserved_seats_amount(self):
-        return (
-            # Calculate expiration time for each reservation
-            self.reservations.annotate(
-                expires_at=ExpressionWrapper(
-                    F("timestamp")
-                    + timedelta(minutes=1) * code_validity_duration(F("seats")),
-                    output_field=DateTimeField(),
-                )
-            )
-            # Filter to get all not expired reservations
-            .filter(expires_at__gte=localtime())
-            # Sum  seats of not expired reservation
-            .aggregate(seats_sum=Sum("seats", output_field=models.IntegerField()))[
-                "seats_sum"
-            ]
-            or 0
-        )
+        if settings.REGISTRATION_CAPACITY_COUNTERS:
+            # Expired reservations hold their seats until they are deleted
+            return self.reserved_seats_count
+        return self.aggregate_reserved_seats()[1]
 
     @cached_property
     def current_attendee_count(self):
-        return self.signups.filter(
-            attendee_status=SignUp.AttendeeStatus.ATTENDING
-        ).count()
+        if settings.REGISTRATION_CAPACITY_COUNTERS:
+            return self.attendee_count
+        return self.count_signups(SignUp.AttendeeStatus.ATTENDING)
 
     @cached_property
     def current_waiting_list_count(self):
-        return self.signups.filter(
-            attendee_status=SignUp.AttendeeStatus.WAITING_LIST
-        ).count()
+        if settings.REGISTRATION_CAPACITY_COUNTERS:
+            return self.waiting_list_count
+        return self.count_signups(SignUp.AttendeeStatus.WAITING_LIST)
 
     def calculate_remaining_attendee_capacity(self):
         maximum_attendee_capacity = self.maximum_attendee_capacity
@@ -640,17 +650,36 @@ class Registration(CreatedModifiedBaseModel):
             signup.delete(is_event_cancellation=is_event_cancellation)
 
     def send_event_cancellation_notifications(self, is_sub_event_cancellation=False):
-        for contact_person in SignUpContactPerson.objects.filter(
+        contact_persons = SignUpContactPerson.objects.filter(
             Q(email__isnull=False)
             & ~Q(email="")
             & (
                 Q(signup__registration_id=self.pk)
                 | Q(signup_group__registration_id=self.pk)
             )
-        ).order_by("-pk"):
+        ).order_by("-pk")
+
+        if settings.REGISTRATION_NOTIFICATION_QUEUE:
+            NotificationJob.objects.bulk_create(
+                [
+                    NotificationJob.for_contact_person(
+                        contact_person,
+                        SignUpNotificationType.EVENT_CANCELLATION,
+                        is_sub_event_cancellation=is_sub_event_cancellation,
+                    )
+                    for contact_person in contact_persons.select_related(
+                        "signup", "signup_group"
+                    )
+                ]
+            )
+            return
+
+        render_cache = {}
+        for contact_person in contact_persons:
             contact_person.send_notification(
                 SignUpNotificationType.EVENT_CANCELLATION,
                 is_sub_event_cancellation=is_sub_event_cancellation,
+                render_cache=render_cache,
             )
 
     def get_calendar_events(self):
@@ -1635,6 +1664,19 @@ class SignUp(
     def is_attending(self):
         return self.attendee_status == SignUp.AttendeeStatus.ATTENDING
 
+    @property
+    def counted_attendee_status(self):
+        """The status the signup is counted with in the capacity counters."""
+        return None if self.deleted else self.attendee_status
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the counted status for registrations.capacity
+        if "attendee_status" in field_names and "deleted" in field_names:
+            instance._counted_attendee_status = instance.counted_attendee_status
+        return instance
+
     @transaction.atomic
     def anonymize(self):
         # Allow to anonymize signup group only once
@@ -1831,18 +1873,58 @@ class SignUpContactPerson(
         return self.signup_or_signup_group.registration
 
     def get_service_language_pk(self):
-        if self.service_language:
-            return self.service_language.pk
+        if self.service_language_id:
+            return self.service_language_id
         return "fi"
 
-    def get_registration_message(self, subject, cleaned_body, plain_text_body):
+    def _get_personal_email_variables(self, access_code=None):
+        [_, linked_registrations_ui_locale] = get_ui_locales(self.service_language)
+        return {
+            "signup_edit_url": get_signup_edit_url(
+                self, linked_registrations_ui_locale, access_code=access_code
+            ),
+            "username": self.first_name,
+        }
+
+    def _with_personal_variables(self, placeholders):
+        # A copy of the contact person whose texts contain the placeholders
+        contact_person = copy.copy(self)
+        contact_person.first_name = placeholders["username"]
+        return contact_person
+
+    def get_registration_message(
+        self, subject, cleaned_body, plain_text_body, render_cache=None
+    ):
         [_, linked_registrations_ui_locale] = get_ui_locales(self.service_language)
 
         with override(linked_registrations_ui_locale):
-            email_variables = get_signup_notification_variables(self)
-            email_variables["body"] = cleaned_body
+            if render_cache is None:
+                email_variables = get_signup_notification_variables(self)
+                email_variables["body"] = cleaned_body
+                rendered_body = render_to_string(
+                    "message_to_signup.html", email_variables
+                )
+            else:
 
-            rendered_body = render_to_string("message_to_signup.html", email_variables)
+                def get_context(placeholders):
+                    email_variables = get_signup_notification_variables(
+                        self._with_personal_variables(placeholders)
+                    )
+                    email_variables.update(placeholders)
+                    email_variables["body"] = cleaned_body
+                    return email_variables
+
+                rendered_body = render_personalized_template(
+                    render_cache,
+                    (
+                        self.registration.pk,
+                        self.get_service_language_pk(),
+                        hashlib.sha256(cleaned_body.encode()).hexdigest(),
+                    ),
+                    "message_to_signup.html",
+                    get_context,
+                    self._get_personal_email_variables(),
+                )
 
         return (
             subject,
@@ -1861,6 +1943,7 @@ class SignUpContactPerson(
         payment_refunded=False,
         payment_partially_refunded=False,
         payment_cancelled=False,
+        render_cache=None,
     ):
         [_, linked_registrations_ui_locale] = get_ui_locales(self.service_language)
 
@@ -1882,24 +1965,54 @@ class SignUpContactPerson(
         else:
             raise ValueError(f"Invalid signup notification type: {notification_type}")
 
+        texts_kwargs = {
+            "is_sub_event_cancellation": is_sub_event_cancellation,
+            "payment_refunded": payment_refunded,
+            "payment_partially_refunded": payment_partially_refunded,
+            "payment_cancelled": payment_cancelled,
+        }
+
         with override(linked_registrations_ui_locale, deactivate=True):
-            email_variables = get_signup_notification_variables(
-                self, access_code=access_code
-            )
-            email_variables["texts"] = get_signup_notification_texts(
-                self,
-                notification_type,
-                is_sub_event_cancellation=is_sub_event_cancellation,
-                payment_refunded=payment_refunded,
-                payment_partially_refunded=payment_partially_refunded,
-                payment_cancelled=payment_cancelled,
-            )
-            email_variables["payment_url"] = payment_link
+            if render_cache is None:
+                email_variables = get_signup_notification_variables(
+                    self, access_code=access_code
+                )
+                email_variables["texts"] = get_signup_notification_texts(
+                    self, notification_type, **texts_kwargs
+                )
+                email_variables["payment_url"] = payment_link
 
-            rendered_body = render_to_string(
-                email_template,
-                email_variables,
-            )
+                rendered_body = render_to_string(
+                    email_template,
+                    email_variables,
+                )
+            else:
+
+                def get_context(placeholders):
+                    contact_person = self._with_personal_variables(placeholders)
+                    email_variables = get_signup_notification_variables(contact_person)
+                    email_variables.update(placeholders)
+                    email_variables["texts"] = get_signup_notification_texts(
+                        contact_person, notification_type, **texts_kwargs
+                    )
+                    return email_variables
+
+                rendered_body = render_personalized_template(
+                    render_cache,
+                    (
+                        self.registration.pk,
+                        self.get_service_language_pk(),
+                        notification_type,
+                        bool(self.signup_group_id),
+                        *texts_kwargs.values(),
+                    ),
+                    email_template,
+                    get_context,
+                    {
+                        **self._get_personal_email_variables(access_code),
+                        "payment_url": payment_link,
+                    },
+                )
 
         return (
             get_signup_notification_subject(
@@ -1912,24 +2025,28 @@ class SignUpContactPerson(
             [self.email],
         )
 
-    def send_notification(
-        self,
-        notification_type,
-        access_code=None,
-        is_sub_event_cancellation=False,
-        payment_link=None,
-        payment_refunded=False,
-        payment_partially_refunded=False,
-        payment_cancelled=False,
+    def get_registration_email(
+        self, subject, cleaned_body, plain_text_body, render_cache=None
     ):
+        subject, plain_text_body, rendered_body, from_email, recipient_list = (
+            self.get_registration_message(
+                subject, cleaned_body, plain_text_body, render_cache=render_cache
+            )
+        )
+        email = EmailMultiAlternatives(
+            subject, plain_text_body, from_email, recipient_list
+        )
+        email.attach_alternative(rendered_body, "text/html")
+        return email
+
+    def get_notification_email(self, notification_type, render_cache=None, **kwargs):
+        """
+        Render the notification email. If render_cache is given, the rendered
+        templates and ics files are stored in it to be reused for the other
+        contact persons of the same registrations.
+        """
         message = self.get_notification_message(
-            notification_type,
-            access_code=access_code,
-            is_sub_event_cancellation=is_sub_event_cancellation,
-            payment_link=payment_link,
-            payment_refunded=payment_refunded,
-            payment_partially_refunded=payment_partially_refunded,
-            payment_cancelled=payment_cancelled,
+            notification_type, render_cache=render_cache, **kwargs
         )
         rendered_body = message[1]
 
@@ -1939,19 +2056,46 @@ class SignUpContactPerson(
         if notification_type in [
             SignUpNotificationType.CONFIRMATION,
             SignUpNotificationType.CONFIRMATION_TO_WAITING_LIST,
-        ] and (events := self.registration.get_calendar_events()):
-            try:
-                ics_content = create_events_ics_file_content(
-                    events, self.get_service_language_pk()
-                )
-                email.attach(
-                    f"event_{self.registration.event.id}.ics",
-                    ics_content,
-                    "text/calendar",
-                )
-            except ValueError as error:
-                logger.error(error)
+        ] and (
+            ics_content := get_registration_ics_content(
+                self.registration, self.get_service_language_pk(), render_cache
+            )
+        ):
+            email.attach(
+                f"event_{self.registration.event.id}.ics",
+                ics_content,
+                "text/calendar",
+            )
 
+        return email
+
+    def send_notification(
+        self,
+        notification_type,
+        access_code=None,
+        is_sub_event_cancellation=False,
+        payment_link=None,
+        payment_refunded=False,
+        payment_partially_refunded=False,
+        payment_cancelled=False,
+        render_cache=None,
+    ):
+        kwargs = {
+            "access_code": access_code,
+            "is_sub_event_cancellation": is_sub_event_cancellation,
+            "payment_link": payment_link,
+            "payment_refunded": payment_refunded,
+            "payment_partially_refunded": payment_partially_refunded,
+            "payment_cancelled": payment_cancelled,
+        }
+
+        if settings.REGISTRATION_NOTIFICATION_QUEUE:
+            NotificationJob.enqueue(self, notification_type, **kwargs)
+            return
+
+        email = self.get_notification_email(
+            notification_type, render_cache=render_cache, **kwargs
+        )
         email.send(fail_silently=False)
 
     def anonymize(self):
@@ -1992,6 +2136,23 @@ class SeatReservationCode(models.Model):
                 fields=["registration", "code"], name="unique_seat_reservation"
             ),
         ]
+        indexes = [
+            # Covers the reserved seat sums and the expiry sweeps
+            models.Index(
+                fields=["registration", "expiration"],
+                include=["seats"],
+                name="seat_reservation_expiration",
+            ),
+            models.Index(fields=["expiration"], name="seat_reservation_expired"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the counted seats for registrations.capacity
+        if "seats" in field_names:
+            instance._counted_seats = instance.seats
+        return instance
 
     def save(self, *args, **kwargs):
         if not self.expiration:
@@ -2001,6 +2162,137 @@ class SeatReservationCode(models.Model):
         super().save(*args, **kwargs)
 
 
+class NotificationJob(models.Model):
+    """
+    An email to a signup contact person queued to be sent by the
+    send_notifications command. The job is created in the transaction of the
+    change that triggers the email, so the email is only sent if the change is
+    committed. The email is rendered when it's sent, unless the contact person
+    has been deleted in the same transaction.
+    """
+
+    REGISTRATION_MESSAGE = "registration_message"
+
+    contact_person = models.ForeignKey(
+        SignUpContactPerson,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    registration = models.ForeignKey(
+        Registration,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    notification_type = models.CharField(max_length=64)
+    language = models.CharField(max_length=10, blank=True, default="")
+    # The arguments of the notification. An access code is not stored, only
+    # whether one is created for the email when it's sent.
+    options = models.JSONField(default=dict, blank=True)
+    # The rendered email if the contact person was deleted when the job was queued
+    message = models.JSONField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    created_time = models.DateTimeField(auto_now_add=True)
+    next_attempt_time = models.DateTimeField(default=localtime)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["next_attempt_time"], name="notification_job_due"),
+        ]
+
+    @classmethod
+    def for_contact_person(cls, contact_person, notification_type, **options):
+        return cls(
+            contact_person=contact_person,
+            registration_id=contact_person.signup_or_signup_group.registration_id,
+            notification_type=notification_type,
+            language=contact_person.get_service_language_pk(),
+            options=options,
+        )
+
+    @classmethod
+    def enqueue(cls, contact_person, notification_type, **options):
+        job = cls.for_contact_person(
+            contact_person,
+            notification_type,
+            **{key: value for key, value in options.items() if key != "access_code"},
+        )
+        if options.get("access_code"):
+            # The access code is created again when the email is sent, so that
+            # the plain text code is never stored in the queue.
+            job.options["create_access_code"] = True
+
+        if not SignUpContactPerson.objects.filter(pk=contact_person.pk).exists():
+            # The contact person has been deleted with its signup or signup group,
+            # e.g. for a cancellation notification => render the email now.
+            email = contact_person.get_notification_email(notification_type, **options)
+            job.contact_person = None
+            job.registration = None
+            job.options = {}
+            job.message = cls._email_to_json(email)
+
+        job.save()
+        return job
+
+    @staticmethod
+    def _email_to_json(email):
+        return {
+            "subject": email.subject,
+            "body": email.body,
+            "from_email": email.from_email,
+            "to": email.to,
+            "alternatives": [list(alternative) for alternative in email.alternatives],
+            "attachments": [
+                [
+                    filename,
+                    content.decode() if isinstance(content, bytes) else content,
+                    mimetype,
+                ]
+                for filename, content, mimetype in email.attachments
+            ],
+        }
+
+    def get_email(self, render_cache=None):
+        """Render the email of the job or None if it cannot be rendered anymore."""
+        if self.message is not None:
+            email = EmailMultiAlternatives(
+                self.message["subject"],
+                self.message["body"],
+                self.message["from_email"],
+                self.message["to"],
+            )
+            for content, mimetype in self.message["alternatives"]:
+                email.attach_alternative(content, mimetype)
+            for filename, content, mimetype in self.message["attachments"]:
+                email.attach(filename, content, mimetype)
+            return email
+
+        if self.contact_person is None:
+            return None
+
+        if self.notification_type == self.REGISTRATION_MESSAGE:
+            return self.contact_person.get_registration_email(
+                render_cache=render_cache, **self.options
+            )
+
+        options = dict(self.options)
+        if options.pop("create_access_code", False):
+            options["access_code"] = self.contact_person.create_access_code()
+
+        return self.contact_person.get_notification_email(
+            self.notification_type, render_cache=render_cache, **options
+        )
+
+    def scrub(self):
+        """Remove the contents of a job that will not be sent anymore."""
+        self.options = {}
+        self.message = None
+
+
 class SignUpPriceGroup(RegistrationPriceGroupBaseModel, SoftDeletableBaseModel):
     """When a registration price group is selected when creating a signup for a registration,
     the pricing information that existed at that moment is stored into this model/table.
@@ -24,6 +24,11 @@ from linkedevents.utils import (
     get_fixed_lang_codes,
     validate_serializer_field_for_duplicates,
 )
+from registrations.capacity import (
+    batched_capacity_updates,
+    capacity_counters_enabled,
+    reserve_seats,
+)
 from registrations.exceptions import (
     ConflictException,
     WebStoreAPIError,
@@ -45,7 +50,6 @@ from registrations.models import (
     SignUpContactPerson,
     SignUpGroup,
     SignUpGroupProtectedData,
-    SignUpNotificationType,
     SignUpPayment,
     SignUpPaymentCancellation,
     SignUpPaymentRefund,
@@ -55,6 +59,12 @@ from registrations.models import (
     WebStoreMerchant,
 )
 from registrations.permissions import CanAccessRegistrationSignups
+from registrations.signups import (
+    bulk_create_signups,
+    get_attending_and_waitlisted_capacities,
+    notify_contact_person,
+    notify_signups,
+)
 from registrations.utils import (
     get_signup_create_url,
     has_allowed_substitute_user_email_domain,
@@ -66,61 +76,10 @@ from web_store.order.enums import (
 from web_store.payment.enums import WebStorePaymentWebhookEventType
 
 
-def _get_attending_and_waitlisted_capacities(
-    registration: Registration, signups_count: int
-) -> tuple[int, int]:
-    attendee_capacity = registration.maximum_attendee_capacity
-    waiting_list_capacity = registration.waiting_list_capacity
-    add_as_attending = add_as_waitlisted = signups_count
-
-    if attendee_capacity is not None:
-        already_attending = SignUp.objects.filter(
-            registration=registration, attendee_status=SignUp.AttendeeStatus.ATTENDING
-        ).count()
-        add_as_attending = attendee_capacity - already_attending
-
-    if waiting_list_capacity is not None:
-        already_waitlisted = SignUp.objects.filter(
-            registration=registration,
-            attendee_status=SignUp.AttendeeStatus.WAITING_LIST,
-        ).count()
-        add_as_waitlisted = waiting_list_capacity - already_waitlisted
-
-    return max(add_as_attending, 0), max(add_as_waitlisted, 0)
-
-
 def _get_protected_data(validated_data: dict, keys: list[str]) -> dict:
     return {key: validated_data.pop(key) for key in keys if key in validated_data}
 
 
-def _notify_contact_person(
-    contact_person, attendee_status, current_user=None, payment_link=None
-):
-    if not contact_person:
-        return
-
-    confirmation_type_mapping = {
-        SignUp.AttendeeStatus.ATTENDING: (
-            SignUpNotificationType.CONFIRMATION_WITH_PAYMENT
-            if payment_link
-            else SignUpNotificationType.CONFIRMATION
-        ),
-        SignUp.AttendeeStatus.WAITING_LIST: SignUpNotificationType.CONFIRMATION_TO_WAITING_LIST,  # noqa: E501
-    }
-
-    access_code = (
-        contact_person.create_access_code()
-        if contact_person.can_create_access_code(current_user) and not payment_link
-        else None
-    )
-
-    contact_person.send_notification(
-        confirmation_type_mapping[attendee_status],
-        access_code=access_code,
-        payment_link=payment_link,
-    )
-
-
 def _validate_registration_enrolment_times(
     registration: Registration, user: User
 ) -> None:
@@ -439,7 +398,7 @@ class SignUpSerializer(
         price_group_data = validated_data.pop("price_group", None) or {}
         create_payment = validated_data.pop("create_payment", False)
 
-        add_as_attending, add_as_waitlisted = _get_attending_and_waitlisted_capacities(
+        add_as_attending, add_as_waitlisted = get_attending_and_waitlisted_capacities(
             registration, 1
         )
 
@@ -471,7 +430,7 @@ class SignUpSerializer(
             payment = self._create_payment(signup)
 
         if signup:
-            _notify_contact_person(
+            notify_contact_person(
                 contact_person,
                 signup.attendee_status,
                 current_user=self.context["request"].user,
@@ -945,8 +904,7 @@ class RegistrationSerializer(LinkedEventsSerializer, CreatedModifiedBaseSerializ
 
         has_registration_user_access = (
             user.is_authenticated
-            and user.is_strongly_identified
-            and obj.registration_user_accesses.filter(email=user.email).exists()
+            and user.is_registration_user_access_user_of(obj.registration_user_accesses)
         )
 
         return has_registration_user_access or self.get_has_substitute_user_access(obj)
@@ -1481,110 +1439,14 @@ class CreateSignUpsSerializer(serializers.Serializer):
         return data
 
     def notify_contact_persons(self, signup_instances):
-        user = self.context["request"].user
-
-        for signup in signup_instances:
-            if signup.signup_group_id:
-                continue
-
-            contact_person = getattr(signup, "contact_person", None)
-            _notify_contact_person(
-                contact_person, signup.attendee_status, current_user=user
-            )
+        notify_signups(signup_instances, current_user=self.context["request"].user)
 
     def create_signups(self, validated_data):
-        user = self.context["request"].user
-        registration = validated_data["registration"]
-
-        add_as_attending, add_as_waitlisted = _get_attending_and_waitlisted_capacities(
-            registration, len(validated_data["signups"])
+        return bulk_create_signups(
+            validated_data["registration"],
+            validated_data["signups"],
+            self.context["request"].user,
         )
-        if not (add_as_attending or add_as_waitlisted):
-            raise DRFPermissionDenied(_("The waiting list is already full"))
-
-        capacity_by_attendee_status_map = {
-            SignUp.AttendeeStatus.ATTENDING: add_as_attending,
-            SignUp.AttendeeStatus.WAITING_LIST: add_as_waitlisted,
-        }
-
-        def check_and_set_attendee_status(cleaned_signup_data):
-            if capacity_by_attendee_status_map.get(
-                cleaned_signup_data.get("attendee_status")
-            ):
-                return
-
-            if capacity_by_attendee_status_map[SignUp.AttendeeStatus.ATTENDING]:
-                cleaned_signup_data["attendee_status"] = SignUp.AttendeeStatus.ATTENDING
-            else:
-                cleaned_signup_data["attendee_status"] = (
-                    SignUp.AttendeeStatus.WAITING_LIST
-                )
-
-        signups = []
-
-        for signup_data in validated_data["signups"]:
-            if not (
-                capacity_by_attendee_status_map[SignUp.AttendeeStatus.ATTENDING] > 0
-                or capacity_by_attendee_status_map[SignUp.AttendeeStatus.WAITING_LIST]
-                > 0
-            ):
-                break
-
-            cleaned_signup_data = signup_data.copy()
-            cleaned_signup_data["created_by"] = user
-            cleaned_signup_data["last_modified_by"] = user
-
-            check_and_set_attendee_status(cleaned_signup_data)
-            capacity_by_attendee_status_map[cleaned_signup_data["attendee_status"]] -= 1
-
-            extra_info = cleaned_signup_data.pop("extra_info", None)
-            date_of_birth = cleaned_signup_data.pop("date_of_birth", None)
-            contact_person = cleaned_signup_data.pop("contact_person", None)
-            price_group = cleaned_signup_data.pop("price_group", None)
-            cleaned_signup_data.pop("create_payment", False)
-
-            signup = SignUp(**cleaned_signup_data)
-
-            signup._extra_info = extra_info
-            signup._date_of_birth = date_of_birth
-            signup._contact_person = contact_person
-            signup._price_group = price_group
-
-            signups.append(signup)
-
-        signup_instances = SignUp.objects.bulk_create(signups)
-
-        SignUpProtectedData.objects.bulk_create(
-            [
-                SignUpProtectedData(
-                    registration=registration,
-                    signup=signup,
-                    extra_info=signup._extra_info,
-                    date_of_birth=signup._date_of_birth,
-                )
-                for signup in signups
-                if signup._extra_info or signup._date_of_birth
-            ]
-        )
-
-        SignUpContactPerson.objects.bulk_create(
-            [
-                SignUpContactPerson(signup=signup, **signup._contact_person)
-                for signup in signups
-                if signup._contact_person
-            ]
-        )
-
-        if settings.WEB_STORE_INTEGRATION_ENABLED:
-            SignUpPriceGroup.objects.bulk_create(
-                [
-                    SignUpPriceGroup(signup=signup, **signup._price_group)
-                    for signup in signups
-                    if signup._price_group
-                ]
-            )
-
-        return signup_instances
 
 
 class SignUpGroupCreateSerializer(
@@ -1648,33 +1510,37 @@ class SignUpGroupCreateSerializer(
         contact_person_data = validated_data.pop("contact_person")
         create_payment = validated_data.pop("create_payment", False)
 
-        instance = super().create(validated_data)
-        self._create_protected_data(instance, **protected_data)
+        # Update the capacities of the registration once for the whole group
+        with transaction.atomic(), batched_capacity_updates():
+            instance = super().create(validated_data)
+            self._create_protected_data(instance, **protected_data)
 
-        for signup in signups_data:
-            signup["signup_group"] = instance
-        validated_data["signups"] = signups_data
-        self.create_signups(validated_data)
+            for signup in signups_data:
+                signup["signup_group"] = instance
+            validated_data["signups"] = signups_data
+            self.create_signups(validated_data)
 
-        contact_person = self._create_contact_person(instance, **contact_person_data)
-        payment = None
+            contact_person = self._create_contact_person(
+                instance, **contact_person_data
+            )
+            payment = None
+
+            if create_payment and instance.attending_signups:
+                payment = self._create_payment(instance)
 
-        if create_payment and instance.attending_signups:
-            payment = self._create_payment(instance)
+            reservation.delete()
 
         if payment or instance.attending_signups:
             attendee_status = SignUp.AttendeeStatus.ATTENDING
         else:
             attendee_status = SignUp.AttendeeStatus.WAITING_LIST
-        _notify_contact_person(
+        notify_contact_person(
             contact_person,
             attendee_status,
             current_user=self.context["request"].user,
             payment_link=getattr(payment, "checkout_url", None),
         )
 
-        reservation.delete()
-
         return instance
 
     class Meta(SignUpBaseSerializer.Meta, WebStorePaymentBaseSerializer.Meta):
@@ -1835,11 +1701,7 @@ class SeatReservationCodeSerializer(serializers.ModelSerializer):
         if maximum_attendee_capacity is None:
             return False
 
-        attendee_count = registration.signups.filter(
-            attendee_status=SignUp.AttendeeStatus.ATTENDING
-        ).count()
-
-        return maximum_attendee_capacity - attendee_count <= 0
+        return maximum_attendee_capacity - registration.current_attendee_count <= 0
 
     def to_internal_value(self, data):
         if self.instance:
@@ -1925,13 +1787,41 @@ class SeatReservationCodeSerializer(serializers.ModelSerializer):
         _validate_registration_enrolment_times(registration, user)
 
         self._validate_registration_group_size(registration, validated_data, errors)
-        self._validate_registration_capacities(registration, validated_data, errors)
+        if not capacity_counters_enabled():
+            # With the counters, the capacity is validated when reserving the seats
+            self._validate_registration_capacities(registration, validated_data, errors)
 
         if errors:
             raise serializers.ValidationError(errors)
 
         return validated_data
 
+    def _reserve_seats(self, validated_data):
+        registration = validated_data["registration"]
+        reserved_seats = self.instance.seats if self.instance else 0
+        if reserve_seats(registration.pk, validated_data["seats"], reserved_seats):
+            return
+
+        # Explain the rejection with the counts that caused it
+        errors = {}
+        registration = Registration.objects.get(pk=registration.pk)
+        self._validate_registration_capacities(registration, validated_data, errors)
+        raise serializers.ValidationError(
+            errors or {"seats": _("Not enough seats available.")}
+        )
+
+    def create(self, validated_data):
+        if not capacity_counters_enabled():
+            return super().create(validated_data)
+
+        with transaction.atomic():
+            self._reserve_seats(validated_data)
+            instance = SeatReservationCode(**validated_data)
+            # The seats have been counted by reserving them
+            instance._counted_seats = instance.seats
+            instance.save()
+        return instance
+
     def update(self, instance, validated_data):
         old_expiration = instance.expiration
         now = localtime()
@@ -1953,7 +1843,14 @@ class SeatReservationCodeSerializer(serializers.ModelSerializer):
         elif old_expiration > grace_period:
             validated_data["expiration"] = max(new_expiration, grace_period)
 
-        return super().update(instance, validated_data)
+        if not capacity_counters_enabled():
+            return super().update(instance, validated_data)
+
+        with transaction.atomic():
+            self._reserve_seats(validated_data)
+            # The seats have been counted by reserving them
+            instance._counted_seats = validated_data["seats"]
+            return super().update(instance, validated_data)
 
     class Meta:
         fields = (
@@ -1,9 +1,17 @@
-from django.db import transaction
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from events.query_cache import invalidate_event_query_cache
+from registrations.capacity import (
+    capacity_counters_enabled,
+    count_deleted_reservation,
+    count_deleted_signup,
+    count_reservation_change,
+    count_signup_changes,
+    schedule_capacity_recalculation,
+)
 from registrations.models import Registration, SeatReservationCode, SignUp, SignUpGroup
-from registrations.utils import get_signup_create_url, move_waitlisted_to_attending
+from registrations.utils import get_signup_create_url
 
 
 def _create_signup_link_for_event(registration: Registration) -> None:
@@ -14,42 +22,6 @@ def _create_signup_link_for_event(registration: Registration) -> None:
     )
 
 
-@transaction.atomic
-def _recalculate_registration_capacities(registration_id: int) -> None:
-    registration = (
-        Registration.objects.filter(pk=registration_id).select_for_update().first()
-    )
-
-    new_remaining_attendee_capacity = (
-        registration.calculate_remaining_attendee_capacity()
-    )
-    old_remaining_attendee_capacity = registration.remaining_attendee_capacity
-    registration.remaining_attendee_capacity = new_remaining_attendee_capacity
-
-    registration.remaining_waiting_list_capacity = (
-        registration.calculate_remaining_waiting_list_capacity()
-    )
-
-    registration._capacities_recalculation_save = True
-    registration.save(
-        update_fields=[
-            "remaining_attendee_capacity",
-            "remaining_waiting_list_capacity",
-        ]
-    )
-
-    if (
-        new_remaining_attendee_capacity is not None
-        and old_remaining_attendee_capacity is not None
-    ) and new_remaining_attendee_capacity > old_remaining_attendee_capacity:
-        # Registration attendee capacity has been increased
-        # => it's possible to add more attending signups to the registration from the waiting list  # noqa: E501
-        # => add as many as possible.
-        move_waitlisted_to_attending(
-            registration, count=new_remaining_attendee_capacity
-        )
-
-
 @receiver(
     post_save,
     sender=Registration,
@@ -67,7 +39,7 @@ def registration_post_save(
         or "maximum_attendee_capacity" in update_fields
         or "waiting_list_capacity" in update_fields
     ):
-        transaction.on_commit(lambda: _recalculate_registration_capacities(instance.pk))
+        schedule_capacity_recalculation(instance.pk)
 
 
 @receiver(
@@ -76,9 +48,14 @@ def registration_post_save(
     dispatch_uid="signup_post_save",
 )
 def signup_post_save(sender: type[SignUp], instance: SignUp, **kwargs: dict) -> None:
-    transaction.on_commit(
-        lambda: _recalculate_registration_capacities(instance.registration_id)
-    )
+    created = kwargs.get("created", False)
+    if capacity_counters_enabled() and (
+        created or hasattr(instance, "_counted_attendee_status")
+    ):
+        count_signup_changes([instance], created=created)
+        return
+
+    schedule_capacity_recalculation(instance.registration_id)
 
 
 @receiver(
@@ -89,9 +66,11 @@ def signup_post_save(sender: type[SignUp], instance: SignUp, **kwargs: dict) ->
 def signup_group_post_save(
     sender: type[SignUpGroup], instance: SignUpGroup, **kwargs: dict
 ) -> None:
-    transaction.on_commit(
-        lambda: _recalculate_registration_capacities(instance.registration_id)
-    )
+    if capacity_counters_enabled():
+        # The signups of the group are counted by themselves
+        return
+
+    schedule_capacity_recalculation(instance.registration_id)
 
 
 @receiver(
@@ -100,10 +79,12 @@ def signup_group_post_save(
     dispatch_uid="signup_post_delete",
 )
 def signup_post_delete(sender: type[SignUp], instance: SignUp, **kwargs: dict) -> None:
+    if capacity_counters_enabled():
+        count_deleted_signup(instance)
+        return
+
     if getattr(instance, "_individually_deleted", False):
-        transaction.on_commit(
-            lambda: _recalculate_registration_capacities(instance.registration_id)
-        )
+        schedule_capacity_recalculation(instance.registration_id)
 
 
 @receiver(
@@ -114,9 +95,10 @@ def signup_post_delete(sender: type[SignUp], instance: SignUp, **kwargs: dict) -
 def signup_group_post_delete(
     sender: type[SignUpGroup], instance: SignUpGroup, **kwargs: dict
 ) -> None:
-    transaction.on_commit(
-        lambda: _recalculate_registration_capacities(instance.registration_id)
-    )
+    if capacity_counters_enabled():
+        return
+
+    schedule_capacity_recalculation(instance.registration_id)
 
 
 @receiver(
@@ -127,9 +109,12 @@ def signup_group_post_delete(
 def seat_reservation_post_save(
     sender: type[SeatReservationCode], instance: SeatReservationCode, **kwargs: dict
 ) -> None:
-    transaction.on_commit(
-        lambda: _recalculate_registration_capacities(instance.registration_id)
-    )
+    created = kwargs.get("created", False)
+    if capacity_counters_enabled() and (created or hasattr(instance, "_counted_seats")):
+        count_reservation_change(instance)
+        return
+
+    schedule_capacity_recalculation(instance.registration_id)
 
 
 @receiver(
@@ -140,6 +125,38 @@ def seat_reservation_post_save(
 def seat_reservation_post_delete(
     sender: type[SeatReservationCode], instance: SeatReservationCode, **kwargs: dict
 ) -> None:
-    transaction.on_commit(
-        lambda: _recalculate_registration_capacities(instance.registration_id)
-    )
+    if capacity_counters_enabled():
+        count_deleted_reservation(instance)
+        return
+
+    schedule_capacity_recalculation(instance.registration_id)
+
+
+@receiver(
+    post_save,
+    sender=Registration,
+    dispatch_uid="event_query_cache_registration_saved",
+)
+@receiver(
+    post_delete,
+    sender=Registration,
+    dispatch_uid="event_query_cache_registration_deleted",
+)
+@receiver(post_save, sender=SignUp, dispatch_uid="event_query_cache_signup_saved")
+@receiver(post_delete, sender=SignUp, dispatch_uid="event_query_cache_signup_deleted")
+@receiver(
+    post_save,
+    sender=SeatReservationCode,
+    dispatch_uid="event_query_cache_seat_reservation_saved",
+)
+@receiver(
+    post_delete,
+    sender=SeatReservationCode,
+    dispatch_uid="event_query_cache_seat_reservation_deleted",
+)
+def event_query_cache(sender, **kwargs) -> None:
+    """
+    Invalidate the cached event queries when the enrolment times, capacities or
+    signup counts the registration filters read may change.
+    """
+    invalidate_event_query_cache()
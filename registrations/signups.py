@@ -0,0 +1,238 @@
+"""
+Batch creation of signups.
+
+bulk_create_signups creates any number of signups for a registration in one
+transaction: the attendee and waiting list placement is computed once, the
+rows are inserted with bulk_create and the registration capacities are
+updated once for the whole batch. The confirmations of the created signups
+are sent together with notify_signups once the signups have been created.
+The API uses these for the signups of a reservation and of a signup group,
+and they can be used as such by admin and import tooling.
+"""
+
+from collections.abc import Iterable
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import PermissionDenied as DRFPermissionDenied
+
+from registrations.capacity import (
+    batched_capacity_updates,
+    capacity_counters_enabled,
+    count_signup_changes,
+)
+from registrations.models import (
+    Registration,
+    SignUp,
+    SignUpContactPerson,
+    SignUpNotificationType,
+    SignUpPriceGroup,
+    SignUpProtectedData,
+)
+
+
+def get_attending_and_waitlisted_capacities(
+    registration: Registration, signups_count: int
+) -> tuple[int, int]:
+    attendee_capacity = registration.maximum_attendee_capacity
+    waiting_list_capacity = registration.waiting_list_capacity
+    add_as_attending = add_as_waitlisted = signups_count
+
+    if capacity_counters_enabled():
+        # Read the counters instead of the registration instance because they
+        # may have changed since the instance was loaded.
+        already_attending, already_waitlisted = (
+            Registration.objects.filter(pk=registration.pk)
+            .values_list("attendee_count", "waiting_list_count")
+            .get()
+        )
+    else:
+        already_attending = already_waitlisted = None
+
+    if attendee_capacity is not None:
+        if already_attending is None:
+            already_attending = SignUp.objects.filter(
+                registration=registration,
+                attendee_status=SignUp.AttendeeStatus.ATTENDING,
+            ).count()
+        add_as_attending = attendee_capacity - already_attending
+
+    if waiting_list_capacity is not None:
+        if already_waitlisted is None:
+            already_waitlisted = SignUp.objects.filter(
+                registration=registration,
+                attendee_status=SignUp.AttendeeStatus.WAITING_LIST,
+            ).count()
+        add_as_waitlisted = waiting_list_capacity - already_waitlisted
+
+    return max(add_as_attending, 0), max(add_as_waitlisted, 0)
+
+
+def notify_contact_person(
+    contact_person,
+    attendee_status,
+    current_user=None,
+    payment_link=None,
+    render_cache=None,
+):
+    if not contact_person:
+        return
+
+    confirmation_type_mapping = {
+        SignUp.AttendeeStatus.ATTENDING: (
+            SignUpNotificationType.CONFIRMATION_WITH_PAYMENT
+            if payment_link
+            else SignUpNotificationType.CONFIRMATION
+        ),
+        SignUp.AttendeeStatus.WAITING_LIST: SignUpNotificationType.CONFIRMATION_TO_WAITING_LIST,  # noqa: E501
+    }
+
+    access_code = (
+        contact_person.create_access_code()
+        if contact_person.can_create_access_code(current_user) and not payment_link
+        else None
+    )
+
+    contact_person.send_notification(
+        confirmation_type_mapping[attendee_status],
+        access_code=access_code,
+        payment_link=payment_link,
+        render_cache=render_cache,
+    )
+
+
+def notify_signups(signups: Iterable[SignUp], current_user=None) -> None:
+    """
+    Send the confirmations of the created signups. Signups of a group are
+    confirmed to the contact person of the group instead.
+    """
+    render_cache = {}
+    for signup in signups:
+        if signup.signup_group_id:
+            continue
+
+        contact_person = getattr(signup, "contact_person", None)
+        notify_contact_person(
+            contact_person,
+            signup.attendee_status,
+            current_user=current_user,
+            render_cache=render_cache,
+        )
+
+
+def _place_signups(
+    registration: Registration, signups_data: list[dict]
+) -> list[tuple[dict, str]]:
+    """
+    Return the data of the signups that fit in the registration with the
+    attendee status of each. A requested status is kept while it has capacity.
+    """
+    add_as_attending, add_as_waitlisted = get_attending_and_waitlisted_capacities(
+        registration, len(signups_data)
+    )
+    if not (add_as_attending or add_as_waitlisted):
+        raise DRFPermissionDenied(_("The waiting list is already full"))
+
+    capacity_by_attendee_status_map = {
+        SignUp.AttendeeStatus.ATTENDING: add_as_attending,
+        SignUp.AttendeeStatus.WAITING_LIST: add_as_waitlisted,
+    }
+
+    placed = []
+    for signup_data in signups_data:
+        if not any(
+            capacity > 0 for capacity in capacity_by_attendee_status_map.values()
+        ):
+            break
+
+        attendee_status = signup_data.get("attendee_status")
+        if not capacity_by_attendee_status_map.get(attendee_status):
+            if capacity_by_attendee_status_map[SignUp.AttendeeStatus.ATTENDING]:
+                attendee_status = SignUp.AttendeeStatus.ATTENDING
+            else:
+                attendee_status = SignUp.AttendeeStatus.WAITING_LIST
+
+        capacity_by_attendee_status_map[attendee_status] -= 1
+        placed.append((signup_data, attendee_status))
+
+    return placed
+
+
+def bulk_create_signups(
+    registration: Registration,
+    signups_data: list[dict],
+    user=None,
+    signup_group=None,
+    notify: bool = False,
+) -> list[SignUp]:
+    """
+    Create the signups that fit in the registration in one transaction and
+    return them. The items of signups_data are validated signup data as given
+    to SignUpSerializer. Signups that do not fit in the registration are left
+    out, and a PermissionDenied is raised if none of them fit.
+    """
+    with transaction.atomic(), batched_capacity_updates():
+        signups = []
+        related_data = []
+        for signup_data, attendee_status in _place_signups(registration, signups_data):
+            cleaned_signup_data = signup_data.copy()
+            extra_info = cleaned_signup_data.pop("extra_info", None)
+            date_of_birth = cleaned_signup_data.pop("date_of_birth", None)
+            contact_person = cleaned_signup_data.pop("contact_person", None)
+            price_group = cleaned_signup_data.pop("price_group", None)
+            cleaned_signup_data.pop("create_payment", False)
+            cleaned_signup_data["registration"] = registration
+            cleaned_signup_data["attendee_status"] = attendee_status
+            cleaned_signup_data["created_by"] = user
+            cleaned_signup_data["last_modified_by"] = user
+            if signup_group is not None:
+                cleaned_signup_data["signup_group"] = signup_group
+
+            signups.append(SignUp(**cleaned_signup_data))
+            related_data.append(
+                (extra_info, date_of_birth, contact_person, price_group)
+            )
+
+        signup_instances = SignUp.objects.bulk_create(signups)
+        if capacity_counters_enabled():
+            # bulk_create does not send the post_save signals
+            count_signup_changes(signup_instances, created=True)
+
+        _bulk_create_related_data(registration, signup_instances, related_data)
+
+    if notify:
+        notify_signups(signup_instances, current_user=user)
+
+    return signup_instances
+
+
+def _bulk_create_related_data(
+    registration: Registration,
+    signups: list[SignUp],
+    related_data: list[tuple[Optional[str], Optional[str], Optional[dict], dict]],
+) -> None:
+    protected_data = []
+    contact_persons = []
+    price_groups = []
+    for signup, (extra_info, date_of_birth, contact_person, price_group) in zip(
+        signups, related_data
+    ):
+        if extra_info or date_of_birth:
+            protected_data.append(
+                SignUpProtectedData(
+                    registration=registration,
+                    signup=signup,
+                    extra_info=extra_info,
+                    date_of_birth=date_of_birth,
+                )
+            )
+        if contact_person:
+            contact_persons.append(SignUpContactPerson(signup=signup, **contact_person))
+        if price_group and settings.WEB_STORE_INTEGRATION_ENABLED:
+            price_groups.append(SignUpPriceGroup(signup=signup, **price_group))
+
+    SignUpProtectedData.objects.bulk_create(protected_data)
+    SignUpContactPerson.objects.bulk_create(contact_persons)
+    SignUpPriceGroup.objects.bulk_create(price_groups)
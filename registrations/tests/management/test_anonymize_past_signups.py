@@ -1,14 +1,19 @@
 from datetime import timedelta
+from io import StringIO
 
 import pytest
 from django.core.management import call_command
 from django.utils.timezone import localtime
 
 from events.tests.factories import EventFactory
+from registrations.models import SignUp, SignUpGroup, anonymize_replacement
 from registrations.tests.factories import (
     RegistrationFactory,
+    SignUpContactPersonFactory,
     SignUpFactory,
     SignUpGroupFactory,
+    SignUpGroupProtectedDataFactory,
+    SignUpProtectedDataFactory,
 )
 
 
@@ -102,3 +107,78 @@ def test_anonymize_if_enrolment_end_time_and_end_time_are_over_30_days_in_past()
     assert signup_group.anonymization_time is not None
     assert signup_in_group.anonymization_time is not None
     assert signup.anonymization_time is not None
+
+
+def _create_past_signups(group_count=2, signup_count=3):
+    past_event = EventFactory(end_time=localtime() - timedelta(days=31))
+    registration = RegistrationFactory(event=past_event)
+
+    signup_groups = []
+    for __ in range(group_count):
+        signup_group = SignUpGroupFactory(registration=registration)
+        SignUpFactory(registration=registration, signup_group=signup_group)
+        SignUpContactPersonFactory(signup_group=signup_group, email="group@test.com")
+        SignUpGroupProtectedDataFactory(
+            registration=registration, signup_group=signup_group, extra_info="Info"
+        )
+        signup_groups.append(signup_group)
+
+    signups = []
+    for __ in range(signup_count):
+        signup = SignUpFactory(registration=registration, first_name="Name")
+        SignUpContactPersonFactory(signup=signup, email="signup@test.com")
+        SignUpProtectedDataFactory(
+            registration=registration, signup=signup, extra_info="Info"
+        )
+        signups.append(signup)
+
+    return signup_groups, signups
+
+
+@pytest.mark.django_db
+def test_anonymize_past_signups_in_batches():
+    signup_groups, signups = _create_past_signups()
+
+    call_command("anonymize_past_signups", batch_size=2)
+
+    for signup_group in signup_groups:
+        signup_group.refresh_from_db()
+        assert signup_group.anonymization_time is not None
+        assert signup_group.contact_person.email == anonymize_replacement
+        assert signup_group.protected_data.extra_info is None
+        assert signup_group.signups.get().anonymization_time is not None
+
+    for signup in signups:
+        signup.refresh_from_db()
+        assert signup.anonymization_time is not None
+        assert signup.first_name == anonymize_replacement
+        assert signup.contact_person.email == anonymize_replacement
+        assert signup.protected_data.extra_info is None
+
+
+@pytest.mark.django_db
+def test_anonymize_past_signups_continues_from_anonymized_signups():
+    __, signups = _create_past_signups(group_count=0)
+    signups[0].anonymize()
+    anonymization_time = signups[0].anonymization_time
+
+    out = StringIO()
+    call_command("anonymize_past_signups", batch_size=2, stdout=out)
+
+    signups[0].refresh_from_db()
+    assert signups[0].anonymization_time == anonymization_time
+    assert SignUp.objects.filter(anonymization_time__isnull=True).count() == 0
+    assert "2 signups anonymized" in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_anonymize_past_signups_dry_run():
+    _create_past_signups()
+
+    out = StringIO()
+    call_command("anonymize_past_signups", batch_size=2, dry_run=True, stdout=out)
+
+    assert SignUpGroup.objects.filter(anonymization_time__isnull=False).count() == 0
+    assert SignUp.objects.filter(anonymization_time__isnull=False).count() == 0
+    assert "2 signup groups with 2 signups to anonymize" in out.getvalue()
+    assert "3 signups to anonymize" in out.getvalue()
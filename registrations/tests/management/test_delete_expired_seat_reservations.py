@@ -1,5 +1,6 @@
 from collections import Counter
 from datetime import timedelta
+from unittest.mock import patch
 
 import freezegun
 import pytest
@@ -11,7 +12,6 @@ from registrations.tests.factories import (
     RegistrationFactory,
     SeatReservationCodeFactory,
 )
-from registrations.utils import code_validity_duration
 
 
 @freezegun.freeze_time("2024-02-16 16:45:00+02:00")
@@ -23,16 +23,16 @@ def test_delete_expired_seatreservations(django_capture_on_commit_callbacks):
         )
 
     now = localtime()
-    expired_timestamp = now - timedelta(minutes=code_validity_duration(1) + 1)
-    expired_timestamp2 = now - timedelta(minutes=code_validity_duration(2) + 1)
-    exactly_expiration_threshold = now - timedelta(minutes=code_validity_duration(1))
+    expired_expiration = now - timedelta(minutes=1)
+    expired_expiration2 = now - timedelta(minutes=2)
+    exactly_expiration_threshold = now
 
     with django_capture_on_commit_callbacks(execute=True):
         expired_reservation = SeatReservationCodeFactory(
             registration=registration, seats=1
         )
         SeatReservationCode.objects.filter(pk=expired_reservation.pk).update(
-            timestamp=expired_timestamp
+            expiration=expired_expiration
         )
 
         non_expired_reservation = SeatReservationCodeFactory(
@@ -42,14 +42,14 @@ def test_delete_expired_seatreservations(django_capture_on_commit_callbacks):
             registration=registration, seats=1
         )
         SeatReservationCode.objects.filter(pk=non_expired_reservation2.pk).update(
-            timestamp=exactly_expiration_threshold
+            expiration=exactly_expiration_threshold
         )
 
         expired_reservation2 = SeatReservationCodeFactory(
             registration=registration, seats=2
         )
         SeatReservationCode.objects.filter(pk=expired_reservation2.pk).update(
-            timestamp=expired_timestamp2
+            expiration=expired_expiration2
         )
 
     registration.refresh_from_db()
@@ -69,3 +69,41 @@ def test_delete_expired_seatreservations(django_capture_on_commit_callbacks):
     registration.refresh_from_db()
     assert registration.remaining_attendee_capacity == 3
     assert registration.remaining_waiting_list_capacity == 5
+
+
+@pytest.mark.django_db
+def test_delete_expired_seatreservations_in_batches(settings):
+    settings.REGISTRATION_CAPACITY_COUNTERS = True
+    registration = RegistrationFactory(maximum_attendee_capacity=10)
+    reservations = SeatReservationCodeFactory.create_batch(
+        5, registration=registration, seats=1
+    )
+    SeatReservationCode.objects.filter(
+        pk__in=[reservation.pk for reservation in reservations[:4]]
+    ).update(expiration=localtime() - timedelta(minutes=1))
+
+    call_command("delete_expired_seat_reservations", "--batch-size=3")
+
+    assert list(SeatReservationCode.objects.values_list("pk", flat=True)) == [
+        reservations[4].pk
+    ]
+    registration.refresh_from_db()
+    assert registration.reserved_seats_count == 1
+    assert registration.remaining_attendee_capacity == 9
+
+
+@pytest.mark.django_db
+def test_delete_expired_seatreservations_loop():
+    reservation = SeatReservationCodeFactory(seats=1)
+    SeatReservationCode.objects.filter(pk=reservation.pk).update(
+        expiration=localtime() - timedelta(minutes=1)
+    )
+
+    with patch(
+        "registrations.management.commands.delete_expired_seat_reservations.time.sleep",
+        side_effect=KeyboardInterrupt,
+    ) as mocked_sleep:
+        call_command("delete_expired_seat_reservations", "--loop", "--interval=5")
+
+    mocked_sleep.assert_called_once_with(5)
+    assert SeatReservationCode.objects.count() == 0
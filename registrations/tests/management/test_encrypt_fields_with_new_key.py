@@ -1,11 +1,15 @@
+from datetime import date
+from io import StringIO
+
 import pytest
-from django.core.management import call_command
+from django.core.management import CommandError, call_command
 
 from registrations.models import SignUpGroupProtectedData, SignUpProtectedData
 from registrations.tests.factories import (
     SignUpFactory,
     SignUpGroupFactory,
     SignUpGroupProtectedDataFactory,
+    SignUpProtectedDataFactory,
 )
 
 _ENCRYPTION_KEY = "c87a6669a1ded2834f1dfd0830d86ef6cdd20372ac83e8c7c23feffe87e6a051"
@@ -78,3 +82,103 @@ def test_encrypt_fields_with_new_key(settings):
 
     # Test that fields have been encrypted with the new key
     assert_encrypted_with_keys(new_keys)
+
+
+def _reset_field_keys():
+    for model, field_name in (
+        (SignUpGroupProtectedData, "extra_info"),
+        (SignUpProtectedData, "extra_info"),
+        (SignUpProtectedData, "date_of_birth"),
+    ):
+        model._meta.get_field(field_name).__dict__.pop("keys", None)
+
+
+@pytest.fixture
+def protected_data_with_old_key(settings):
+    settings.FIELD_ENCRYPTION_KEYS = (_ENCRYPTION_KEY,)
+    _reset_field_keys()
+
+    signup_group = SignUpGroupFactory()
+    SignUpGroupProtectedDataFactory(
+        registration=signup_group.registration,
+        signup_group=signup_group,
+        extra_info="Signup group extra info",
+    )
+    for index in range(3):
+        SignUpProtectedDataFactory(
+            registration=signup_group.registration,
+            signup=SignUpFactory(registration=signup_group.registration),
+            extra_info=f"Signup extra info {index}",
+            date_of_birth=date(2023, 1, index + 1),
+        )
+    SignUpProtectedDataFactory(
+        registration=signup_group.registration,
+        signup=SignUpFactory(registration=signup_group.registration),
+        extra_info=None,
+        date_of_birth=None,
+    )
+
+    yield
+
+    _reset_field_keys()
+
+
+@pytest.mark.django_db
+def test_encrypt_fields_with_new_key_in_batches(settings, protected_data_with_old_key):
+    settings.FIELD_ENCRYPTION_KEYS = (_ENCRYPTION_KEY2, _ENCRYPTION_KEY)
+    _reset_field_keys()
+
+    out = StringIO()
+    call_command("encrypt_fields_with_new_key", batch_size=2, workers=1, stdout=out)
+
+    assert "3 of 4 SignUpProtectedData rows re-encrypted" in out.getvalue()
+
+    # The data can be read without the old key
+    settings.FIELD_ENCRYPTION_KEYS = (_ENCRYPTION_KEY2,)
+    _reset_field_keys()
+    assert SignUpGroupProtectedData.objects.get().extra_info == (
+        "Signup group extra info"
+    )
+    assert [
+        (protected_data.extra_info, protected_data.date_of_birth)
+        for protected_data in SignUpProtectedData.objects.order_by("pk")
+    ] == [
+        ("Signup extra info 0", date(2023, 1, 1)),
+        ("Signup extra info 1", date(2023, 1, 2)),
+        ("Signup extra info 2", date(2023, 1, 3)),
+        (None, None),
+    ]
+
+
+@pytest.mark.django_db
+def test_encrypt_fields_with_new_key_skips_rows_with_new_key(
+    settings, protected_data_with_old_key
+):
+    settings.FIELD_ENCRYPTION_KEYS = (_ENCRYPTION_KEY2, _ENCRYPTION_KEY)
+    _reset_field_keys()
+    call_command("encrypt_fields_with_new_key", workers=1, stdout=StringIO())
+
+    out = StringIO()
+    call_command("encrypt_fields_with_new_key", workers=1, stdout=out)
+
+    assert "0 of 4 SignUpProtectedData rows re-encrypted" in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_verify_fields_encrypted_with_new_key(settings, protected_data_with_old_key):
+    settings.FIELD_ENCRYPTION_KEYS = (_ENCRYPTION_KEY2, _ENCRYPTION_KEY)
+    _reset_field_keys()
+
+    with pytest.raises(CommandError):
+        call_command(
+            "encrypt_fields_with_new_key",
+            verify_only=True,
+            workers=1,
+            stdout=StringIO(),
+            stderr=StringIO(),
+        )
+
+    call_command("encrypt_fields_with_new_key", workers=1, stdout=StringIO())
+    call_command(
+        "encrypt_fields_with_new_key", verify_only=True, workers=1, stdout=StringIO()
+    )
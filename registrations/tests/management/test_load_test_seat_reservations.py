@@ -0,0 +1,32 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from registrations.models import Registration, SeatReservationCode
+from registrations.tests.factories import RegistrationFactory
+
+
+@pytest.mark.django_db(transaction=True)
+def test_load_test_seat_reservations_does_not_oversell(settings):
+    settings.REGISTRATION_CAPACITY_COUNTERS = True
+    registration = RegistrationFactory(
+        maximum_attendee_capacity=5, waiting_list_capacity=0
+    )
+
+    out = StringIO()
+    call_command(
+        "load_test_seat_reservations",
+        registration.pk,
+        "--reservers=20",
+        "--concurrency=5",
+        stdout=out,
+    )
+
+    output = out.getvalue()
+    assert "Reservations attempted: 20" in output
+    assert "Reservations admitted: 5" in output
+    assert "Reservations rejected: 15" in output
+    assert "Oversold seats: 0" in output
+    assert SeatReservationCode.objects.count() == 0
+    assert Registration.objects.get(pk=registration.pk).reserved_seats_count == 0
@@ -0,0 +1,60 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from registrations.models import Registration, SignUp
+from registrations.tests.factories import (
+    RegistrationFactory,
+    SeatReservationCodeFactory,
+    SignUpFactory,
+)
+
+
+@pytest.mark.django_db
+def test_reconcile_registration_capacities_reports_drift(settings):
+    settings.REGISTRATION_CAPACITY_COUNTERS = True
+    registration = RegistrationFactory(maximum_attendee_capacity=5)
+    SignUpFactory(registration=registration)
+    SeatReservationCodeFactory(registration=registration, seats=2)
+    in_sync_registration = RegistrationFactory(maximum_attendee_capacity=5)
+    SignUpFactory(registration=in_sync_registration)
+
+    # Updates bypass the signals
+    Registration.objects.filter(pk=registration.pk).update(attendee_count=3)
+    SignUp.objects.filter(registration=registration).update(
+        attendee_status=SignUp.AttendeeStatus.WAITING_LIST
+    )
+
+    out = StringIO()
+    call_command("reconcile_registration_capacities", stdout=out)
+
+    assert out.getvalue().splitlines() == [
+        f"Registration {registration.pk}: attendee_count 3 != 0, "
+        "waiting_list_count 0 != 1",
+        "1 registrations have drifted, use --fix to recount them.",
+    ]
+    registration.refresh_from_db()
+    assert registration.attendee_count == 3
+
+
+@pytest.mark.django_db
+def test_reconcile_registration_capacities_fix(settings):
+    settings.REGISTRATION_CAPACITY_COUNTERS = True
+    registration = RegistrationFactory(maximum_attendee_capacity=5)
+    SignUpFactory(registration=registration)
+    Registration.objects.filter(pk=registration.pk).update(
+        attendee_count=3, remaining_attendee_capacity=2
+    )
+
+    out = StringIO()
+    call_command("reconcile_registration_capacities", "--fix", stdout=out)
+
+    assert "Recounted the capacities of 1 registrations." in out.getvalue()
+    registration.refresh_from_db()
+    assert registration.attendee_count == 1
+    assert registration.remaining_attendee_capacity == 4
+
+    out = StringIO()
+    call_command("reconcile_registration_capacities", stdout=out)
+    assert out.getvalue() == "No drift in the registration capacity counters.\n"
@@ -0,0 +1,231 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+import freezegun
+import pytest
+from django.core import mail
+from django.core.management import call_command
+from django.utils.timezone import localtime
+
+from registrations.models import (
+    NotificationJob,
+    SignUpContactPerson,
+    SignUpNotificationType,
+)
+from registrations.tests.factories import (
+    RegistrationFactory,
+    SignUpContactPersonFactory,
+    SignUpFactory,
+)
+
+
+@pytest.fixture
+def notification_queue(settings):
+    settings.REGISTRATION_NOTIFICATION_QUEUE = True
+
+
+def _create_contact_person(registration=None, email="test@test.com"):
+    signup_kwargs = {"registration": registration} if registration else {}
+    return SignUpContactPersonFactory(
+        signup=SignUpFactory(**signup_kwargs), email=email
+    )
+
+
+@pytest.mark.django_db
+def test_queued_notification_is_sent_by_the_command(notification_queue):
+    contact_person = _create_contact_person()
+
+    contact_person.send_notification(SignUpNotificationType.CONFIRMATION)
+
+    assert len(mail.outbox) == 0
+    job = NotificationJob.objects.get()
+    assert job.contact_person_id == contact_person.pk
+    assert job.registration_id == contact_person.signup.registration_id
+
+    call_command("send_notifications")
+
+    assert len(mail.outbox) == 1
+    assert mail.outbox[0].to == [contact_person.email]
+    assert NotificationJob.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_access_code_is_created_when_queued_notification_is_sent(
+    notification_queue,
+):
+    contact_person = _create_contact_person()
+
+    contact_person.send_notification(
+        SignUpNotificationType.CONFIRMATION, access_code="test-access-code"
+    )
+
+    job = NotificationJob.objects.get()
+    assert "access_code" not in job.options
+    assert job.options["create_access_code"] is True
+
+    with patch.object(
+        SignUpContactPerson, "create_access_code", return_value="new-access-code"
+    ) as mocked_create_access_code:
+        call_command("send_notifications")
+
+    mocked_create_access_code.assert_called_once()
+    assert len(mail.outbox) == 1
+    assert "new-access-code" in str(mail.outbox[0].alternatives[0])
+    assert "test-access-code" not in str(mail.outbox[0].alternatives[0])
+    assert NotificationJob.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_notification_of_deleted_contact_person_is_rendered_when_queued(
+    notification_queue,
+):
+    contact_person = _create_contact_person()
+    signup = contact_person.signup
+    signup._individually_deleted = True
+
+    signup.delete()
+
+    job = NotificationJob.objects.get()
+    assert job.contact_person_id is None
+    assert job.message["to"] == [contact_person.email]
+    assert job.options == {}
+
+    call_command("send_notifications")
+
+    assert len(mail.outbox) == 1
+    assert mail.outbox[0].subject == job.message["subject"]
+    assert mail.outbox[0].alternatives == [tuple(job.message["alternatives"][0])]
+    assert NotificationJob.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_ics_file_is_rendered_once_per_registration(notification_queue):
+    registration = RegistrationFactory()
+    for index in range(3):
+        contact_person = _create_contact_person(
+            registration, email=f"test{index}@test.com"
+        )
+        contact_person.send_notification(SignUpNotificationType.CONFIRMATION)
+
+    with patch(
+        "registrations.email_cache.create_events_ics_file_content",
+        return_value=b"BEGIN:VCALENDAR",
+    ) as mocked_create_ics:
+        call_command("send_notifications")
+
+    mocked_create_ics.assert_called_once()
+    assert len(mail.outbox) == 3
+    for email in mail.outbox:
+        assert email.attachments[0][1] == "BEGIN:VCALENDAR"
+
+
+@pytest.mark.django_db
+def test_event_cancellation_notifications_are_queued(notification_queue):
+    registration = RegistrationFactory()
+    contact_persons = [
+        _create_contact_person(registration, email=f"test{index}@test.com")
+        for index in range(3)
+    ]
+
+    registration.send_event_cancellation_notifications(is_sub_event_cancellation=True)
+
+    assert len(mail.outbox) == 0
+    jobs = NotificationJob.objects.order_by("pk")
+    assert [job.contact_person_id for job in jobs] == [
+        contact_person.pk for contact_person in reversed(contact_persons)
+    ]
+    assert all(job.options == {"is_sub_event_cancellation": True} for job in jobs)
+
+    call_command("send_notifications", batch_size=2)
+
+    assert len(mail.outbox) == 3
+    assert NotificationJob.objects.count() == 0
+
+
+@freezegun.freeze_time("2024-02-16 16:45:00+02:00")
+@pytest.mark.django_db
+def test_failed_notification_is_retried_later(notification_queue, settings):
+    settings.REGISTRATION_NOTIFICATION_RETRY_DELAY = 60
+    contact_person = _create_contact_person()
+    contact_person.send_notification(SignUpNotificationType.CONFIRMATION)
+
+    with patch(
+        "django.core.mail.EmailMessage.send", side_effect=ConnectionError("Failed")
+    ):
+        call_command("send_notifications")
+
+    job = NotificationJob.objects.get()
+    assert job.attempts == 1
+    assert job.last_error == "Failed"
+    assert job.next_attempt_time == localtime() + timedelta(seconds=60)
+
+    call_command("send_notifications")
+    assert len(mail.outbox) == 0
+
+    with freezegun.freeze_time(job.next_attempt_time):
+        call_command("send_notifications")
+
+    assert len(mail.outbox) == 1
+    assert NotificationJob.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_notification_is_not_retried_after_max_attempts(notification_queue, settings):
+    settings.REGISTRATION_NOTIFICATION_MAX_ATTEMPTS = 3
+    contact_person = _create_contact_person()
+    contact_person.send_notification(SignUpNotificationType.CONFIRMATION)
+    NotificationJob.objects.update(attempts=3)
+
+    call_command("send_notifications")
+
+    assert len(mail.outbox) == 0
+    assert NotificationJob.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_notification_contents_are_removed_after_max_attempts(
+    notification_queue, settings
+):
+    settings.REGISTRATION_NOTIFICATION_MAX_ATTEMPTS = 2
+    contact_person = _create_contact_person()
+    contact_person.send_notification(
+        SignUpNotificationType.CONFIRMATION, access_code="test-access-code"
+    )
+    NotificationJob.objects.update(
+        attempts=1, message={"subject": "Test", "to": [contact_person.email]}
+    )
+
+    with patch(
+        "django.core.mail.EmailMessage.send", side_effect=ConnectionError("Failed")
+    ):
+        call_command("send_notifications")
+
+    job = NotificationJob.objects.get()
+    assert job.attempts == 2
+    assert job.last_error == "Failed"
+    assert job.options == {}
+    assert job.message is None
+
+
+@pytest.mark.django_db
+def test_email_backend_connection_failure_is_retried(notification_queue):
+    contact_person = _create_contact_person()
+    contact_person.send_notification(SignUpNotificationType.CONFIRMATION)
+
+    with (
+        patch(
+            "django.core.mail.backends.locmem.EmailBackend.open",
+            side_effect=[ConnectionRefusedError("Refused"), None],
+        ),
+        patch(
+            "registrations.management.commands.send_notifications.time.sleep",
+            side_effect=[None, KeyboardInterrupt],
+        ) as mocked_sleep,
+    ):
+        call_command("send_notifications", loop=True, interval=1)
+
+    # The worker backs off after the failure and keeps running
+    assert mocked_sleep.call_args_list[0].args == (2,)
+    assert mocked_sleep.call_args_list[1].args == (1,)
+    assert len(mail.outbox) == 1
+    assert NotificationJob.objects.count() == 0
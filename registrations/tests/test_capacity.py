@@ -0,0 +1,203 @@
+from unittest.mock import patch
+
+import pytest
+
+from registrations.capacity import batched_capacity_updates, reserve_seats
+from registrations.models import Registration, SeatReservationCode, SignUp
+from registrations.tests.factories import (
+    RegistrationFactory,
+    SeatReservationCodeFactory,
+    SignUpFactory,
+    SignUpGroupFactory,
+)
+
+
+@pytest.fixture
+def capacity_counters(settings):
+    settings.REGISTRATION_CAPACITY_COUNTERS = True
+
+
+def _assert_counts(registration, attending, waitlisted, reserved):
+    registration.refresh_from_db()
+    assert registration.attendee_count == attending
+    assert registration.waiting_list_count == waitlisted
+    assert registration.reserved_seats_count == reserved
+
+
+@pytest.mark.django_db
+def test_counters_follow_signup_changes(
+    capacity_counters, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        registration = RegistrationFactory(
+            maximum_attendee_capacity=2, waiting_list_capacity=2
+        )
+
+    attending = SignUpFactory(registration=registration)
+    waitlisted = SignUpFactory(
+        registration=registration, attendee_status=SignUp.AttendeeStatus.WAITING_LIST
+    )
+    _assert_counts(registration, attending=1, waitlisted=1, reserved=0)
+    assert registration.remaining_attendee_capacity == 1
+    assert registration.remaining_waiting_list_capacity == 1
+
+    waitlisted.attendee_status = SignUp.AttendeeStatus.ATTENDING
+    waitlisted.save(update_fields=["attendee_status"])
+    # Saving again without changes does not count the signup twice
+    waitlisted.save()
+    _assert_counts(registration, attending=2, waitlisted=0, reserved=0)
+    assert registration.remaining_attendee_capacity == 0
+    assert registration.remaining_waiting_list_capacity == 2
+
+    SignUp.objects.get(pk=attending.pk).soft_delete()
+    _assert_counts(registration, attending=1, waitlisted=0, reserved=0)
+
+    SignUp.all_objects.get(pk=attending.pk).undelete()
+    _assert_counts(registration, attending=2, waitlisted=0, reserved=0)
+
+    SignUp.objects.get(pk=waitlisted.pk).delete()
+    _assert_counts(registration, attending=1, waitlisted=0, reserved=0)
+    assert registration.remaining_attendee_capacity == 1
+
+
+@pytest.mark.django_db
+def test_counters_follow_seat_reservations(capacity_counters):
+    registration = RegistrationFactory(
+        maximum_attendee_capacity=2, waiting_list_capacity=3
+    )
+
+    reservation = SeatReservationCodeFactory(registration=registration, seats=3)
+    _assert_counts(registration, attending=0, waitlisted=0, reserved=3)
+    assert registration.remaining_attendee_capacity == 0
+    assert registration.remaining_waiting_list_capacity == 2
+
+    reservation = SeatReservationCode.objects.get(pk=reservation.pk)
+    reservation.seats = 1
+    reservation.save(update_fields=["seats"])
+    _assert_counts(registration, attending=0, waitlisted=0, reserved=1)
+    assert registration.remaining_attendee_capacity == 1
+    assert registration.remaining_waiting_list_capacity == 3
+
+    SeatReservationCode.objects.filter(pk=reservation.pk).delete()
+    _assert_counts(registration, attending=0, waitlisted=0, reserved=0)
+    assert registration.remaining_attendee_capacity == 2
+
+
+@pytest.mark.django_db
+def test_counters_do_not_recount_signups(
+    capacity_counters, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    registration = RegistrationFactory(maximum_attendee_capacity=10)
+    signup_group = SignUpGroupFactory(registration=registration)
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        # Only the insert and the counter update
+        with django_assert_num_queries(2):
+            SignUpFactory(registration=registration, signup_group=signup_group)
+
+    assert callbacks == []
+    registration = Registration.objects.get(pk=registration.pk)
+    assert registration.remaining_attendee_capacity == 9
+    with django_assert_num_queries(0):
+        assert registration.current_attendee_count == 1
+
+
+@pytest.mark.django_db
+def test_freed_seats_are_filled_from_waiting_list(
+    capacity_counters, django_capture_on_commit_callbacks
+):
+    registration = RegistrationFactory(
+        maximum_attendee_capacity=2, waiting_list_capacity=2
+    )
+    reservation = SeatReservationCodeFactory(registration=registration, seats=2)
+    waitlisted = SignUpFactory(
+        registration=registration, attendee_status=SignUp.AttendeeStatus.WAITING_LIST
+    )
+
+    with django_capture_on_commit_callbacks(execute=True):
+        reservation.delete()
+
+    waitlisted.refresh_from_db()
+    assert waitlisted.attendee_status == SignUp.AttendeeStatus.ATTENDING
+    _assert_counts(registration, attending=1, waitlisted=0, reserved=0)
+    assert registration.remaining_attendee_capacity == 1
+
+
+@pytest.mark.django_db
+def test_reserve_seats_admits_within_capacity(capacity_counters):
+    registration = RegistrationFactory(
+        maximum_attendee_capacity=3, waiting_list_capacity=1
+    )
+
+    assert reserve_seats(registration.pk, 2) is True
+    assert reserve_seats(registration.pk, 2) is False
+    # Growing an existing reservation only needs capacity for the added seats
+    assert reserve_seats(registration.pk, 3, reserved_seats=2) is True
+    _assert_counts(registration, attending=0, waitlisted=0, reserved=3)
+
+    # The waiting list is used once the attendee capacity is full
+    SignUpFactory.create_batch(3, registration=registration)
+    assert reserve_seats(registration.pk, 0, reserved_seats=3) is True
+    assert reserve_seats(registration.pk, 1) is True
+    assert reserve_seats(registration.pk, 1) is False
+    _assert_counts(registration, attending=3, waitlisted=0, reserved=1)
+    assert registration.remaining_attendee_capacity == 0
+    assert registration.remaining_waiting_list_capacity == 0
+
+
+@pytest.mark.django_db
+def test_batched_capacity_updates_apply_counter_deltas_once(capacity_counters):
+    registration = RegistrationFactory(
+        maximum_attendee_capacity=5, waiting_list_capacity=5
+    )
+    reservation = SeatReservationCodeFactory(registration=registration, seats=2)
+
+    with batched_capacity_updates():
+        SignUpFactory(registration=registration)
+        SignUpFactory(registration=registration)
+        SeatReservationCode.objects.filter(pk=reservation.pk).delete()
+
+        # The counters are updated when the block exits
+        _assert_counts(registration, attending=0, waitlisted=0, reserved=2)
+
+    _assert_counts(registration, attending=2, waitlisted=0, reserved=0)
+    assert registration.remaining_attendee_capacity == 3
+
+
+@pytest.mark.django_db
+def test_batched_capacity_updates_recalculate_once(
+    django_capture_on_commit_callbacks,
+):
+    registration = RegistrationFactory(
+        maximum_attendee_capacity=5, waiting_list_capacity=5
+    )
+
+    with patch(
+        "registrations.capacity.recalculate_registration_capacities"
+    ) as mocked_recalculate:
+        with django_capture_on_commit_callbacks(execute=True):
+            with batched_capacity_updates():
+                SignUpFactory(registration=registration)
+                SignUpFactory(registration=registration)
+                SeatReservationCodeFactory(registration=registration, seats=1)
+
+    mocked_recalculate.assert_called_once_with(registration.pk)
+
+
+@pytest.mark.django_db
+def test_signup_using_reserved_seats_does_not_fill_from_waiting_list(
+    capacity_counters, django_capture_on_commit_callbacks
+):
+    registration = RegistrationFactory(
+        maximum_attendee_capacity=2, waiting_list_capacity=2
+    )
+    reservation = SeatReservationCodeFactory(registration=registration, seats=2)
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        with batched_capacity_updates():
+            SignUpFactory.create_batch(2, registration=registration)
+            SeatReservationCode.objects.filter(pk=reservation.pk).delete()
+
+    # The seats moved from the reservation to the signups, none were freed
+    assert callbacks == []
+    _assert_counts(registration, attending=2, waitlisted=0, reserved=0)
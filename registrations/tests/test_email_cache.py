@@ -0,0 +1,137 @@
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import cache
+
+from events.tests.factories import EventFactory
+from registrations.email_cache import get_registration_ics_content
+from registrations.models import SignUpNotificationType
+from registrations.tests.factories import (
+    RegistrationFactory,
+    SignUpContactPersonFactory,
+    SignUpFactory,
+    SignUpGroupFactory,
+)
+
+
+@pytest.fixture
+def contact_persons():
+    registration = RegistrationFactory()
+    return [
+        SignUpContactPersonFactory(
+            signup=SignUpFactory(registration=registration),
+            first_name="<b>Tom & Jerry</b>",
+            email="tom@test.com",
+        ),
+        SignUpContactPersonFactory(
+            signup=SignUpFactory(registration=registration),
+            first_name="Mickey",
+            email="mickey@test.com",
+        ),
+        SignUpContactPersonFactory(
+            signup=SignUpFactory(registration=registration),
+            first_name="",
+            email="nameless@test.com",
+        ),
+        SignUpContactPersonFactory(
+            signup_group=SignUpGroupFactory(registration=registration),
+            first_name="Group",
+            email="group@test.com",
+        ),
+    ]
+
+
+@pytest.mark.parametrize(
+    "notification_type,kwargs",
+    [
+        (SignUpNotificationType.CONFIRMATION, {"access_code": "a&b=c"}),
+        (SignUpNotificationType.CONFIRMATION, {}),
+        (SignUpNotificationType.CONFIRMATION_TO_WAITING_LIST, {}),
+        (
+            SignUpNotificationType.CONFIRMATION_WITH_PAYMENT,
+            {"payment_link": "https://checkout.dev/?order=1&lang=fi"},
+        ),
+        (SignUpNotificationType.TRANSFERRED_AS_PARTICIPANT, {}),
+        (SignUpNotificationType.CANCELLATION, {"payment_refunded": True}),
+        (SignUpNotificationType.EVENT_CANCELLATION, {}),
+    ],
+)
+@pytest.mark.django_db
+def test_cached_notification_templates_render_as_uncached(
+    contact_persons, notification_type, kwargs
+):
+    render_cache = {}
+
+    for contact_person in contact_persons:
+        cached = contact_person.get_notification_message(
+            notification_type, render_cache=render_cache, **kwargs
+        )
+        uncached = contact_person.get_notification_message(notification_type, **kwargs)
+
+        assert cached == uncached
+
+
+@pytest.mark.django_db
+def test_cached_registration_message_templates_render_as_uncached(contact_persons):
+    render_cache = {}
+
+    for contact_person in contact_persons:
+        for body in ("First <b>message</b>", "Second message"):
+            cached = contact_person.get_registration_message(
+                "Subject", body, body, render_cache=render_cache
+            )
+            uncached = contact_person.get_registration_message("Subject", body, body)
+
+            assert cached == uncached
+
+
+@pytest.mark.django_db
+def test_notification_template_is_rendered_once_per_registration(contact_persons):
+    render_cache = {}
+
+    with patch(
+        "registrations.email_cache.render_to_string", return_value=""
+    ) as mocked_render:
+        for contact_person in contact_persons[:2]:
+            contact_person.get_notification_message(
+                SignUpNotificationType.CONFIRMATION, render_cache=render_cache
+            )
+
+    mocked_render.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_ics_content_is_cached_until_event_changes(settings):
+    settings.REGISTRATION_ICS_CACHE_TIMEOUT = 60
+    cache.clear()
+    registration = RegistrationFactory(event=EventFactory(name="Event"))
+
+    with patch(
+        "registrations.email_cache.create_events_ics_file_content",
+        return_value=b"BEGIN:VCALENDAR",
+    ) as mocked_create_ics:
+        assert get_registration_ics_content(registration, "fi") == b"BEGIN:VCALENDAR"
+        assert get_registration_ics_content(registration, "fi") == b"BEGIN:VCALENDAR"
+        assert mocked_create_ics.call_count == 1
+
+        get_registration_ics_content(registration, "en")
+        assert mocked_create_ics.call_count == 2
+
+        registration.event.name = "Changed"
+        registration.event.save()
+        get_registration_ics_content(registration, "fi")
+        assert mocked_create_ics.call_count == 3
+
+
+@pytest.mark.django_db
+def test_ics_content_is_not_cached_by_default():
+    registration = RegistrationFactory()
+
+    with patch(
+        "registrations.email_cache.create_events_ics_file_content",
+        return_value=b"BEGIN:VCALENDAR",
+    ) as mocked_create_ics:
+        get_registration_ics_content(registration, "fi")
+        get_registration_ics_content(registration, "fi")
+
+    assert mocked_create_ics.call_count == 2
@@ -1,6 +1,14 @@
+import csv
+import json
+from unittest.mock import patch
+
 import pytest
 
-from registrations.exports import RegistrationSignUpsExportXLSX
+from registrations.exports import (
+    RegistrationSignUpsExportCSV,
+    RegistrationSignUpsExportJSONL,
+    RegistrationSignUpsExportXLSX,
+)
 from registrations.models import SignUp
 from registrations.tests.factories import SignUpContactPersonFactory, SignUpFactory
 
@@ -47,7 +55,7 @@ def signup_registration(registration):
 def test_signup_order(signup_registration):
     registration = signup_registration
     exporter = RegistrationSignUpsExportXLSX(registration)
-    table_data = exporter._get_signups_table_data()
+    table_data = list(exporter._iter_signups_table_data())
 
     assert table_data[0][0] == "Doe John"
     assert table_data[1][0] == "Smith Jane"
@@ -58,6 +66,78 @@ def test_signup_order(signup_registration):
 def test_attendee_name_format(signup_registration):
     registration = signup_registration
     exporter = RegistrationSignUpsExportXLSX(registration)
-    table_data = exporter._get_signups_table_data()
+    table_data = list(exporter._iter_signups_table_data())
 
     assert table_data[0][0] == "Doe John"
+
+
+@pytest.mark.django_db
+def test_xlsx_file_is_written(signup_registration):
+    exporter = RegistrationSignUpsExportXLSX(signup_registration)
+
+    with exporter.get_xlsx_file() as xlsx_file:
+        # An XLSX file is a zip archive
+        assert xlsx_file.read(2) == b"PK"
+
+
+@pytest.mark.django_db
+def test_csv_export(signup_registration):
+    exporter = RegistrationSignUpsExportCSV(signup_registration)
+
+    rows = list(csv.reader(exporter.iter_csv()))
+
+    assert rows[0] == [column["header"] for column in exporter.columns]
+    assert [row[0] for row in rows[1:]] == ["Doe John", "Smith Jane", "Listed Wait"]
+    assert rows[1][3] == "contact1@example.com"
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        ('=HYPERLINK("a")', '\'=HYPERLINK("a")'),
+        ("+3580123456", "'+3580123456"),
+        ("-1+1", "'-1+1"),
+        ("@SUM(A1:A2)", "'@SUM(A1:A2)"),
+        ("\t=1+1", "'\t=1+1"),
+        ("\r=1+1", "'\r=1+1"),
+        ("John", "John"),
+    ],
+)
+@pytest.mark.django_db
+def test_csv_export_escapes_formulas(registration, value, expected):
+    signup = SignUpFactory(registration=registration, phone_number=value)
+    SignUpContactPersonFactory(signup=signup, email="contact@example.com")
+    exporter = RegistrationSignUpsExportCSV(registration)
+
+    rows = list(csv.reader(exporter.iter_csv()))
+
+    phone_number_index = [column["key"] for column in exporter.columns].index(
+        "phone_number"
+    )
+    assert rows[1][phone_number_index] == expected
+
+
+@pytest.mark.django_db
+def test_jsonl_export(signup_registration):
+    exporter = RegistrationSignUpsExportJSONL(signup_registration)
+
+    lines = [json.loads(line) for line in exporter.iter_lines()]
+
+    assert [line["name"] for line in lines] == ["Doe John", "Smith Jane", "Listed Wait"]
+    assert lines[0]["contact_person_email"] == "contact1@example.com"
+    assert lines[0]["phone_number"] == "123456789"
+
+
+@pytest.mark.django_db
+def test_signups_are_fetched_in_chunks(signup_registration):
+    exporter = RegistrationSignUpsExportJSONL(signup_registration)
+
+    with (
+        patch("registrations.exports.EXPORT_CHUNK_SIZE", 2),
+        patch.object(
+            type(exporter.signups), "iterator", autospec=True, return_value=iter([])
+        ) as mocked_iterator,
+    ):
+        list(exporter.iter_lines())
+
+    mocked_iterator.assert_called_once_with(exporter.signups, chunk_size=2)
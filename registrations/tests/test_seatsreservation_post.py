@@ -226,6 +226,28 @@ def test_cannot_reserve_seats_if_there_are_not_enough_seats_available(
     assert response.data["seats"][0] == "Not enough seats available. Capacity left: 1."
 
 
+@pytest.mark.django_db
+def test_capacity_counters_reject_seats_that_are_not_available(
+    settings, user_api_client, registration
+):
+    settings.REGISTRATION_CAPACITY_COUNTERS = True
+    registration.maximum_attendee_capacity = 2
+    registration.save(update_fields=["maximum_attendee_capacity"])
+
+    reservation_data = {"seats": 1, "registration": registration.id}
+    response = assert_reserve_seats(user_api_client, reservation_data)
+    assert response.data["in_waitlist"] is False
+
+    reservation_data["seats"] = 2
+    response = reserve_seats(user_api_client, reservation_data)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.data["seats"][0] == "Not enough seats available. Capacity left: 1."
+
+    registration.refresh_from_db()
+    assert registration.reserved_seats_count == 1
+    assert registration.remaining_attendee_capacity == 1
+
+
 @pytest.mark.django_db
 def test_reserve_seats_to_waiting_list(user_api_client, registration, signup, signup2):
     registration.maximum_attendee_capacity = 2
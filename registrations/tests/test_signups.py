@@ -0,0 +1,108 @@
+from unittest.mock import patch
+
+import pytest
+from rest_framework.exceptions import PermissionDenied
+
+from registrations.models import SignUp, SignUpContactPerson, SignUpProtectedData
+from registrations.signups import bulk_create_signups
+from registrations.tests.factories import RegistrationFactory, SignUpFactory
+
+
+def _signup_data(first_name, **kwargs):
+    return {"first_name": first_name, "last_name": "Signup", **kwargs}
+
+
+@pytest.mark.django_db
+def test_bulk_create_signups_places_signups_by_capacity():
+    registration = RegistrationFactory(
+        maximum_attendee_capacity=2, waiting_list_capacity=1
+    )
+
+    signups = bulk_create_signups(
+        registration,
+        [
+            _signup_data("First", extra_info="Extra info"),
+            _signup_data("Second", attendee_status=SignUp.AttendeeStatus.WAITING_LIST),
+            _signup_data("Third", contact_person={"email": "third@test.com"}),
+            _signup_data("Fourth"),
+        ],
+    )
+
+    assert [signup.attendee_status for signup in signups] == [
+        SignUp.AttendeeStatus.ATTENDING,
+        SignUp.AttendeeStatus.WAITING_LIST,
+        SignUp.AttendeeStatus.ATTENDING,
+    ]
+    assert SignUp.objects.filter(registration=registration).count() == 3
+    assert SignUpProtectedData.objects.get().signup_id == signups[0].pk
+    assert SignUpContactPerson.objects.get().signup_id == signups[2].pk
+
+
+@pytest.mark.django_db
+def test_bulk_create_signups_when_registration_is_full():
+    registration = RegistrationFactory(
+        maximum_attendee_capacity=1, waiting_list_capacity=0
+    )
+    SignUpFactory(registration=registration)
+
+    with pytest.raises(PermissionDenied):
+        bulk_create_signups(registration, [_signup_data("First")])
+
+    assert SignUp.objects.filter(registration=registration).count() == 1
+
+
+@pytest.mark.django_db
+def test_bulk_create_signups_recalculates_capacities_once(
+    django_capture_on_commit_callbacks,
+):
+    registration = RegistrationFactory(
+        maximum_attendee_capacity=5, waiting_list_capacity=5
+    )
+
+    with patch(
+        "registrations.capacity.recalculate_registration_capacities"
+    ) as mocked_recalculate:
+        with django_capture_on_commit_callbacks(execute=True):
+            bulk_create_signups(
+                registration, [_signup_data(str(index)) for index in range(3)]
+            )
+
+    mocked_recalculate.assert_called_once_with(registration.pk)
+
+
+@pytest.mark.django_db
+def test_bulk_create_signups_updates_counters_once(settings):
+    settings.REGISTRATION_CAPACITY_COUNTERS = True
+    registration = RegistrationFactory(
+        maximum_attendee_capacity=2, waiting_list_capacity=5
+    )
+
+    with patch(
+        "registrations.capacity._apply_counter_deltas", return_value=1
+    ) as mocked_apply:
+        bulk_create_signups(
+            registration, [_signup_data(str(index)) for index in range(3)]
+        )
+
+    mocked_apply.assert_called_once()
+    assert mocked_apply.call_args.kwargs == {
+        "attendee_count": 2,
+        "waiting_list_count": 1,
+    }
+
+
+@pytest.mark.django_db
+def test_bulk_create_signups_notifies_once_after_creation():
+    registration = RegistrationFactory(maximum_attendee_capacity=5)
+
+    with patch("registrations.signups.notify_signups") as mocked_notify:
+        signups = bulk_create_signups(
+            registration,
+            [
+                _signup_data(str(index), contact_person={"email": f"{index}@test.com"})
+                for index in range(3)
+            ],
+            notify=True,
+        )
+
+    mocked_notify.assert_called_once_with(signups, current_user=None)
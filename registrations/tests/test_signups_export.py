@@ -44,14 +44,19 @@ def _get_signups_export(
     return response
 
 
-def _assert_correct_content(response):
-    assert response.headers["Content-Type"] == (
-        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+_CONTENT_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+
+def _assert_correct_content(response, file_format="xlsx"):
+    assert response.headers["Content-Type"] == _CONTENT_TYPES[file_format]
     assert response.headers["Content-Disposition"] == (
-        'attachment; filename="registered_persons.xlsx"'
+        f'attachment; filename="registered_persons.{file_format}"'
     )
-    assert len(response.content) > 0
+    assert len(b"".join(response.streaming_content)) > 0
 
 
 def _assert_get_signups_export(
@@ -65,7 +70,7 @@ def _assert_get_signups_export(
     )
 
     assert response.status_code == status.HTTP_200_OK
-    _assert_correct_content(response)
+    _assert_correct_content(response, file_format)
 
     return response
 
@@ -378,6 +383,8 @@ def test_signups_export_allowed_for_apikey_with_registration_permission(
     "file_format,allowed",
     [
         ("xlsx", True),
+        ("csv", True),
+        ("jsonl", True),
         ("docx", False),
         ("pdf", False),
         ("txt", False),
@@ -404,7 +411,7 @@ def test_signups_export_file_formats(registration, api_client, file_format, allo
 
     if allowed:
         assert response.status_code == status.HTTP_200_OK
-        _assert_correct_content(response)
+        _assert_correct_content(response, file_format)
     else:
         assert response.status_code == status.HTTP_404_NOT_FOUND
 
@@ -456,12 +463,42 @@ def test_signups_export_registration_not_found(api_client):
     assert response.status_code == status.HTTP_404_NOT_FOUND
 
 
+@pytest.mark.parametrize("file_format", ["xlsx", "csv"])
 @pytest.mark.django_db
-def test_signups_export_without_signups_data(registration, api_client):
+def test_signups_export_without_signups_data(registration, api_client, file_format):
     user = create_user_by_role("superuser", registration.publisher)
     api_client.force_authenticate(user)
 
-    _assert_get_signups_export(api_client, registration.id, file_format="xlsx")
+    _assert_get_signups_export(api_client, registration.id, file_format=file_format)
+
+
+@pytest.mark.parametrize(
+    "ui_language,header",
+    [
+        ("fi", b"Nimi"),
+        ("en", b"Name"),
+    ],
+)
+@pytest.mark.django_db
+def test_signups_csv_export_is_streamed_in_ui_language(
+    registration, api_client, ui_language, header
+):
+    SignUpFactory(registration=registration, first_name="John", last_name="Doe")
+
+    user = create_user_by_role("superuser", registration.publisher)
+    api_client.force_authenticate(user)
+
+    response = _get_signups_export(
+        api_client,
+        registration.id,
+        file_format="csv",
+        query_string=f"ui_language={ui_language}",
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    lines = b"".join(response.streaming_content).splitlines()
+    assert lines[0].startswith(header)
+    assert lines[1].startswith(b"Doe John,")
 
 
 @pytest.mark.django_db